@@ -1,6 +1,6 @@
 import streamlit as st
 import time
-from utils.db import execute_statement, run_query
+from utils.db import execute_named, run_named_query
 from utils.ui import load_custom_css, header
 
 # Page Config
@@ -42,7 +42,7 @@ def login():
                 # Mock Login - In production verify hash
                 try:
                     # In production, verify hash of password
-                    user_df = run_query(f"SELECT user_id, user_type, full_name FROM USERS WHERE email = '{email}' AND password = '{password}'")
+                    user_df = run_named_query("login", (email, password))
                     if not user_df.empty:
                         user = user_df.iloc[0]
                         st.session_state.user_id = user['user_id']
@@ -85,25 +85,12 @@ def login():
                     uid = f"USER-{str(uuid.uuid4())[:8]}"
                     
                     # Insert User
-                    sql = f"""
-                    INSERT INTO USERS (user_id, email, password, user_type, full_name, phone, verified, created_at)
-                    VALUES ('{uid}', '{new_email}', '{new_password}', '{new_type}', '{new_name}', '{new_phone}', TRUE, CURRENT_TIMESTAMP)
-                    """
-                    execute_statement(sql)
+                    execute_named("create_user", (uid, new_email, new_password, new_type, new_name, new_phone))
                     
                     if new_type == "inspector":
                         # Insert Profile
                         insp_id = f"INSP-{str(uuid.uuid4())[:8]}"
-                        specs_arr = str(specs).replace('[', '').replace(']', '').replace("'", "") # Simplified serialization
-                        # Note: array handling in simple SQL string injection might need specific syntax for Snowflake
-                        # Using ARRAY_CONSTRUCT in real scenario or parameterized queries
-                        
-                        # Simplified for demo
-                        sql_insp = f"""
-                        INSERT INTO INSPECTOR_PROFILES (inspector_id, user_id, license_number, verified_inspector)
-                        VALUES ('{insp_id}', '{uid}', '{license}', FALSE)
-                        """
-                        execute_statement(sql_insp)
+                        execute_named("create_inspector_profile", (insp_id, uid, license))
                         
                     st.success("Account created! Please login.")
                 except Exception as e:
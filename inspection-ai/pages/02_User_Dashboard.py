@@ -1,5 +1,6 @@
 import streamlit as st
-from utils.db import run_query
+from utils.db import run_named_query
+from utils.grouping import records
 from utils.ui import load_custom_css, header, require_login, render_sidebar
 
 st.set_page_config(page_title="Dashboard", page_icon="📊", layout="wide")
@@ -51,39 +52,22 @@ with st.expander("Need an expert inspector? Request one here."):
             if not req_addr or not req_house:
                 st.error("Address and House Number are required.")
             else:
-                from utils.db import execute_statement
+                from utils.db import execute_named
                 import uuid
                 
                 # Check if property exists for this user
-                existing = run_query(f"""
-                    SELECT property_id FROM PROPERTIES 
-                    WHERE owner_user_id = '{st.session_state.user_id}' 
-                    AND (house_number = '{req_house}' OR address = '{req_addr}')
-                """)
+                existing = run_named_query("dashboard_existing_property", (st.session_state.user_id, req_house, req_addr))
                 
                 if not existing.empty:
                     prop_id = existing.iloc[0]['property_id']
                 else:
                     # Create new property
                     prop_id = f"PROP-{str(uuid.uuid4())[:8]}"
-                    execute_statement(f"""
-                        INSERT INTO PROPERTIES (
-                            property_id, house_number, property_name, address, 
-                            property_type, construction_status, total_rooms, 
-                            owner_user_id, report_visibility
-                        ) VALUES (
-                            '{prop_id}', '{req_house}', '{req_name or req_addr}', '{req_addr}',
-                            'residential', 'existing', 1,
-                            '{st.session_state.user_id}', 'private'
-                        )
-                    """)
+                    execute_named("create_property", (prop_id, req_house, req_name or req_addr, req_addr, st.session_state.user_id))
                 
                 # Create Service Request
                 sid = f"SR-{str(uuid.uuid4())[:8]}"
-                execute_statement(f"""
-                    INSERT INTO INSPECTION_SERVICE_REQUESTS (service_id, property_id, requester_user_id, status)
-                    VALUES ('{sid}', '{prop_id}', '{st.session_state.user_id}', 'requested')
-                """)
+                execute_named("create_service_request", (sid, prop_id, st.session_state.user_id))
                 st.success("Inspection Request Submitted! An inspector will be assigned soon.")
 
 st.divider()
@@ -92,19 +76,12 @@ st.divider()
 st.subheader("🕑 Recent Inspections")
 try:
     if st.session_state.user_type == 'normal_user':
-        props = run_query(f"""
-            SELECT p.property_id, p.property_name, p.address, p.house_number, 
-                   prs.risk_rating, prs.property_risk_score
-            FROM PROPERTIES p
-            LEFT JOIN PROPERTY_RISK_SCORES prs ON p.property_id = prs.property_id
-            WHERE p.owner_user_id = '{st.session_state.user_id}'
-            ORDER BY p.created_at DESC LIMIT 3
-        """)
+        props = run_named_query("dashboard_recent_inspections", (st.session_state.user_id,))
         
         if props.empty:
             st.caption("No recent inspections found.")
         else:
-            for _, prop in props.iterrows():
+            for prop in records(props):
                 with st.container():
                      c1, c2, c3 = st.columns([3, 2, 1])
                      c1.markdown(f"**{prop['property_name']}**")
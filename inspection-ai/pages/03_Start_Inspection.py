@@ -1,6 +1,6 @@
 import streamlit as st
 import uuid
-from utils.db import execute_statement
+from utils.db import execute_named
 from utils.ui import load_custom_css, header, require_login, render_sidebar
 
 st.set_page_config(page_title="Start Inspection", page_icon="➕")
@@ -23,8 +23,8 @@ with st.form("property_details_form"):
     def_address = ""
     
     if st.session_state.get('current_property_id'):
-        from utils.db import run_query
-        p_df = run_query(f"SELECT house_number, address FROM PROPERTIES WHERE property_id = '{st.session_state.current_property_id}'")
+        from utils.db import run_named_query
+        p_df = run_named_query("start_property_details", (st.session_state.current_property_id,))
         if not p_df.empty:
             def_house = p_df.iloc[0]['house_number']
             def_address = p_df.iloc[0]['address']
@@ -53,8 +53,8 @@ with st.form("property_details_form"):
                     is_new = True
                 else:
                     # Check if it actually exists in DB to be safe
-                    from utils.db import run_query
-                    check = run_query(f"SELECT 1 FROM PROPERTIES WHERE property_id = '{prop_id}'")
+                    from utils.db import run_named_query
+                    check = run_named_query("start_property_exists", (prop_id,))
                     is_new = check.empty
 
                 st.session_state.current_property_id = prop_id
@@ -62,22 +62,11 @@ with st.form("property_details_form"):
                 
                 if is_new:
                     # Insert Property
-                    sql = f"""
-                    INSERT INTO PROPERTIES (
-                        property_id, house_number, property_name, address, 
-                        property_type, construction_status, total_rooms, 
-                        owner_user_id, report_visibility
-                    ) VALUES (
-                        '{prop_id}', '{house_num}', '{name}', '{address}',
-                        'residential', 'existing', 1,
-                        '{st.session_state.user_id}', 'private'
-                    )
-                    """
-                    execute_statement(sql)
+                    execute_named("create_property", (prop_id, house_num, name, address, st.session_state.user_id))
                 
                 # Update Service Request Status if applicable
                 if 'current_service_id' in st.session_state:
-                    execute_statement(f"UPDATE INSPECTION_SERVICE_REQUESTS SET status = 'in_progress' WHERE service_id = '{st.session_state.current_service_id}'")
+                    execute_named("service_request_in_progress", (st.session_state.current_service_id,))
                 
                 # Navigate to Wizard
                 st.session_state.wizard_step = 1 # Start at config step
@@ -1,11 +1,10 @@
 import streamlit as st
 import uuid
 import time
-from utils.db import execute_statement
 from utils.ui import load_custom_css, header, require_login, render_sidebar
 from utils.s3 import upload_to_s3
-from utils.ai import analyze_image_mock, analyze_document_text
-from pypdf import PdfReader
+from utils.pipeline import store_uploads
+from utils import jobs
 import io
 
 st.set_page_config(page_title="Inspection Wizard", page_icon="🕵️", layout="wide")
@@ -22,7 +21,10 @@ if 'current_property_id' not in st.session_state:
 
 # API Status Check
 from utils.ai import GEMINI_API_KEY
+from utils import ratelimit
 api_status = "🟢 Online (Gemini)" if GEMINI_API_KEY else " 🟡 Offline (Mock Mode)"
+if GEMINI_API_KEY and ratelimit.gemini.breaker.state != ratelimit.CLOSED:
+    api_status = f"🔴 Gemini failing, using Mock (next try in {ratelimit.gemini.breaker.retry_in():.0f}s)"
 
 # Simulation Controls
 st.sidebar.markdown("### 🛠️ Developer / Demo Mode")
@@ -33,6 +35,7 @@ sim_mode = st.sidebar.selectbox(
     format_func=lambda x: "Auto (AI/Random)" if x == "auto" else f"Force: {x.title()}"
 )
 st.sidebar.caption("Use 'Force' options to simulate specific defects if API is missing or for testing reports.")
+bypass_cache = st.sidebar.checkbox("Bypass AI result cache", value=False, help="Re-analyze images even if an identical photo was analyzed before.")
 
 header(f"Inspection: {st.session_state.current_property_name}")
 
@@ -41,6 +44,23 @@ if 'wizard_step' not in st.session_state:
     st.session_state.wizard_step = 1
 if 'room_config' not in st.session_state:
     st.session_state.room_config = []
+if 'wizard_jobs' not in st.session_state:
+    st.session_state.wizard_jobs = []
+    st.session_state.wizard_jobs_done = set()
+
+
+def run_inline(job_id, label, progress=None):
+    """
+    With JOB_QUEUE=inline, run the job now if it is due and show its progress;
+    otherwise a worker picks it up. Returns the job's status, or None if it didn't run.
+    A failed attempt is retried from step 4, which shows the error meanwhile.
+    """
+    if jobs.JOB_QUEUE != "inline":
+        return None
+    progress = progress or st.progress(0.0, text=f"{label}...")
+    def on_progress(done, total):
+        progress.progress(done / total, text=f"{label} ({done} of {total})")
+    return jobs.run_job(job_id, on_progress=on_progress)
 
 # Step 1: Configure Rooms (Only for Full Property Mode)
 # If Single mode, this step is skipped (wizard_step set to 2 in previous page)
@@ -110,54 +130,26 @@ elif st.session_state.wizard_step == 2:
             next_label = "Next Room ➡️" if current_idx < len(rooms) - 1 else "Finish & Analyze 🚀"
             if st.button(next_label, use_container_width=True):
                 if uploaded_files:
-                    with st.spinner(f"Analyzing images for {room['name']}..."):
-                        # Create Room in DB
+                    with st.spinner(f"Uploading images for {room['name']}..."):
+                        stored, failed = store_uploads(uploaded_files)
+                    for name, error in failed:
+                        st.warning(f"Could not upload {name}: {error}")
+                    
+                    if stored:
+                        # Analysis runs as a job: the room, image and finding rows are saved together when it finishes
                         room_id = f"RM-{str(uuid.uuid4())[:8]}"
-                        
-                        execute_statement(f"""
-                            INSERT INTO ROOMS (room_id, property_id, room_name, room_type)
-                            VALUES ('{room_id}', '{st.session_state.current_property_id}', '{room['name']}', '{room['type']}')
-                        """)
-                        
-                        # Process Images
-                        session_id = f"SESS-{str(uuid.uuid4())[:8]}" 
-                        
-                        for file in uploaded_files:
-                            url = upload_to_s3(file)
-                            analysis = analyze_image_mock(url, simulation_override=sim_mode)
-                            
-                            # Store Image
-                            img_sql = f"""
-                            INSERT INTO INSPECTION_IMAGES (
-                                image_id, upload_session_id, user_id, property_id, room_id,
-                                upload_scenario, image_url, original_filename,
-                                ai_detected_defects, ai_confidence_score, ai_description, ai_severity
-                            ) VALUES (
-                                '{uuid.uuid4()}', '{session_id}', '{st.session_state.user_id}',
-                                '{st.session_state.current_property_id}', '{room_id}',
-                                'room_set', '{url}', '{file.name}',
-                                '{analysis['defect_type']}', {analysis['confidence']},
-                                '{analysis['description'].replace("'", "")}', '{analysis['severity']}'
-                            )
-                            """
-                            execute_statement(img_sql)
-                            
-                            # Create Finding
-                            if analysis['defect_type'] != 'none':
-                                fnd_sql = f"""
-                                INSERT INTO INSPECTION_FINDINGS (
-                                    finding_id, room_id, property_id,
-                                    finding_category, finding_description, severity,
-                                    detected_by, confidence_score
-                                ) VALUES (
-                                    '{uuid.uuid4()}', '{room_id}', '{st.session_state.current_property_id}',
-                                    '{analysis['defect_type']}', '{analysis['description'].replace("'", "")} Action: {analysis['action'].replace("'", "")}',
-                                    '{analysis['severity']}', 'ai', {analysis['confidence']}
-                                )
-                                """
-                                execute_statement(fnd_sql)
-                        
-                        st.Success = True
+                        session_id = f"SESS-{str(uuid.uuid4())[:8]}"
+                        job_id = jobs.enqueue("analyze_room", {
+                            "room_id": room_id, "property_id": st.session_state.current_property_id,
+                            "user_id": st.session_state.user_id, "room_name": room['name'], "room_type": room['type'],
+                            "session_id": session_id, "images": [s._asdict() for s in stored],
+                            "simulation_override": sim_mode, "use_cache": not bypass_cache,
+                        }, key=jobs.idempotency_key("room", st.session_state.current_property_id, current_idx,
+                                                    room['name'], sorted(s.url for s in stored)),
+                           group_id=st.session_state.current_property_id)
+                        if job_id not in st.session_state.wizard_jobs:
+                            st.session_state.wizard_jobs.append(job_id)
+                        run_inline(job_id, f"Analyzing {len(stored)} images for {room['name']}")
                 
                 # Move next
                 st.session_state.current_room_idx += 1
@@ -179,42 +171,21 @@ elif st.session_state.wizard_step == 3:
     if st.button("Process & Finish 🚀", type="primary"):
         if doc_files:
             for doc in doc_files:
-                text_content = ""
-                if doc.type == "application/pdf":
-                    try:
-                        reader = PdfReader(doc)
-                        for page in reader.pages:
-                            text_content += page.extract_text() + "\n"
-                    except Exception as e:
-                        st.error(f"Error reading PDF {doc.name}: {e}")
-                else:
-                    # Text file
-                    text_content = str(doc.read(), "utf-8")
+                file_url = upload_to_s3(doc) # Reusing s3 for storage
+                if not file_url:
+                    st.warning(f"Could not upload {doc.name}.")
+                    continue
                 
-                if text_content:
-                    with st.spinner(f"Analyzing {doc.name}..."):
-                        analysis = analyze_document_text(text_content)
-                        
-                        # Save to DB
-                        d_id = f"DOC-{str(uuid.uuid4())[:8]}"
-                        file_url = upload_to_s3(doc) # Reusing s3 for storage
-                        
-                        # Escape quotes for SQL
-                        summary = analysis.get('ai_summary', '').replace("'", "''")
-                        suggestions = analysis.get('ai_suggestions', '').replace("'", "''")
-                        
-                        sql_doc = f"""
-                        INSERT INTO INSPECTION_DOCUMENTS (
-                            doc_id, property_id, user_id, filename, file_url,
-                            extracted_text, ai_summary, ai_suggestions
-                        ) VALUES (
-                            '{d_id}', '{st.session_state.current_property_id}', '{st.session_state.user_id}',
-                            '{doc.name}', '{file_url}', '{text_content[:500].replace("'", "''")}...',
-                            '{summary}', '{suggestions}'
-                        )
-                        """
-                        execute_statement(sql_doc)
-                        st.toast(f"Analyzed {doc.name}")
+                # Extraction and map-reduce summary run as a job (see utils/jobs.py)
+                job_id = jobs.enqueue("analyze_document", {
+                    "doc_id": f"DOC-{str(uuid.uuid4())[:8]}", "property_id": st.session_state.current_property_id,
+                    "user_id": st.session_state.user_id, "filename": doc.name, "file_url": file_url,
+                    "pdf": doc.type == "application/pdf",
+                }, key=jobs.idempotency_key("document", st.session_state.current_property_id, file_url),
+                   group_id=st.session_state.current_property_id)
+                if job_id not in st.session_state.wizard_jobs:
+                    st.session_state.wizard_jobs.append(job_id)
+                run_inline(job_id, f"Analyzing {doc.name}")
         
         st.session_state.wizard_step = 4
         st.rerun()
@@ -225,8 +196,38 @@ elif st.session_state.wizard_step == 3:
 
 # Step 4: Completion
 elif st.session_state.wizard_step == 4:
-    st.balloons()
-    st.success("Inspection Complete!")
+    status = jobs.poll(st.session_state.current_property_id, st.session_state.wizard_jobs_done)
+    status = status[status['job_id'].isin(st.session_state.wizard_jobs)]
+    pending = status[status['status'].isin([jobs.QUEUED, jobs.RUNNING])]
+    failed = status[status['status'] == jobs.FAILED]
+    
+    if not pending.empty:
+        st.info(f"Analyzing: {len(status) - len(pending)} of {len(status)} jobs finished.")
+        bars = {}
+        for job in pending.itertuples(index=False):
+            label = "Images" if job.kind == "analyze_room" else "Report"
+            done, total = job.progress_done or 0, job.progress_total or 0
+            bars[job.job_id] = (label, st.progress(
+                done / total if total else 0.0,
+                text=f"{label}: {job.status}" + (f" ({done} of {total})" if total else "")
+                     + (f", retrying after: {job.last_error}" if job.last_error else "")))
+        if st.button("Refresh"):
+            st.rerun()
+        # Inline, nothing else picks up a retry whose backoff has passed or a job whose lease expired
+        for job_id, (label, bar) in bars.items():
+            if run_inline(job_id, label, bar) is not None:
+                st.rerun()
+        time.sleep(jobs.JOB_POLL_INTERVAL * 2)
+        st.rerun()
+    
+    if not failed.empty:
+        for job in failed.itertuples(index=False):
+            label = "Image analysis" if job.kind == "analyze_room" else "Report analysis"
+            st.error(f"{label} failed after {job.attempts} attempt(s): {job.last_error}")
+        st.warning("Inspection finished with errors. Results that were saved are shown in the report.")
+    else:
+        st.balloons()
+        st.success("Inspection Complete!")
     st.divider()
     
     col1, col2 = st.columns(2)
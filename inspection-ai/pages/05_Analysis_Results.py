@@ -1,6 +1,9 @@
 import streamlit as st
 import pandas as pd
-from utils.db import run_query
+from utils.reports import load_report
+from utils.grouping import records
+from utils.access import can_view
+from utils.pdf import report_pdf_bytes
 from utils.ui import load_custom_css, header, require_login, card, render_sidebar
 
 st.set_page_config(page_title="Analysis Results", page_icon="📈", layout="wide")
@@ -14,70 +17,46 @@ if 'current_property_id' not in st.session_state:
 
 prop_id = st.session_state.current_property_id
 
-# Fetch Data
-summary_df = run_query(f"""
-    SELECT * FROM PROPERTY_INSPECTION_SUMMARY WHERE property_id = '{prop_id}'
-""")
-
-score_df = run_query(f"""
-    SELECT * FROM PROPERTY_RISK_SCORES WHERE property_id = '{prop_id}'
-""")
-
-rooms_df = run_query(f"""
-    SELECT * FROM ROOM_RISK_SCORES WHERE property_id = '{prop_id}'
-""")
-
-findings_df = run_query(f"""
-    SELECT f.*, r.room_name 
-    FROM INSPECTION_FINDINGS f 
-    JOIN ROOMS r ON f.room_id = r.room_id 
-    WHERE f.property_id = '{prop_id}' 
-    ORDER BY f.severity
-""")
-
-# Fetch Inspector Info
-inspector_df = run_query(f"""
-    SELECT ir.report_id, ir.inspector_id, u.full_name as inspector_name, u.user_id as inspector_user_id
-    FROM INSPECTOR_REPORTS ir
-    JOIN INSPECTOR_PROFILES ip ON ir.inspector_id = ip.inspector_id
-    JOIN USERS u ON ip.user_id = u.user_id
-    WHERE ir.property_id = '{prop_id}'
-    LIMIT 1
-""")
-
-if summary_df.empty:
+if not can_view(st.session_state.user_id, prop_id, st.session_state.get('user_type')):
+    st.error("🔒 This report is private. Request access from the Search page.")
+    st.stop()
+
+# Fetch Data (one snapshot, cached until the property's data changes)
+report = load_report(prop_id)
+
+if report is None:
     st.info("No inspection data available yet.")
     st.stop()
 
-summary = summary_df.iloc[0]
-score = score_df.iloc[0]
-inspector_info = inspector_df.iloc[0] if not inspector_df.empty else None
+rooms_df = report.rooms
+findings_df = report.findings
+inspector_info = report.inspector
 
-header(f"Report: {summary['property_name']}")
-if inspector_info:
-    st.markdown(f"**Inspected By:** 👨‍🔧 {inspector_info['inspector_name']}")
+header(f"Report: {report.property_name}")
+if inspector_info is not None:
+    st.markdown(f"**Inspected By:** 👨‍🔧 {inspector_info.inspector_name}")
 
 # Top Metrics
 col1, col2, col3, col4 = st.columns(4)
 with col1:
-    st.metric("Risk Score", f"{score['property_risk_score']:.0f}/100")
+    st.metric("Risk Score", f"{report.property_risk_score:.0f}/100")
 with col2:
-    st.metric("Risk Rating", score['risk_rating'])
+    st.metric("Risk Rating", report.risk_rating)
 with col3:
-    st.metric("Critical Issues", score['critical_findings'])
+    st.metric("Critical Issues", report.critical_findings)
 with col4:
-    st.metric("Total Findings", score['total_findings'])
+    st.metric("Total Findings", report.total_findings)
 
 st.divider()
 
 st.divider()
 
 # Document Analysis
-docs_df = run_query(f"SELECT * FROM INSPECTION_DOCUMENTS WHERE property_id = '{prop_id}'")
+docs_df = report.documents
 
 if not docs_df.empty:
     st.subheader("📄 Technical Document Analysis")
-    for _, doc in docs_df.iterrows():
+    for doc in records(docs_df):
         with st.expander(f"Report: {doc['filename']}"):
             c1, c2 = st.columns(2)
             with c1:
@@ -94,19 +73,19 @@ st.divider()
 
 # Executive Summary
 st.subheader("📝 Executive Summary")
-risk_rating = summary['risk_rating']
+risk_rating = report.risk_rating
 color = "red" if "CRITICAL" in risk_rating else "orange" if "HIGH" in risk_rating else "green"
 
 st.markdown(f"""
 <div style="padding: 20px; border-left: 5px solid {color}; background: rgba(255,255,255,0.05);">
     <h3 style="margin-top:0">{risk_rating}</h3>
-    <p>{summary['executive_summary']}</p>
+    <p>{report.executive_summary}</p>
 </div>
 """, unsafe_allow_html=True)
 
 # Recommended Actions
 st.subheader("✅ Recommended Actions")
-actions = summary['recommended_actions'].split('. ')
+actions = report.recommended_actions.split('. ')
 for act in actions:
     if act.strip():
         st.info(act.strip())
@@ -114,12 +93,12 @@ for act in actions:
 # Room Breakdown
 st.subheader("🏠 Room Analysis")
 if not rooms_df.empty:
-    for _, room in rooms_df.iterrows():
+    for room in records(rooms_df):
         with st.expander(f"{room['room_name']} - {room['risk_category']} ({room['risk_score']:.0f})"):
             # Show findings for this room
-            room_findings = findings_df[findings_df['room_id'] == room['room_id']]
-            if not room_findings.empty:
-                for _, f in room_findings.iterrows():
+            room_findings = report.findings_by_room.get(room['room_id'], [])
+            if room_findings:
+                for f in room_findings:
                     st.markdown(f"**[{f['severity']}] {f['finding_category']}**: {f['finding_description']}")
             else:
                 st.caption("No issues found.")
@@ -132,7 +111,7 @@ st.dataframe(findings_df[['room_name', 'finding_category', 'severity', 'finding_
 st.divider()
 
 # Rating Section (Only for Property Owner)
-if st.session_state.user_type == 'normal_user' and inspector_info:
+if st.session_state.user_type == 'normal_user' and inspector_info is not None:
     st.subheader("⭐ Rate Inspector Service")
     with st.expander("Leave a Rating & Review"):
         with st.form("rating_form"):
@@ -140,32 +119,27 @@ if st.session_state.user_type == 'normal_user' and inspector_info:
             user_feedback = st.text_area("Feedback")
             
             if st.form_submit_button("Submit Rating"):
-                from utils.db import execute_statement
+                from utils.db import BatchWriter
                 import uuid
                 
                 rid = f"RAT-{str(uuid.uuid4())[:8]}"
                 
-                # save rating
-                execute_statement(f"""
-                    INSERT INTO INSPECTION_RATINGS (rating_id, report_id, user_id, inspector_id, rating_score, feedback)
-                    VALUES ('{rid}', '{inspector_info['report_id']}', '{st.session_state.user_id}', '{inspector_info['inspector_id']}', {user_rating}, '{user_feedback}')
-                """)
+                # save rating and update inspector profile average in one transaction
+                batch = BatchWriter()
+                batch.add("insert_rating", (rid, inspector_info.report_id, st.session_state.user_id, inspector_info.inspector_id, user_rating, user_feedback))
                 
-                # update inspector profile average
                 # Note: This is a simple update, in prod use a trigger or smarter recalc
-                execute_statement(f"""
-                    UPDATE INSPECTOR_PROFILES 
-                    SET rating = (SELECT AVG(rating_score) FROM INSPECTION_RATINGS WHERE inspector_id = '{inspector_info['inspector_id']}'),
-                        total_inspections = total_inspections + 1
-                    WHERE inspector_id = '{inspector_info['inspector_id']}'
-                """)
+                batch.add("update_inspector_rating", (inspector_info.inspector_id, inspector_info.inspector_id))
+                batch.flush()
                 
                 st.success("Thank you for your feedback!")
 
 st.divider()
 c1, c2 = st.columns(2)
 with c1:
-    st.download_button("📥 Download PDF Report", "Report Content Placeholder", "report.pdf")
+    # Rendered only when the button is clicked, once per report version (reused from disk after that)
+    st.download_button("📥 Download PDF Report", lambda: report_pdf_bytes(prop_id),
+                       f"{prop_id}_inspection_report.pdf", mime="application/pdf")
 with c2:
     if st.button("⬅️ Back to Dashboard"):
         st.switch_page("pages/02_User_Dashboard.py")
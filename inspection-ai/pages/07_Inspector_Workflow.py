@@ -1,9 +1,11 @@
 import streamlit as st
 import uuid
 import pandas as pd
-from utils.db import execute_statement, run_query
+from utils.db import execute_named, run_named_query
+from utils.grouping import records
 from utils.ui import load_custom_css, header, require_login, render_sidebar
-from utils.ai import compare_findings_with_report
+from utils.crosscheck import cross_check
+from utils.documents import document_text
 
 st.set_page_config(page_title="Inspection Workflow", page_icon="📝", layout="wide")
 load_custom_css()
@@ -17,9 +19,7 @@ if 'current_property_id' not in st.session_state:
 header(f"Inspection Review: {st.session_state.current_property_name}")
 
 # Fetch AI Findings
-ai_findings = run_query(f"""
-    SELECT * FROM AI_CLASSIFIED_DEFECTS WHERE property_id = '{st.session_state.current_property_id}'
-""")
+ai_findings = run_named_query("workflow_ai_findings", (st.session_state.current_property_id,))
 
 if ai_findings.empty:
     st.info("No AI findings to review. Start by uploading images in the Wizard?")
@@ -30,21 +30,24 @@ else:
     st.subheader("🤖 Cross-Check Analysis (Report vs AI)")
     
     # 1. Fetch Inspector's Uploaded Report Text
-    docs = run_query(f"SELECT extracted_text, filename FROM INSPECTION_DOCUMENTS WHERE property_id = '{st.session_state.current_property_id}' LIMIT 1")
+    docs = run_named_query("workflow_document", (st.session_state.current_property_id,))
     
     if not docs.empty:
-        report_text = docs.iloc[0]['extracted_text']
+        # full text from DOCUMENT_CHUNKS; extracted_text is only a preview
+        report_text = document_text(docs.iloc[0]['doc_id']) or docs.iloc[0]['extracted_text']
         filename = docs.iloc[0]['filename']
         
-        # 2. Aggregate AI Findings
-        ai_text_summary = ""
-        for _, f in ai_findings.iterrows():
-            ai_text_summary += f"- {f['room_name']}: Detected {f['finding_category']} ({f['finding_description']})\n"
+        # 2. One line per AI finding
+        finding_lines = [
+            f"{f['room_name']}: {f['finding_category']} {f['finding_description']}"
+            for f in records(ai_findings)
+        ]
             
         with st.expander(f"Compare with: {filename}", expanded=True):
             if st.button("Run Cross-Check Analysis"):
-                with st.spinner("AI is comparing your report with visual findings..."):
-                    comparison = compare_findings_with_report(ai_text_summary, report_text)
+                with st.spinner("Comparing your report with visual findings..."):
+                    # matched locally on embeddings; the AI only writes the summary
+                    comparison = cross_check(finding_lines, report_text)
                     st.session_state.comparison_result = comparison
             
             if 'comparison_result' in st.session_state:
@@ -52,6 +55,9 @@ else:
                 
                 c1, c2, c3 = st.columns([1,2,2])
                 c1.metric("Similarity Score", f"{res.get('similarity_score', 0)}%")
+                if 'match_ms' in res:
+                    c1.caption(f"{res['matched_findings']}/{res['total_findings']} AI findings found in the report "
+                               f"(matched in {res['match_ms']:.0f} ms)")
                 
                 with c2:
                     st.success(f"**Matches ({len(res.get('matches', []))}):**")
@@ -74,7 +80,7 @@ else:
     if 'decisions' not in st.session_state:
         st.session_state.decisions = {}
 
-    for idx, f in ai_findings.iterrows():
+    for f in records(ai_findings):
         fid = f['finding_id']
         
         with st.expander(f"{f['room_name']} - {f['finding_description'][:50]}..."):
@@ -99,7 +105,7 @@ else:
     st.subheader("Final Assessment")
     
     # Fetch current AI Score
-    ai_score_df = run_query(f"SELECT property_risk_score FROM PROPERTY_RISK_SCORES WHERE property_id = '{st.session_state.current_property_id}'")
+    ai_score_df = run_named_query("workflow_ai_score", (st.session_state.current_property_id,))
     ai_score = ai_score_df.iloc[0]['property_risk_score'] if not ai_score_df.empty else 0
     
     col1, col2 = st.columns(2)
@@ -123,21 +129,14 @@ else:
             report_id = f"REP-{str(uuid.uuid4())[:8]}"
             # Assuming current user uses the first profile found for them or we query it. 
             # For demo, we just use a placeholder inspector ID or query it.
-            insp_df = run_query(f"SELECT inspector_id FROM INSPECTOR_PROFILES WHERE user_id = '{st.session_state.user_id}'")
+            insp_df = run_named_query("workflow_inspector_id", (st.session_state.user_id,))
             inspector_id = insp_df.iloc[0]['inspector_id'] if not insp_df.empty else 'UNK'
             
-            sql = f"""
-            INSERT INTO INSPECTOR_REPORTS (
-                report_id, property_id, inspector_id, inspection_date,
-                manual_risk_score, ai_risk_score, score_variance,
-                final_approved_score, inspector_summary, status
-            ) VALUES (
-                '{report_id}', '{st.session_state.current_property_id}', '{inspector_id}',
-                CURRENT_DATE(), {manual_score}, {ai_score}, {variance},
-                {manual_score}, '{summary_text}', 'submitted'
-            )
-            """
-            execute_statement(sql)
+            execute_named("insert_inspector_report", (
+                report_id, st.session_state.current_property_id, inspector_id,
+                manual_score, float(ai_score), float(variance),
+                manual_score, summary_text
+            ))
             st.success("Report Submitted Successfully!")
             st.balloons()
             
@@ -1,5 +1,7 @@
 import streamlit as st
-from utils.db import run_query
+from utils.search import search_properties, SEARCH_PAGE_SIZE
+from utils.access import resolve_access
+from utils.grouping import records
 from utils.ui import load_custom_css, header, require_login, render_sidebar
 
 st.set_page_config(page_title="Property Search", page_icon="🔍", layout="wide")
@@ -12,38 +14,31 @@ header("Search Properties")
 query = st.text_input("Enter House/Unit Number or Address", placeholder="e.g. 301")
 
 if query:
-    results = run_query(f"""
-        SELECT property_id, property_name, address, house_number, report_visibility, owner_user_id
-        FROM PROPERTIES
-        WHERE house_number ILIKE '%{query}%' OR address ILIKE '%{query}%'
-    """)
+    # New search text starts again from the first page
+    if st.session_state.get("search_query") != query:
+        st.session_state.search_query = query
+        st.session_state.search_page = 1
+    
+    results, total = search_properties(query, page=st.session_state.search_page)
     
     if results.empty:
         st.warning("No properties found.")
     else:
-        st.subheader(f"Found {len(results)} properties")
-        for _, p in results.iterrows():
+        total_pages = -(-total // SEARCH_PAGE_SIZE)
+        st.subheader(f"Found {total} properties")
+        
+        # Access state for the whole page in one query
+        access = resolve_access(st.session_state.user_id, results['property_id'].tolist())
+        
+        for p in records(results):
             with st.container():
                 st.markdown(f"### {p['property_name']}")
                 st.write(p['address'])
                 
                 
-                # Access Control Logic
-                has_access = False
-                if p['report_visibility'] == 'public':
-                    has_access = True
-                elif p['owner_user_id'] == st.session_state.user_id:
-                    has_access = True
-                
-                # Check DB for approved access
-                if not has_access:
-                     acc_check = run_query(f"""
-                        SELECT status FROM ACCESS_REQUESTS 
-                        WHERE property_id = '{p['property_id']}' 
-                        AND requester_user_id = '{st.session_state.user_id}'
-                     """)
-                     if not acc_check.empty and acc_check.iloc[0]['status'] == 'approved':
-                         has_access = True
+                # Access Control Logic (owner, public or approved request)
+                p_access = access.get(p['property_id'], {})
+                has_access = p_access.get('access') is not None
                 
                 if has_access:
                     if st.button("View Report", key=p['property_id']):
@@ -52,25 +47,28 @@ if query:
                 else:
                     st.info("🔒 Private Report")
                     # Check for pending
-                    pending_check = run_query(f"""
-                        SELECT status FROM ACCESS_REQUESTS 
-                        WHERE property_id = '{p['property_id']}' 
-                        AND requester_user_id = '{st.session_state.user_id}'
-                        AND status = 'pending'
-                    """)
-                    
-                    if not pending_check.empty:
+                    if p_access.get('pending'):
                         st.warning("⏳ Access Request Pending")
                     else:
                         if st.button("Request Access", key=f"req_{p['property_id']}"):
-                            from utils.db import execute_statement
+                            from utils.db import execute_named
                             import uuid
                             rid = f"REQ-{str(uuid.uuid4())[:8]}"
-                            execute_statement(f"""
-                                INSERT INTO ACCESS_REQUESTS (request_id, property_id, requester_user_id, owner_user_id, status)
-                                VALUES ('{rid}', '{p['property_id']}', '{st.session_state.user_id}', '{p['owner_user_id']}', 'pending')
-                            """)
+                            execute_named("create_access_request", (rid, p['property_id'], st.session_state.user_id, p['owner_user_id']))
                             st.success("Request sent to owner.")
                             st.rerun()
                 
                 st.divider()
+        
+        if total_pages > 1:
+            c1, c2, c3 = st.columns([1, 2, 1])
+            with c1:
+                if st.button("⬅️ Previous", disabled=st.session_state.search_page <= 1):
+                    st.session_state.search_page -= 1
+                    st.rerun()
+            with c2:
+                st.caption(f"Page {st.session_state.search_page} of {total_pages}")
+            with c3:
+                if st.button("Next ➡️", disabled=st.session_state.search_page >= total_pages):
+                    st.session_state.search_page += 1
+                    st.rerun()
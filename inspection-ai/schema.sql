@@ -422,6 +422,8 @@ AS
 -- Ideally this would refresh a materialized view or dynamic table. 
 -- For now, this is just a placeholder as our scores are VIEWS (calculated on fly).
 -- If we were using tables for scores, we would update them here.
+-- The local SQLite build does exactly that: ROOM_RISK_SCORES / PROPERTY_RISK_SCORES
+-- are trigger-maintained tables (see utils/risk_scores.py and migration 0003).
 CREATE OR REPLACE TASK RECALCULATE_RISK_SCORES
     SCHEDULE = '5 MINUTE'
 AS
@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+# Run from inspection-ai/ like the app, against a scratch database with instant mock calls
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("INSPECTION_DB_FILE", os.path.join(tempfile.mkdtemp(), "tests.sqlite"))
+os.environ.setdefault("MOCK_LATENCY", "zero")
@@ -0,0 +1,28 @@
+from utils import db
+from utils.access import APPROVED, OWNER, PUBLIC, can_view, resolve_access
+
+
+def test_access_levels_for_a_page_of_properties():
+    for pid in ("PA-own", "PA-pub", "PA-ok", "PA-wait", "PA-none"):
+        db.execute_named("create_property", (pid, "1", "Home", "1 Main", "U-owner"))
+    db.execute("UPDATE PROPERTIES SET report_visibility = 'public' WHERE property_id = 'PA-pub'")
+    db.execute_named("create_property", ("PA-mine", "2", "Mine", "2 Main", "U-viewer"))
+    db.execute_named("create_access_request", ("AR-ok", "PA-ok", "U-viewer", "U-owner"))
+    db.execute_named("update_access_request_status", ("approved", "AR-ok"))
+    db.execute_named("create_access_request", ("AR-wait", "PA-wait", "U-viewer", "U-owner"))
+    # Another user's approval grants nothing
+    db.execute_named("create_access_request", ("AR-other", "PA-none", "U-other", "U-owner"))
+    db.execute_named("update_access_request_status", ("approved", "AR-other"))
+
+    ids = ["PA-mine", "PA-pub", "PA-ok", "PA-wait", "PA-none", "PA-missing", "PA-ok"]
+    access = resolve_access("U-viewer", ids)
+    assert {pid: (a["access"], a["pending"]) for pid, a in access.items()} == {
+        "PA-mine": (OWNER, False), "PA-pub": (PUBLIC, False), "PA-ok": (APPROVED, False),
+        "PA-wait": (None, True), "PA-none": (None, False),
+    }
+    assert access["PA-ok"]["owner_user_id"] == "U-owner"
+    assert resolve_access("U-viewer", []) == {}
+
+    assert can_view("U-viewer", "PA-ok") and can_view("U-owner", "PA-none")
+    assert not can_view("U-viewer", "PA-wait") and not can_view("U-viewer", "PA-missing")
+    assert can_view("U-inspector", "PA-none", user_type="inspector")
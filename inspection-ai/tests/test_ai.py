@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from utils import ai
+
+
+def test_mock_results_follow_the_name_not_a_cached_digest(tmp_path, monkeypatch):
+    monkeypatch.setattr(ai, "GEMINI_API_KEY", None)
+    photo = tmp_path / "blob"
+    photo.write_bytes(b"same content")
+    damp = ai.analyze_image_mock(str(photo), use_cache=True, filename="IMG_damp.jpg")
+    wiring = ai.analyze_image_mock(str(photo), use_cache=True, filename="IMG_exposed_wiring.jpg")
+    assert (damp["defect_type"], wiring["defect_type"]) == ("moisture", "electrical")
+
+
+def test_mock_mode_does_not_hash_the_image(tmp_path, monkeypatch):
+    monkeypatch.setattr(ai, "GEMINI_API_KEY", None)
+
+    def image_digest(path):
+        raise AssertionError("the mock never reads the cache")
+
+    monkeypatch.setattr(ai.analysis_cache, "image_digest", image_digest)
+    photo = tmp_path / "IMG_crack.jpg"
+    photo.write_bytes(b"content")
+    assert ai.analyze_image_mock(str(photo))["defect_type"] == "structural"
+    assert asyncio.run(ai.analyze_image_async(str(photo)))["defect_type"] == "structural"
+
+
+class _Reply:
+    def __init__(self, text):
+        self.text = text
+        self.usage_metadata = None
+
+
+def _photos(tmp_path, count):
+    from PIL import Image
+    paths = []
+    for i in range(count):
+        path = tmp_path / f"photo{i}.jpg"
+        Image.new("RGB", (64, 48), (40 * i, 90, 160)).save(path)
+        paths.append(str(path))
+    return paths
+
+
+@pytest.mark.parametrize("batch_reply", [
+    "not json at all",
+    '[{"index": 0, "defect_type": "moisture"}]',  # one result for two images
+    '[{"index": 0, "defect_type": "moisture"}, {"index": 0, "defect_type": "moisture"}]',
+    '{"index": 0, "defect_type": "moisture"}',
+])
+def test_bad_batch_reply_falls_back_per_image(tmp_path, monkeypatch, batch_reply):
+    monkeypatch.setattr(ai, "GEMINI_API_KEY", "test-key")
+    prompts = []
+
+    def generate(model_name, contents, tokens):
+        prompts.append(contents[0])
+        if contents[0] == ai.IMAGE_PROMPT:
+            return _Reply('{"defect_type": "Structural", "severity": "High", "description": "single"}')
+        return _Reply(batch_reply)
+
+    monkeypatch.setattr(ai, "_generate", generate)
+    results = ai.analyze_images_batch(_photos(tmp_path, 2), use_cache=False)
+
+    assert prompts[1:] == [ai.IMAGE_PROMPT, ai.IMAGE_PROMPT]
+    assert [(r["defect_type"], r["description"]) for r in results] == [("structural", "single")] * 2
+    assert ai.batch_stats[-1]["status"] == "fallback"
+
+
+def test_good_batch_reply_is_used_as_is(tmp_path, monkeypatch):
+    monkeypatch.setattr(ai, "GEMINI_API_KEY", "test-key")
+    prompts = []
+
+    def generate(model_name, contents, tokens):
+        prompts.append(contents[0])
+        return _Reply('[{"index": 1, "defect_type": "electrical"}, {"index": 0, "defect_type": "moisture"}]')
+
+    monkeypatch.setattr(ai, "_generate", generate)
+    results = ai.analyze_images_batch(_photos(tmp_path, 2), use_cache=False)
+
+    assert len(prompts) == 1 and prompts[0] != ai.IMAGE_PROMPT
+    assert [r["defect_type"] for r in results] == ["moisture", "electrical"]
+    assert ai.batch_stats[-1]["status"] == "ok"
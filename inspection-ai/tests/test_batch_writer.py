@@ -0,0 +1,33 @@
+import uuid
+
+from utils import db
+
+
+def test_failed_flush_rolls_back_every_row():
+    room_id = f"RM-{uuid.uuid4().hex[:8]}"
+    batch = db.BatchWriter()
+    batch.add("create_room", (room_id, "P-batch", "Kitchen", "kitchen"))
+    batch.add("create_room", (room_id, "P-batch", "Duplicate", "kitchen"))  # primary key clash
+    assert batch.flush() is None
+    assert db.run_query("SELECT 1 FROM ROOMS WHERE room_id = ?", (room_id,), use_cache=False).empty
+    assert len(batch) == 0
+
+
+def test_flush_writes_all_rows_and_counts_them():
+    room_id = f"RM-{uuid.uuid4().hex[:8]}"
+    with db.BatchWriter() as batch:
+        batch.add("create_room", (room_id, "P-batch", "Kitchen", "kitchen"))
+        batch.add("insert_finding", (f"F-{room_id}", room_id, "P-batch", "moisture", "Damp", "high", 0.9))
+    assert not db.run_query("SELECT 1 FROM INSPECTION_FINDINGS WHERE room_id = ?", (room_id,), use_cache=False).empty
+    assert db.BatchWriter().flush() == 0
+
+
+def test_block_that_raises_writes_nothing():
+    room_id = f"RM-{uuid.uuid4().hex[:8]}"
+    try:
+        with db.BatchWriter() as batch:
+            batch.add("create_room", (room_id, "P-batch", "Kitchen", "kitchen"))
+            raise RuntimeError("stop")
+    except RuntimeError:
+        pass
+    assert db.run_query("SELECT 1 FROM ROOMS WHERE room_id = ?", (room_id,), use_cache=False).empty
@@ -0,0 +1,38 @@
+import io
+import os
+import uuid
+
+from utils import db
+from utils.blobstore import BlobStore, LocalBackend, blob_key
+
+
+def _blob(digest):
+    return db.run_query("SELECT ref_count FROM BLOBS WHERE digest = ?", (digest,), use_cache=False)
+
+
+def _image(image_id, url):
+    db.execute_named("insert_image", (image_id, "S", "U", "P", "R", url, "photo.jpg", "none", 0.9, "ok", "ok"))
+
+
+def test_dedup_ref_counts_and_gc_grace(tmp_path):
+    store = BlobStore(LocalBackend(tmp_path / "blobs"), staging_dir=str(tmp_path / "staging"))
+    content = uuid.uuid4().bytes * 100
+    digest, url, size = store.put(io.BytesIO(content))
+    assert store.put(io.BytesIO(content))[:2] == (digest, url) and size == len(content)
+    assert len(_blob(digest)) == 1 and os.path.exists(url)
+
+    ids = [f"IMG-{uuid.uuid4().hex[:8]}" for _ in range(2)]
+    for image_id in ids:
+        _image(image_id, url)
+    assert _blob(digest).iloc[0]["ref_count"] == 2
+    db.execute("DELETE FROM INSPECTION_IMAGES WHERE image_id = ?", (ids[0],))
+    assert _blob(digest).iloc[0]["ref_count"] == 1
+    db.execute("UPDATE INSPECTION_IMAGES SET image_url = NULL WHERE image_id = ?", (ids[1],))
+    assert _blob(digest).iloc[0]["ref_count"] == 0
+
+    # Unreferenced, but still inside the grace period
+    assert store.gc(grace_hours=1) == 0 and os.path.exists(url)
+    db.execute("UPDATE BLOBS SET created_at = datetime('now', '-2 hours') WHERE digest = ?", (digest,))
+    assert store.gc(grace_hours=1) == 1
+    assert _blob(digest).empty and not os.path.exists(url)
+    assert not store.backend.exists(blob_key(digest))
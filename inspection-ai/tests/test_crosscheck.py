@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+from utils import crosscheck
+from utils.crosscheck import HashedTfidf
+
+REPORT = (
+    "The kitchen has a damp patch below the window. "
+    "Paintwork in the hallway is in fair condition throughout. "
+    "Exposed wiring was found behind the living room socket."
+)
+
+
+@pytest.fixture(autouse=True)
+def index_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(crosscheck, "EMBEDDING_DIR", str(tmp_path))
+    crosscheck._indexes.clear()
+    return tmp_path
+
+
+def test_same_topic_matches_and_unrelated_text_does_not():
+    embedder = HashedTfidf()
+    result = crosscheck.match(["Kitchen: moisture patch under the window", "Roof slates missing on the north slope"],
+                              REPORT, embedder)
+
+    assert result["matched_findings"] == 1 and result["total_findings"] == 2
+    assert result["matches"][0].startswith("Kitchen: moisture patch under the window")
+    assert "damp patch below the window" in result["matches"][0]
+    assert result["discrepancies"][0] == "AI found: Roof slates missing on the north slope (not in report)"
+    # Two defect sentences, only the kitchen one seen by the AI; the paintwork sentence isn't a defect
+    assert result["report_defects"] == 2 and result["unmatched_report"] == 1
+    assert result["similarity_score"] == round(100 * 2 / 4)
+
+    sentences, state, matrix, _ = crosscheck.report_index(REPORT, embedder)
+    scores = embedder.transform(state, ["Kitchen: moisture patch under the window",
+                                        "Roof slates missing on the north slope"]) @ matrix.T
+    assert scores[0].max() >= embedder.threshold > scores[1].max()
+
+
+def test_report_index_is_saved_and_reloaded(index_dir):
+    embedder = HashedTfidf()
+    sentences, state, matrix, defect_rows = crosscheck.report_index(REPORT, embedder)
+    files = os.listdir(index_dir)
+    assert len(files) == 1 and files[0].startswith("tfidf-") and files[0].endswith(".npz")
+
+    # A new process has only the file on disk
+    crosscheck._indexes.clear()
+    loaded = crosscheck.report_index(REPORT, embedder)
+    assert loaded[0] == sentences
+    assert (loaded[1]["idf"] == state["idf"]).all()
+    assert (loaded[2] == matrix).all() and (loaded[3] == defect_rows).all()
+
+
+def test_no_report_text():
+    result = crosscheck.match(["Cracked tile"], "", HashedTfidf())
+    assert result["similarity_score"] == 0 and result["matched_findings"] == 0
+    assert result["discrepancies"] == ["AI: Cracked tile (no report text to compare)"]
@@ -0,0 +1,8 @@
+from utils import db
+from utils.query_cache import get_query_cache
+
+
+def test_login_is_never_cached():
+    db.execute_named("create_user", ("U-login", "login@example.com", "hunter2", "normal_user", "Login Test", "1"))
+    assert db.run_named_query("login", ("login@example.com", "hunter2")).iloc[0]["user_id"] == "U-login"
+    assert not any("hunter2" in repr(key) for key in get_query_cache()._entries)
@@ -0,0 +1,34 @@
+import random
+
+import pytest
+
+from utils import documents
+from utils.db import BatchWriter
+
+
+def _pages(seed):
+    rng = random.Random(seed)
+    words = ["damp", "crack", "wall\n", "\n", "x" * 120, "ceiling ", "a"]
+    return [(n, "".join(rng.choice(words) for _ in range(rng.randint(0, 80)))) for n in range(1, 12)]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_chunks_cover_the_text_without_gaps(seed):
+    pages = _pages(seed)
+    text = "".join(page + "\n" for _, page in pages)
+    chunks = list(documents.iter_chunks(pages, chunk_chars=100))
+    joined = "".join(chunk for _, _, chunk in chunks)
+    assert text.startswith(joined) and not text[len(joined):].strip()
+    assert all(len(chunk) >= 50 for _, _, chunk in chunks[:-1])
+    assert all(start <= end for start, end, _ in chunks)
+
+
+def test_early_newline_does_not_make_a_tiny_chunk():
+    chunks = [chunk for _, _, chunk in documents.iter_chunks([(1, "a\n" + "b" * 250)], chunk_chars=100)]
+    assert [len(c) for c in chunks] == [100, 100, 53]
+
+
+def test_failed_write_raises(monkeypatch):
+    monkeypatch.setattr(BatchWriter, "flush", lambda self: None)
+    with pytest.raises(RuntimeError):
+        documents.ingest_document("DOC-unsaved", text="Damp below the window.\n")
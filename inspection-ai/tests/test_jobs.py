@@ -0,0 +1,13 @@
+from utils import jobs
+from utils.documents import document_text, ingest_document
+
+
+def test_final_failure_drops_the_document_chunks():
+    ingest_document("DOC-orphan", text="Damp below the window sill.\n" * 500)
+    assert document_text("DOC-orphan")
+    job_id = jobs.enqueue("analyze_document", {
+        "doc_id": "DOC-orphan", "file_url": "/nonexistent/report.txt", "pdf": False,
+        "property_id": "P-orphan", "user_id": "U-orphan", "filename": "report.txt",
+    }, group_id="P-orphan", max_attempts=1)
+    assert jobs.run_job(job_id) == jobs.FAILED
+    assert document_text("DOC-orphan") == ""
@@ -0,0 +1,32 @@
+import os
+import shutil
+import sqlite3
+
+from utils.migrations import MIGRATIONS, pending_migrations, run_migrations
+from utils.risk_scores import check_risk_scores
+
+# The database shipped with the repo predates the migrations
+SHIPPED_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "local_db.sqlite")
+
+
+def test_migrations_upgrade_an_existing_database_once(tmp_path):
+    path = tmp_path / "existing.sqlite"
+    shutil.copy(SHIPPED_DB, path)
+    conn = sqlite3.connect(path)
+    properties = conn.execute("SELECT COUNT(*) FROM PROPERTIES").fetchone()[0]
+
+    assert run_migrations(conn) == [version for version, _, _ in MIGRATIONS]
+    recorded = conn.execute("SELECT version, name FROM SCHEMA_VERSION ORDER BY version").fetchall()
+    assert recorded == [(version, name) for version, name, _ in MIGRATIONS]
+    assert run_migrations(conn) == []
+    assert pending_migrations(conn) == []
+    assert conn.execute("SELECT COUNT(*) FROM PROPERTIES").fetchone()[0] == properties
+    assert check_risk_scores(conn) == {"rooms": [], "properties": []}
+    conn.close()
+
+
+def test_new_database_migrates_to_the_same_version(tmp_path):
+    conn = sqlite3.connect(tmp_path / "new.sqlite")
+    run_migrations(conn)
+    assert conn.execute("SELECT MAX(version) FROM SCHEMA_VERSION").fetchone()[0] == MIGRATIONS[-1][0]
+    conn.close()
@@ -0,0 +1,48 @@
+import os
+import uuid
+
+from pypdf import PdfReader
+
+from utils import db, pdf
+
+
+def _property():
+    prop_id, room_id = f"PROP-{uuid.uuid4().hex[:8]}", f"ROOM-{uuid.uuid4().hex[:8]}"
+    db.execute_named("create_property", (prop_id, "12", "Maple Cottage", "12 Maple Lane", "U"))
+    db.execute_named("create_room", (room_id, prop_id, "Kitchen", "kitchen"))
+    return prop_id, room_id
+
+
+def _finding(prop_id, room_id, description):
+    db.execute_named("insert_finding", (f"F-{uuid.uuid4().hex[:8]}", room_id, prop_id,
+                                        "moisture", description, "medium", 0.8))
+
+
+def test_rendered_pdf_parses(tmp_path):
+    prop_id, room_id = _property()
+    _finding(prop_id, room_id, "Damp patch under the sink")
+    path = str(tmp_path / "report.pdf")
+    pages = pdf.render_property_pdf(prop_id, path)
+
+    reader = PdfReader(path)
+    assert len(reader.pages) == pages >= 1
+    text = "".join(page.extract_text() for page in reader.pages)
+    assert "Maple Cottage" in text and "Damp patch under the sink" in text
+
+
+def test_report_pdf_path_keeps_only_the_current_version(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf, "REPORT_DIR", str(tmp_path))
+    prop_id, room_id = _property()
+    _finding(prop_id, room_id, "Damp patch under the sink")
+    first = pdf.report_pdf_path(prop_id)
+    # A property whose id starts with this one keeps its own files
+    other = tmp_path / f"{prop_id}0-v1.pdf"
+    other.write_bytes(b"")
+
+    _finding(prop_id, room_id, "Cracked tile by the window")
+    second = pdf.report_pdf_path(prop_id)
+    assert second != first and not os.path.exists(first) and other.exists()
+    assert pdf.report_pdf_path(prop_id) == second
+    assert pdf.report_pdf_bytes(prop_id) == (tmp_path / os.path.basename(second)).read_bytes()
+    assert len(PdfReader(second).pages) >= 1
+    assert pdf.report_pdf_bytes("PROP-missing") == b""
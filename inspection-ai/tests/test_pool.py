@@ -0,0 +1,31 @@
+import pytest
+
+from utils.pool import ConnectionPool, PooledConnection
+
+
+def test_connections_are_reused_and_bounded(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.sqlite"), max_size=2, timeout=0.05)
+    with PooledConnection(pool) as first:
+        pass
+    with PooledConnection(pool) as again:
+        assert again is first
+    a, b = pool.acquire(), pool.acquire()
+    assert a is not b
+    with pytest.raises(TimeoutError):
+        pool.acquire()
+    stats = pool.stats()
+    assert (stats["open"], stats["hits"], stats["misses"], stats["timeouts"]) == (2, 2, 2, 1)
+    pool.release(b)
+    assert pool.acquire() is b
+    pool.close()
+
+
+def test_release_rolls_back_an_open_transaction(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "pool.sqlite"), max_size=1)
+    with PooledConnection(pool) as conn:
+        conn.execute("CREATE TABLE t (x)")
+        conn.commit()
+        conn.execute("INSERT INTO t VALUES (1)")
+    with PooledConnection(pool) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+    pool.close()
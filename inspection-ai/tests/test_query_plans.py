@@ -0,0 +1,29 @@
+import sqlite3
+
+import pytest
+
+from utils.migrations import run_migrations
+from utils.query_plans import KNOWN_SCANS, check_query_plans, full_scans, seed_database
+
+
+@pytest.fixture(scope="module")
+def seeded(tmp_path_factory):
+    conn = sqlite3.connect(tmp_path_factory.mktemp("plans") / "query_plans.sqlite")
+    run_migrations(conn)
+    seed_database(conn, rows=20_000)
+    yield conn
+    conn.close()
+
+
+def test_no_registered_query_scans_a_table(seeded):
+    # Every query outside KNOWN_SCANS needs PLAN_PARAMS and an index-backed plan
+    assert check_query_plans(seeded) == {}
+
+
+def test_full_scans_are_detected(seeded):
+    assert full_scans(seeded, "SELECT * FROM INSPECTION_FINDINGS WHERE finding_description = ?", ("x",))
+
+
+def test_known_scans_are_registered():
+    from utils.queries import QUERIES
+    assert set(KNOWN_SCANS) <= set(QUERIES)
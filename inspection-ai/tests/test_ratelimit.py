@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+from utils.ratelimit import HALF_OPEN, CircuitBreaker, Guard, RateLimiter
+
+
+class Interrupted(BaseException):
+    """Stands in for Streamlit's rerun/stop exceptions."""
+
+
+def _tripped_guard():
+    guard = Guard(RateLimiter(rpm=0, tpm=0), CircuitBreaker(failures=1, reset_timeout=0))
+    with pytest.raises(RuntimeError):
+        with guard.call():
+            raise RuntimeError("503")
+    return guard
+
+
+def test_interrupted_probe_frees_the_probe_slot():
+    guard = _tripped_guard()
+    with pytest.raises(Interrupted):
+        with guard.call():
+            raise Interrupted()
+    assert guard.breaker.allow() == HALF_OPEN
+
+
+def test_cancelled_async_probe_frees_the_probe_slot():
+    guard = _tripped_guard()
+
+    async def probe():
+        async with guard.call_async():
+            await asyncio.sleep(10)
+
+    async def cancel():
+        task = asyncio.ensure_future(probe())
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel())
+    assert guard.breaker.allow() == HALF_OPEN
@@ -0,0 +1,30 @@
+import uuid
+
+from utils import db
+from utils.reports import load_report
+
+
+def _id(prefix):
+    return f"{prefix}-{uuid.uuid4().hex[:8]}"
+
+
+def test_renamed_or_reassigned_inspector_is_not_served_stale():
+    user_id, other_id, inspector_id = _id("U"), _id("U"), _id("INS")
+    prop_id, room_id = _id("PROP"), _id("ROOM")
+    db.execute_named("create_user", (user_id, f"{user_id}@example.com", "pw", "inspector", "Ann Lee", ""))
+    db.execute_named("create_user", (other_id, f"{other_id}@example.com", "pw", "inspector", "Bo Chan", ""))
+    db.execute_named("create_inspector_profile", (inspector_id, user_id, "LIC-1"))
+    db.execute_named("create_property", (prop_id, "3", "Oak House", "3 Oak Road", user_id))
+    db.execute_named("create_room", (room_id, prop_id, "Loft", "loft"))
+    db.execute_named("insert_inspector_report", (_id("REP"), prop_id, inspector_id, 40, 45, 5, 42, "Fine"))
+
+    assert load_report(prop_id).inspector.inspector_name == "Ann Lee"
+    db.execute("UPDATE USERS SET full_name = ? WHERE user_id = ?", ("Ann Lee-Smith", user_id))
+    assert load_report(prop_id).inspector.inspector_name == "Ann Lee-Smith"
+    db.execute("UPDATE INSPECTOR_PROFILES SET user_id = ? WHERE inspector_id = ?", (other_id, inspector_id))
+    inspector = load_report(prop_id).inspector
+    assert (inspector.inspector_name, inspector.inspector_user_id) == ("Bo Chan", other_id)
+    # Unrelated users don't touch the report's version
+    version = load_report(prop_id).version
+    db.execute("UPDATE USERS SET full_name = 'Ann L.' WHERE user_id = ?", (user_id,))
+    assert load_report(prop_id).version == version
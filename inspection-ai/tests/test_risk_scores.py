@@ -0,0 +1,36 @@
+import sqlite3
+
+from utils.migrations import run_migrations
+from utils.risk_scores import check_risk_scores
+
+
+def test_triggers_keep_scores_equal_to_live_views(tmp_path):
+    conn = sqlite3.connect(tmp_path / "risk.sqlite")
+    run_migrations(conn)
+    check = lambda: check_risk_scores(conn) == {"rooms": [], "properties": []}
+    conn.executemany("INSERT INTO PROPERTIES (property_id, property_name, address) VALUES (?, ?, ?)",
+                     [("PA", "A", "1 Main"), ("PB", "B", "2 Oak")])
+    conn.executemany("INSERT INTO ROOMS (room_id, property_id, room_name, room_type) VALUES (?, ?, ?, ?)",
+                     [("R1", "PA", "Kitchen", "kitchen"), ("R2", "PA", "Bath", "bathroom"), ("R3", "PB", "Loft", "loft")])
+    conn.executemany("INSERT INTO INSPECTION_FINDINGS (finding_id, room_id, property_id, severity) VALUES (?, ?, ?, ?)",
+                     [("F1", "R1", "PA", "critical"), ("F2", "R1", "PA", "high"), ("F3", "R2", "PA", "medium"),
+                      ("F4", "R3", "PB", "low"), ("F5", "R3", "PB", "critical")])
+    assert check()
+
+    conn.execute("UPDATE INSPECTION_FINDINGS SET severity = 'low' WHERE finding_id = 'F1'")
+    conn.execute("UPDATE INSPECTION_FINDINGS SET room_id = 'R2' WHERE finding_id = 'F2'")
+    assert check()
+
+    # A room moving to another property takes its findings' scores with it
+    conn.execute("UPDATE ROOMS SET property_id = 'PB', room_name = 'Bathroom' WHERE room_id = 'R2'")
+    assert check()
+
+    conn.execute("DELETE FROM INSPECTION_FINDINGS WHERE finding_id = 'F5'")
+    conn.execute("DELETE FROM INSPECTION_FINDINGS WHERE room_id = 'R1'")
+    conn.execute("DELETE FROM ROOMS WHERE room_id = 'R1'")
+    conn.execute("UPDATE PROPERTIES SET property_name = 'A2' WHERE property_id = 'PA'")
+    assert check()
+    conn.execute("DELETE FROM INSPECTION_FINDINGS WHERE room_id = 'R3'")
+    conn.execute("DELETE FROM ROOMS WHERE room_id = 'R3'")
+    assert check()
+    conn.close()
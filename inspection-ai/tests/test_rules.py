@@ -0,0 +1,43 @@
+from utils.rules import Rule, RuleEngine, get_engine
+from utils.mock_backend import MockBackend, ZeroLatency
+
+RULES = [
+    Rule(1, "crack", "structural", "high", 0.85, "Structural integrity compromised"),
+    Rule(2, "exposed_wiring", "electrical", "critical", 1.00, "Immediate safety hazard"),
+    Rule(3, "damp", "moisture", "high", 0.80, "Water ingress issues"),
+]
+
+
+def test_separator_keywords_need_a_separator():
+    engine = RuleEngine(RULES)
+    assert engine.classify("Exposed  wiring behind the cooker").keyword == "exposed_wiring"
+    assert engine.classify("IMG_exposed-wiring.jpg").keyword == "exposed_wiring"
+    # Used to match the pattern and then raise KeyError on the normalized text
+    assert engine.matches("IMG_exposedwiring.jpg") == []
+
+
+def test_highest_risk_weight_wins():
+    engine = RuleEngine(RULES)
+    assert engine.classify("damp_crack.jpg").keyword == "crack"
+    assert engine.classify("sound plaster") is None
+
+
+def test_single_word_keywords_match_inside_words():
+    engine = get_engine()
+    assert engine.classify("uploads/Wallcrack.jpeg").category == "structural"
+    assert engine.classify("uploads/Wallcrack.jpeg").severity == "high"
+    assert engine.classify("bathroomdamp.jpg").category == "moisture"
+
+
+def test_mock_image_result_for_unknown_joined_keyword():
+    backend = MockBackend(ZeroLatency())
+    result = backend.image_result("IMG_exposedwiring.jpg")
+    assert result == backend.image_result("IMG_exposedwiring.jpg")
+    assert get_engine().classify("IMG_exposed_wiring.jpg").category == "electrical"
+
+
+def test_mock_chunk_result_uses_the_rules():
+    result = MockBackend(ZeroLatency()).chunk_result(
+        "The hallway is sound. A hairline crack runs above the door. Cable clips are loose near the meter.")
+    assert result["defects"] == ["electrical", "structural"]
+    assert "hallway" not in result["summary"]
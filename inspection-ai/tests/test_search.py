@@ -0,0 +1,11 @@
+from utils import db
+from utils.search import search_properties
+
+
+def test_short_queries_match_inside_house_numbers():
+    db.execute_named("create_property", ("P-search", "301", "Lake Villa", "12 Oak Rd", "U-search"))
+    for text in ("01", "30", "301", "lake vil"):
+        results, total = search_properties(text)
+        assert "P-search" in results["property_id"].tolist(), text
+        assert total >= len(results)
+    assert search_properties("%")[1] == 0
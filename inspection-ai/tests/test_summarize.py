@@ -0,0 +1,12 @@
+import asyncio
+
+from utils import summarize
+
+
+def test_async_summary_matches_sync_and_shares_its_cache():
+    text = summarize._sample_report(40, seed=3)
+    first = asyncio.run(summarize.summarize_document_async(text))
+    assert first.stats.chunks > 1 and first.stats.calls == first.stats.chunks + 1
+    again = summarize.summarize_document(text)
+    assert again.result == first.result
+    assert again.stats.calls == 0
@@ -0,0 +1,52 @@
+import json
+from utils.db import run_named_query
+
+# Report access control: who may open a property's Analysis Results.
+#
+# A user can view a report if they own the property, the report is public,
+# or they have an approved ACCESS_REQUESTS row for it. Inspectors may open
+# any report: can_view() does not check them. Analysis Results enforces
+# this with can_view(); before, any logged-in user who had a property id in
+# their session could open its report. resolve_access() answers this for a
+# whole page of search results with one query instead of one or two per row.
+
+OWNER = "owner"
+PUBLIC = "public"
+APPROVED = "approved"
+
+
+def resolve_access(user_id, property_ids):
+    """
+    Access state of user_id for each property, in one query.
+    Returns {property_id: {"access": "owner" | "public" | "approved" | None,
+                           "pending": bool, "owner_user_id": ...}}.
+    Unknown property ids are left out.
+    """
+    property_ids = list(dict.fromkeys(property_ids))
+    if not property_ids:
+        return {}
+    rows = run_named_query("access_resolve", (user_id, json.dumps(property_ids)))
+    access = {}
+    for row in rows.itertuples(index=False):
+        if row.owner_user_id == user_id:
+            level = OWNER
+        elif row.report_visibility == "public":
+            level = PUBLIC
+        elif row.approved:
+            level = APPROVED
+        else:
+            level = None
+        access[row.property_id] = {
+            "access": level,
+            "pending": level is None and bool(row.pending),
+            "owner_user_id": row.owner_user_id,
+        }
+    return access
+
+
+def can_view(user_id, property_id, user_type=None):
+    """True if the user may open the property's report."""
+    if user_type == "inspector":
+        return True
+    state = resolve_access(user_id, [property_id]).get(property_id)
+    return state is not None and state["access"] is not None
@@ -1,220 +1,400 @@
 import time
-import random
 import os
 import google.generativeai as genai
 from PIL import Image
 from dotenv import load_dotenv
 import json
+from collections import deque
+from functools import lru_cache
+from utils import analysis_cache
+from utils import mock_backend
+from utils import blobstore
+from utils import ratelimit
+from utils.images import analysis_image
 
 load_dotenv()
 
 # Configure Gemini
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if GEMINI_API_KEY:
+# Another endpoint speaking the REST API, e.g. the fake server in utils/ratelimit.py
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
+if GEMINI_API_KEY and GEMINI_API_ENDPOINT:
+    genai.configure(api_key=GEMINI_API_KEY, transport="rest", client_options={"api_endpoint": GEMINI_API_ENDPOINT})
+elif GEMINI_API_KEY:
     genai.configure(api_key=GEMINI_API_KEY)
 
-def analyze_image_mock(image_path_or_url, simulation_override=None):
+# Fail fast instead of the client's own retries (minutes on a 503); the
+# circuit breaker and the mock fallback handle failures (see utils/ratelimit.py)
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "60"))
+REQUEST_OPTIONS = {"timeout": GEMINI_TIMEOUT, "retry": None}
+
+VISION_MODEL = 'gemini-pro-vision'
+TEXT_MODEL = 'gemini-pro'
+MOCK_MODEL = 'mock'
+
+# Part of the analysis cache key - bump when IMAGE_PROMPT / BATCH_IMAGE_PROMPT change meaning
+IMAGE_PROMPT_VERSION = "v1"
+# Same for the document map-reduce prompts (_chunk_prompt / _document_prompt)
+SUMMARY_PROMPT_VERSION = "v1"
+
+IMAGE_PROMPT = """
+            Analyze this image of a room/property for defects. 
+            Return a JSON object ONLY with the following keys:
+            - defect_type: One of ["moisture", "electrical", "structural", "finishing", "none"]
+            - val_defect_name: Short name (e.g. "damp", "crack", "wire", "ok")
+            - severity: One of ["critical", "high", "medium", "low", "ok"]
+            - confidence: Float (0.0-1.0)
+            - description: Brief description not exceeding 20 words.
+            - action: Recommended action not exceeding 10 words.
+            
+            Focus on detecting: Water/Damp, Exposed Wiring, Cracks.
+            """
+
+BATCH_IMAGE_PROMPT = """
+            You are given {count} images of the same room/property, in order (image 0 to image {last}).
+            Analyze EACH image for defects independently.
+            Return a JSON array ONLY, with exactly {count} objects in image order, each with the keys:
+            - index: The image number (0-{last})
+            - defect_type: One of ["moisture", "electrical", "structural", "finishing", "none"]
+            - val_defect_name: Short name (e.g. "damp", "crack", "wire", "ok")
+            - severity: One of ["critical", "high", "medium", "low", "ok"]
+            - confidence: Float (0.0-1.0)
+            - description: Brief description not exceeding 20 words.
+            - action: Recommended action not exceeding 10 words.
+            
+            Focus on detecting: Water/Damp, Exposed Wiring, Cracks.
+            """
+
+BATCH_SIZE = int(os.getenv("GEMINI_BATCH_SIZE", "8"))
+# Tokens Gemini bills per image, for the TPM limit
+IMAGE_TOKENS = 258
+
+# Latency of recent batch requests, newest last (see analyze_images_batch)
+batch_stats = deque(maxlen=100)
+
+@lru_cache(maxsize=None)
+def _get_model(model_name):
+    """One GenerativeModel per model name, created on first use and reused for the process."""
+    return genai.GenerativeModel(model_name)
+
+def _total_tokens(response):
+    return getattr(getattr(response, "usage_metadata", None), "total_token_count", None)
+
+def _generate(model_name, contents, tokens):
+    """generate_content through the shared rate limiter and circuit breaker (utils/ratelimit.py)."""
+    with ratelimit.gemini.call(tokens):
+        response = _get_model(model_name).generate_content(contents, request_options=REQUEST_OPTIONS)
+    ratelimit.gemini.settle(tokens, _total_tokens(response))
+    return response
+
+async def _generate_async(model_name, contents, tokens):
+    async with ratelimit.gemini.call_async(tokens):
+        response = await _get_model(model_name).generate_content_async(contents, request_options=REQUEST_OPTIONS)
+    ratelimit.gemini.settle(tokens, _total_tokens(response))
+    return response
+
+def _parse_json(text):
+    return json.loads(text.replace("```json", "").replace("```", "").strip())
+
+def _normalize_image_result(result):
+    return {
+        "defect_type": result.get("defect_type", "none").lower(),
+        "val_defect_name": result.get("val_defect_name", "ok"),
+        "severity": result.get("severity", "ok").lower(),
+        "confidence": result.get("confidence", 0.9),
+        "description": result.get("description", "Analyzed by AI"),
+        "action": result.get("action", "None")
+    }
+
+def _load_image(image_path_or_url):
+    # If using local file storage pattern from s3.py, it might be an absolute path
+    image_path_or_url = blobstore.local_path(image_path_or_url)
+    if not isinstance(image_path_or_url, str) or not os.path.exists(image_path_or_url):
+        return None
+    try:
+        # Downscaled, upright JPEG (utils/images.py) instead of the full-size upload
+        return Image.open(analysis_image(image_path_or_url))
+    except Exception as e:
+        print(f"Could not open image {image_path_or_url}: {e}")
+        return None
+
+def analyze_image_mock(image_path_or_url, simulation_override=None, use_cache=True, filename=None):
     """
     Hybrid function: 
     1. Checks for Simulation Override (User Forces Result).
     2. Tries Gemini API (if key exists and no override).
     3. Falls back to Mock (Random/Filename).
+    Gemini results are cached by image content (see utils/analysis_cache.py).
+    Mock results are not: the mock classifies by filename, the original upload
+    name (stored blobs are named by digest), so the same content can get a
+    different result under another name.
     """
     
     # 0. Simulation Override
     if simulation_override and simulation_override != "auto":
-        time.sleep(1.0)
-        if simulation_override == "damp":
-            return {
-                "defect_type": "moisture",
-                "val_defect_name": "damped wall",
-                "severity": "critical",
-                "confidence": 0.99,
-                "description": "Simulated: Detected severe dampness and potential mold.",
-                "action": "Urgent: Waterproofing required immediately."
-            }
-        elif simulation_override == "wiring":
-             return {
-                "defect_type": "electrical",
-                "val_defect_name": "exposed wiring",
-                "severity": "critical",
-                "confidence": 0.99,
-                "description": "Simulated: Exposed electrical wiring detected.",
-                "action": "Danger: Isolate circuit and call electrician."
-            }
-        elif simulation_override == "structural":
-             return {
-                "defect_type": "structural",
-                "val_defect_name": "structural cracks",
-                "severity": "high",
-                "confidence": 0.99,
-                "description": "Simulated: Major structural cracking detected.",
-                "action": "Consult structural engineer."
-            }
-        elif simulation_override == "ok":
-             return {
-                "defect_type": "none",
-                "val_defect_name": "ok",
-                "severity": "ok",
-                "confidence": 0.99,
-                "description": "Simulated: No defects found.",
-                "action": "None"
-            }
+        backend = mock_backend.get_backend()
+        backend.wait(mock_backend.SIMULATION)
+        simulated = backend.simulated_result(simulation_override)
+        if simulated:
+            return simulated
     
     # 1. Try Gemini API
     if GEMINI_API_KEY:
+        digest = analysis_cache.image_digest(image_path_or_url) if use_cache else None
+        cached = analysis_cache.get_cached(digest, VISION_MODEL, IMAGE_PROMPT_VERSION)
+        if cached:
+            return cached
+        img = _load_image(image_path_or_url)
+        if img is None:
+            return _mock_fallback(filename or image_path_or_url)
         try:
-            model = genai.GenerativeModel('gemini-pro-vision')
-            
-            # Load Image
-            if isinstance(image_path_or_url, str):
-                sim_path = image_path_or_url
-                # If using local file storage pattern from s3.py, it might be an absolute path
-                if os.path.exists(sim_path):
-                     img = Image.open(sim_path)
-                else:
-                     return _mock_fallback(image_path_or_url)
-            else:
-                return _mock_fallback(image_path_or_url)
-
-            prompt = """
-            Analyze this image of a room/property for defects. 
-            Return a JSON object ONLY with the following keys:
-            - defect_type: One of ["moisture", "electrical", "structural", "finishing", "none"]
-            - val_defect_name: Short name (e.g. "damp", "crack", "wire", "ok")
-            - severity: One of ["critical", "high", "medium", "low", "ok"]
-            - confidence: Float (0.0-1.0)
-            - description: Brief description not exceeding 20 words.
-            - action: Recommended action not exceeding 10 words.
-            
-            Focus on detecting: Water/Damp, Exposed Wiring, Cracks.
-            """
-            
-            response = model.generate_content([prompt, img])
-            text = response.text.replace("```json", "").replace("```", "").strip()
-            result = json.loads(text)
-            
-            return {
-                "defect_type": result.get("defect_type", "none").lower(),
-                "val_defect_name": result.get("val_defect_name", "ok"),
-                "severity": result.get("severity", "ok").lower(),
-                "confidence": result.get("confidence", 0.9),
-                "description": result.get("description", "Analyzed by AI"),
-                "action": result.get("action", "None")
-            }
+            start = time.perf_counter()
+            response = _generate(VISION_MODEL, [IMAGE_PROMPT, img], estimate_tokens(IMAGE_PROMPT) + IMAGE_TOKENS)
+            mock_backend.record_latency(mock_backend.IMAGE, time.perf_counter() - start)
+            result = _normalize_image_result(_parse_json(response.text))
+            analysis_cache.put_cached(digest, VISION_MODEL, IMAGE_PROMPT_VERSION, result)
+            return result
             
         except Exception as e:
             print(f"Gemini API Error: {e}")
             # Fall through to mock
     
-    return _mock_fallback(image_path_or_url)
+    return _mock_fallback(filename or image_path_or_url)
 
-def _mock_fallback(image_path_or_url):
-    """Fallback Mock logic based on keywords or random weights."""
-    time.sleep(1.0)
-    filename = str(image_path_or_url).lower()
+async def analyze_image_async(image_path_or_url, simulation_override=None, use_cache=True, filename=None):
+    """Async counterpart of analyze_image_mock (same override/cache/fallback order)."""
+    if simulation_override and simulation_override != "auto":
+        backend = mock_backend.get_backend()
+        await backend.wait_async(mock_backend.SIMULATION)
+        simulated = backend.simulated_result(simulation_override)
+        if simulated:
+            return simulated
     
-    # Keyword detection
-    if any(x in filename for x in ["damp", "wet", "mold", "water"]):
-        return {"defect_type": "moisture", "val_defect_name": "damped wall", "severity": "critical", "confidence": 0.96, "description": "Detected dampness.", "action": "Treat mold."}
-    if any(x in filename for x in ["wire", "cable", "electric"]):
-         return {"defect_type": "electrical", "val_defect_name": "exposed wiring", "severity": "critical", "confidence": 0.98, "description": "Exposed wiring.", "action": "Call electrician."}
-    if any(x in filename for x in ["crack", "split"]):
-        return {"defect_type": "structural", "val_defect_name": "cracks", "severity": "high", "confidence": 0.92, "description": "Structural cracks.", "action": "Engineer check."}
-
-    # Random Fallback
-    outcomes = [
-        {"type": "moisture", "name": "damped wall", "sev": "critical", "desc": "Wall saturation detected.", "act": "Waterproof now."},
-        {"type": "electrical", "name": "exposed wiring", "sev": "critical", "desc": "Dangerous wiring detected.", "act": "Fix wiring."},
-        {"type": "structural", "name": "structural cracks", "sev": "high", "desc": "Wall fractures detected.", "act": "Monitor cracks."},
-        {"type": "none", "name": "ok", "sev": "ok", "desc": "No defects.", "act": "None."}
-    ]
-    # Default to finding something for demo
-    choice = random.choices(outcomes, weights=[30, 30, 30, 10], k=1)[0]
-    return {
-        "defect_type": choice["type"], "val_defect_name": choice["name"], 
-        "severity": choice["sev"], "confidence": 0.9, 
-        "description": choice["desc"], "action": choice["act"]
-    }
+    if GEMINI_API_KEY:
+        digest = analysis_cache.image_digest(image_path_or_url) if use_cache else None
+        cached = analysis_cache.get_cached(digest, VISION_MODEL, IMAGE_PROMPT_VERSION)
+        if cached:
+            return cached
+        img = _load_image(image_path_or_url)
+        if img is None:
+            return await _mock_fallback_async(filename or image_path_or_url)
+        try:
+            start = time.perf_counter()
+            response = await _generate_async(VISION_MODEL, [IMAGE_PROMPT, img], estimate_tokens(IMAGE_PROMPT) + IMAGE_TOKENS)
+            mock_backend.record_latency(mock_backend.IMAGE, time.perf_counter() - start)
+            result = _normalize_image_result(_parse_json(response.text))
+            analysis_cache.put_cached(digest, VISION_MODEL, IMAGE_PROMPT_VERSION, result)
+            return result
+        except Exception as e:
+            print(f"Gemini API Error: {e}")
+    
+    return await _mock_fallback_async(filename or image_path_or_url)
 
-def analyze_document_text(text_content):
+def analyze_images_batch(image_paths, simulation_override=None, batch_size=None, use_cache=True, filenames=None):
     """
-    Analyzes text from an inspection report to extract summary and suggestions.
-    Uses Gemini Pro if available, otherwise mocks.
+    Analyzes several images of the same room with one Gemini request per
+    batch (structured JSON array response). Returns results in input order.
+    Cached images are answered locally and left out of the requests.
+    Falls back to per-image analyze_image_mock for a batch whose response
+    can't be parsed, and for overrides / mock mode.
     """
-    
-    # 1. Try Gemini API
-    if GEMINI_API_KEY:
-        try:
-            model = genai.GenerativeModel('gemini-pro')
+    filenames = filenames or [None] * len(image_paths)
+    if (simulation_override and simulation_override != "auto") or not GEMINI_API_KEY:
+        return [analyze_image_mock(p, simulation_override=simulation_override, use_cache=use_cache, filename=n)
+                for p, n in zip(image_paths, filenames)]
+
+    batch_size = batch_size or BATCH_SIZE
+    digests = [analysis_cache.image_digest(p) if use_cache else None for p in image_paths]
+    results = [analysis_cache.get_cached(d, VISION_MODEL, IMAGE_PROMPT_VERSION) for d in digests]
+    pending = [i for i, r in enumerate(results) if not r]
+    for start in range(0, len(pending), batch_size):
+        idxs = pending[start:start + batch_size]
+        batch = _analyze_batch([image_paths[i] for i in idxs], [digests[i] for i in idxs], use_cache,
+                               [filenames[i] for i in idxs])
+        for i, result in zip(idxs, batch):
+            results[i] = result
+    return results
+
+def _analyze_batch(paths, digests, use_cache=True, filenames=None):
+    # Missing files can't be sent; they get the same mock treatment as in analyze_image_mock
+    paths = [blobstore.local_path(p) for p in paths]
+    filenames = filenames or [None] * len(paths)
+    sendable = [i for i, p in enumerate(paths) if isinstance(p, str) and os.path.exists(p)]
+    results = [None] * len(paths)
+    for i in range(len(paths)):
+        if i not in sendable:
+            results[i] = _mock_fallback(filenames[i] or paths[i])
+    if not sendable:
+        return results
+
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        images = [Image.open(analysis_image(paths[i])) for i in sendable]
+        prompt = BATCH_IMAGE_PROMPT.format(count=len(images), last=len(images) - 1)
+        response = _generate(VISION_MODEL, [prompt, *images], estimate_tokens(prompt) + IMAGE_TOKENS * len(images))
+        parsed = _parse_json(response.text)
+        if not isinstance(parsed, list) or len(parsed) != len(images):
+            raise ValueError(f"expected a list of {len(images)} results")
+        for pos, item in enumerate(parsed):
+            idx = item.get("index")
+            if not isinstance(idx, int) or not 0 <= idx < len(images):
+                idx = pos
+            results[sendable[idx]] = _normalize_image_result(item)
+        if any(results[i] is None for i in sendable):
+            raise ValueError("duplicate or missing image indexes")
+        for i in sendable:
+            analysis_cache.put_cached(digests[i], VISION_MODEL, IMAGE_PROMPT_VERSION, results[i])
+    except Exception as e:
+        print(f"Gemini batch error, retrying per image: {e}")
+        status = "fallback"
+        for i in sendable:
+            results[i] = analyze_image_mock(paths[i], use_cache=use_cache, filename=filenames[i])
+
+    if status == "ok":
+        mock_backend.record_latency(mock_backend.BATCH, time.perf_counter() - start)
+    batch_stats.append({
+        "images": len(sendable),
+        "latency_s": round(time.perf_counter() - start, 3),
+        "status": status,
+    })
+    return results
+
+def _mock_fallback(image_path_or_url):
+    """Mock image result, after the configured mock latency (see utils/mock_backend.py)."""
+    backend = mock_backend.get_backend()
+    backend.wait(mock_backend.IMAGE)
+    return backend.image_result(image_path_or_url)
+
+async def _mock_fallback_async(image_path_or_url):
+    backend = mock_backend.get_backend()
+    await backend.wait_async(mock_backend.IMAGE)
+    return backend.image_result(image_path_or_url)
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token) for chunking and usage reports."""
+    return -(-len(text) // 4)
+
+def _chunk_prompt(text):
+    return f"""
+            You are an expert civil engineer. The following text is one part of a longer technical inspection report.
+            Summarize the defects, their locations and any recommendations it mentions in at most 3 sentences.
             
-            prompt = f"""
-            You are an expert civil engineer. Read the following technical inspection report text and provide:
-            1. A concise summary (max 3 sentences).
+            Input Text:
+            "{text}"
+            
+            Return output as JSON with keys: "summary", "defects" (list of short defect names).
+            """
+
+def _document_prompt(notes):
+    return f"""
+            You are an expert civil engineer. Below is a technical inspection report, or summaries of its parts in order. Provide:
+            1. A concise summary of the whole report (max 3 sentences).
             2. A list of actionable suggestions/changes based on defects (max 3 items).
             
             Input Text:
-            "{text_content[:2000]}..." 
+            {notes}
             
             Return output as JSON with keys: "ai_summary", "ai_suggestions".
             """
-            
-            response = model.generate_content(prompt)
-            clean_text = response.text.replace("```json", "").replace("```", "").strip()
-            return json.loads(clean_text)
-            
-        except Exception as e:
-            print(f"Gemini Text API Error: {e}")
-            # Fallback
-            
-    # Mock Fallback
-    time.sleep(1.5)
+
+def _usage(model, prompt, output, seconds, response=None):
+    meta = getattr(response, "usage_metadata", None)
     return {
-        "ai_summary": "Simulated Analysis: The document appears to clearly outline structural and moisture issues. It recommends immediate waterproofing.",
-        "ai_suggestions": "- Apply hydrophobic coating to exterior walls.\n- Replace corroded piping in the utility area.\n- verify load-bearing columns."
+        "model": model,
+        "input_tokens": getattr(meta, "prompt_token_count", None) or estimate_tokens(prompt),
+        "output_tokens": getattr(meta, "candidates_token_count", None) or estimate_tokens(output),
+        "seconds": round(seconds, 3),
     }
 
-def compare_findings_with_report(ai_findings_text, inspector_report_text):
-    """
-    Compares AI visual findings vs Inspector's textual report.
-    Returns similarity score and differences.
-    """
+def _generate_summary(prompt, kind, mock_result):
+    """One text call returning (result, usage); falls back to mock_result() like the other calls."""
     if GEMINI_API_KEY:
         try:
-            model = genai.GenerativeModel('gemini-pro')
-            prompt = f"""
-            Compare these two sets of findings from a property inspection:
-            
-            Set A (AI Visual Analysis):
-            {ai_findings_text[:2000]}
+            start = time.perf_counter()
+            response = _generate(TEXT_MODEL, prompt, estimate_tokens(prompt))
+            elapsed = time.perf_counter() - start
+            mock_backend.record_latency(kind, elapsed)
+            return _parse_json(response.text), _usage(TEXT_MODEL, prompt, response.text, elapsed, response)
+        except Exception as e:
+            print(f"Gemini Text API Error: {e}")
+    
+    start = time.perf_counter()
+    mock_backend.get_backend().wait(kind)
+    result = mock_result()
+    return result, _usage(MOCK_MODEL, prompt, json.dumps(result), time.perf_counter() - start)
+
+async def _generate_summary_async(prompt, kind, mock_result):
+    """Async counterpart of _generate_summary."""
+    if GEMINI_API_KEY:
+        try:
+            start = time.perf_counter()
+            response = await _generate_async(TEXT_MODEL, prompt, estimate_tokens(prompt))
+            elapsed = time.perf_counter() - start
+            mock_backend.record_latency(kind, elapsed)
+            return _parse_json(response.text), _usage(TEXT_MODEL, prompt, response.text, elapsed, response)
+        except Exception as e:
+            print(f"Gemini Text API Error: {e}")
+    
+    start = time.perf_counter()
+    await mock_backend.get_backend().wait_async(kind)
+    result = mock_result()
+    return result, _usage(MOCK_MODEL, prompt, json.dumps(result), time.perf_counter() - start)
+
+def summarize_chunk(text):
+    """Map step: summary and defect list for one part of a document. Returns (result, usage)."""
+    return _generate_summary(_chunk_prompt(text), mock_backend.CHUNK,
+                             lambda: mock_backend.get_backend().chunk_result(text))
+
+def reduce_summaries(notes):
+    """Reduce step: ai_summary / ai_suggestions from the part summaries. Returns (result, usage)."""
+    return _generate_summary(_document_prompt(notes), mock_backend.DOCUMENT,
+                             lambda: mock_backend.get_backend().document_result(notes))
+
+async def summarize_chunk_async(text):
+    """Async counterpart of summarize_chunk."""
+    return await _generate_summary_async(_chunk_prompt(text), mock_backend.CHUNK,
+                                         lambda: mock_backend.get_backend().chunk_result(text))
+
+async def reduce_summaries_async(notes):
+    """Async counterpart of reduce_summaries."""
+    return await _generate_summary_async(_document_prompt(notes), mock_backend.DOCUMENT,
+                                         lambda: mock_backend.get_backend().document_result(notes))
+
+def _narrative_prompt(comparison):
+    matches = "\n".join(f"- {m}" for m in comparison["matches"]) or "- none"
+    discrepancies = "\n".join(f"- {d}" for d in comparison["discrepancies"]) or "- none"
+    return f"""
+            An inspector's report was cross-checked against AI visual findings of the same property.
+            {comparison["matched_findings"]} of {comparison["total_findings"]} AI findings are backed by the report; {comparison["unmatched_report"]} of {comparison["report_defects"]} defects in the report were not seen by the AI. Similarity score: {comparison["similarity_score"]}%.
             
-            Set B (Inspector's Report):
-            {inspector_report_text[:2000]}
+            Matches:
+            {matches}
             
-            Task:
-            1. Calculate a "Similarity Score" (0-100) representing how much Set A agrees with Set B.
-            2. List "Matches" (Issues found in BOTH).
-            3. List "Discrepancies" (Issues found in ONE but NOT the other).
+            Discrepancies:
+            {discrepancies}
             
-            Return JSON:
-            {{
-                "similarity_score": int,
-                "matches": ["item1", "item2"],
-                "discrepancies": ["item1", "item2"],
-                "summary": "Brief analysis of comparison"
-            }}
+            Write a brief analysis of the comparison (max 3 sentences) for the inspector.
+            Return JSON with the key "summary".
             """
-            response = model.generate_content(prompt)
-            clean_text = response.text.replace("```json", "").replace("```", "").strip()
-            return json.loads(clean_text)
-        except Exception as e:
-            print(f"Comparison Error: {e}")
-            
-    # Mock
-    time.sleep(1.5)
-    return {
-        "similarity_score": 85,
-        "matches": ["Damp in Master Bedroom verified", "Kitchen wiring issues verified"],
-        "discrepancies": ["AI detected hairline cracks in Living Room (Not in Report)", "Inspector notes roof tile damage (AI did not see roof)"],
-        "summary": "High agreement on major interior issues. AI found minor wall cracks missed by report. Report includes exterior roof analysis not covered by AI images."
-    }
+
+def cross_check_narrative(comparison):
+    """Narrative summary for a locally computed comparison (utils/crosscheck.py). Returns (summary, usage)."""
+    result, usage = _generate_summary(_narrative_prompt(comparison), mock_backend.COMPARISON,
+                                      lambda: mock_backend.get_backend().narrative_result(comparison))
+    return result.get("summary", ""), usage
+
+def analyze_document_text(text_content):
+    """
+    Analyzes text from an inspection report to extract summary and suggestions.
+    The whole text is used: it is summarized chunk by chunk, then reduced
+    (utils/summarize.py). Uses Gemini Pro if available, otherwise mocks.
+    """
+    # Imported here: utils.summarize builds on the calls in this module
+    from utils.summarize import summarize_document
+    return summarize_document(text_content).result
+
+async def analyze_document_text_async(text_content):
+    """Async counterpart of analyze_document_text (map calls run concurrently on the event loop)."""
+    from utils.summarize import summarize_document_async
+    return (await summarize_document_async(text_content)).result
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+import threading
+from utils.db import get_db_connection
+from utils.queries import get_query
+from utils.blobstore import digest_from_url, local_path
+
+# Persistent cache of AI image-analysis results in AI_ANALYSIS_CACHE.
+#
+# Keyed by (sha256 of the image bytes, model, prompt version), so the same
+# photo uploaded again - under any filename - is answered from SQLite instead
+# of re-calling Gemini. Entries unused for AI_CACHE_TTL_DAYS are dropped and
+# the table is trimmed to AI_CACHE_MAX_ENTRIES, least recently used first.
+# Set AI_CACHE=off (or pass use_cache=False to the utils.ai functions) to
+# bypass it.
+
+AI_CACHE_ENABLED = os.getenv("AI_CACHE", "on").lower() not in ("off", "0", "false")
+AI_CACHE_TTL_DAYS = int(os.getenv("AI_CACHE_TTL_DAYS", "30"))
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "10000"))
+EVICT_EVERY = 50  # puts between eviction passes
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "puts": 0, "evicted": 0}
+
+
+def image_digest(path, chunk_size=1 << 20):
+    """sha256 of a local file's contents, or None if it isn't a readable file."""
+    # Blob store paths are named by their sha256 already
+    digest = digest_from_url(path)
+    if digest:
+        return digest
+    path = local_path(path)
+    if not isinstance(path, str) or not os.path.isfile(path):
+        return None
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _ttl():
+    return f"-{AI_CACHE_TTL_DAYS} days"
+
+
+def get_cached(digest, model, prompt_version):
+    """Cached result dict, or None on a miss."""
+    if not digest or not AI_CACHE_ENABLED:
+        return None
+    try:
+        with get_db_connection() as conn:
+            row = conn.execute(get_query("ai_cache_get"), (digest, model, prompt_version, _ttl())).fetchone()
+            if row is not None:
+                conn.execute(get_query("ai_cache_touch"), (digest, model, prompt_version))
+                conn.commit()
+    except Exception as e:
+        print(f"AI cache read failed: {e}")
+        return None
+
+    with _lock:
+        _stats["hits" if row is not None else "misses"] += 1
+    return json.loads(row[0]) if row is not None else None
+
+
+def put_cached(digest, model, prompt_version, result):
+    if not digest or not AI_CACHE_ENABLED:
+        return
+    try:
+        with get_db_connection() as conn:
+            conn.execute(get_query("ai_cache_put"), (digest, model, prompt_version, json.dumps(result)))
+            conn.commit()
+    except Exception as e:
+        print(f"AI cache write failed: {e}")
+        return
+
+    with _lock:
+        _stats["puts"] += 1
+        evict = _stats["puts"] % EVICT_EVERY == 0
+    if evict:
+        evict_expired()
+
+
+def evict_expired():
+    """Drop entries past the TTL, then trim to AI_CACHE_MAX_ENTRIES (LRU)."""
+    with get_db_connection() as conn:
+        removed = conn.execute(get_query("ai_cache_expire"), (_ttl(),)).rowcount
+        removed += conn.execute(get_query("ai_cache_trim"), (AI_CACHE_MAX_ENTRIES,)).rowcount
+        conn.commit()
+    with _lock:
+        _stats["evicted"] += removed
+    return removed
+
+
+def cache_stats():
+    """In-process hit/miss counters plus the persisted entry count."""
+    with _lock:
+        stats = dict(_stats)
+    with get_db_connection() as conn:
+        stats["entries"] = conn.execute(get_query("ai_cache_count")).fetchone()[0]
+    return stats
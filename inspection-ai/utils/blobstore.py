@@ -0,0 +1,240 @@
+import os
+import re
+import glob
+import uuid
+import hashlib
+import argparse
+import threading
+from utils.db import execute_named, run_named_query
+
+try:
+    import boto3
+except ImportError:  # only needed for BLOB_BACKEND=s3
+    boto3 = None
+
+# Content-addressed storage for uploaded images and reports.
+#
+# Uploads are streamed in chunks to a staging file while their sha256 is
+# computed, then moved into place under the digest, sharded two levels deep
+# (blobs/ab/cd/abcd...). The same bytes uploaded twice - under any name -
+# are stored once. Every blob has a row in BLOBS whose ref_count triggers
+# keep in step with INSPECTION_IMAGES.image_url and
+# INSPECTION_DOCUMENTS.file_url (migration 0006), so unreferenced blobs can
+# be collected:
+#
+#     python -m utils.blobstore stats
+#     python -m utils.blobstore gc            # delete blobs unreferenced for BLOB_GC_GRACE_HOURS
+#
+# BLOB_BACKEND=s3 stores blobs in an S3-compatible bucket instead (boto3;
+# point BLOB_S3_ENDPOINT at MinIO/localstack for a local stand-in).
+
+BLOB_BACKEND = os.getenv("BLOB_BACKEND", "local")
+BLOB_ROOT = os.getenv("BLOB_ROOT", os.path.join("uploads", "blobs"))
+BLOB_S3_BUCKET = os.getenv("BLOB_S3_BUCKET")
+BLOB_S3_PREFIX = os.getenv("BLOB_S3_PREFIX", "blobs/")
+BLOB_S3_ENDPOINT = os.getenv("BLOB_S3_ENDPOINT")
+BLOB_GC_GRACE_HOURS = int(os.getenv("BLOB_GC_GRACE_HOURS", "24"))
+CHUNK_SIZE = 1 << 20
+
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def blob_key(digest):
+    """Sharded relative key for a digest: 'ab/cd/abcd...'."""
+    return f"{digest[:2]}/{digest[2:4]}/{digest}"
+
+
+def digest_from_url(url):
+    """The sha256 a blob URL/path was stored under, or None for other paths."""
+    if not isinstance(url, str):
+        return None
+    name = url.replace("\\", "/").rsplit("/", 1)[-1]
+    return name if _DIGEST_RE.match(name) else None
+
+
+class LocalBackend:
+    """Blobs as files under root; URLs are absolute paths."""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def _path(self, key):
+        return os.path.join(self.root, *key.split("/"))
+
+    def exists(self, key):
+        return os.path.exists(self._path(key))
+
+    def put_file(self, key, tmp_path):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Atomic: readers see the old file (none) or the complete new one
+        os.replace(tmp_path, path)
+
+    def url(self, key):
+        return self._path(key).replace("\\", "/")
+
+    def local_path(self, url):
+        return url
+
+    def delete(self, key):
+        # The blob plus any derivatives cached next to it (utils/images.py)
+        path = self._path(key)
+        for p in [path] + glob.glob(glob.escape(path) + ".*"):
+            try:
+                os.remove(p)
+            except FileNotFoundError:
+                pass
+
+
+class S3Backend:
+    """Blobs as objects in an S3-compatible bucket; URLs are s3://bucket/key."""
+
+    def __init__(self, bucket, prefix="blobs/", endpoint_url=None, cache_dir=None):
+        if boto3 is None:
+            raise RuntimeError("BLOB_BACKEND=s3 requires boto3 (pip install boto3)")
+        if not bucket:
+            raise RuntimeError("BLOB_BACKEND=s3 requires BLOB_S3_BUCKET")
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+        # Local read-through copies for PIL / pypdf
+        self.cache = LocalBackend(cache_dir or os.path.join(BLOB_ROOT, ".s3cache"))
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.prefix + key)
+            return True
+        except self.client.exceptions.ClientError:
+            return False
+
+    def put_file(self, key, tmp_path):
+        self.client.upload_file(tmp_path, self.bucket, self.prefix + key)
+        self.cache.put_file(key, tmp_path)
+
+    def url(self, key):
+        return f"s3://{self.bucket}/{self.prefix}{key}"
+
+    def local_path(self, url):
+        digest = digest_from_url(url)
+        if digest is None:
+            return url
+        key = blob_key(digest)
+        if not self.cache.exists(key):
+            tmp = os.path.join(self.cache.root, f".tmp-{uuid.uuid4().hex}")
+            os.makedirs(self.cache.root, exist_ok=True)
+            self.client.download_file(self.bucket, self.prefix + key, tmp)
+            self.cache.put_file(key, tmp)
+        return self.cache.url(key)
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self.prefix + key)
+        self.cache.delete(key)
+
+
+class BlobStore:
+    def __init__(self, backend, staging_dir=None):
+        self.backend = backend
+        self.staging_dir = staging_dir or os.path.join(BLOB_ROOT, ".staging")
+
+    def put(self, file_obj):
+        """
+        Store an uploaded file. Returns (digest, url, size_bytes).
+        The file is read from the start in CHUNK_SIZE pieces, never whole.
+        """
+        os.makedirs(self.staging_dir, exist_ok=True)
+        tmp_path = os.path.join(self.staging_dir, f"{uuid.uuid4().hex}.part")
+        h = hashlib.sha256()
+        size = 0
+        if hasattr(file_obj, "seek"):
+            file_obj.seek(0)
+        try:
+            with open(tmp_path, "wb") as out:
+                for chunk in iter(lambda: file_obj.read(CHUNK_SIZE), b""):
+                    h.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+            digest = h.hexdigest()
+            key = blob_key(digest)
+            url = self.backend.url(key)
+            # Register first: this also restarts the gc grace period of an
+            # unreferenced blob we are about to reuse
+            execute_named("blob_register", (digest, url, size))
+            if self.backend.exists(key):
+                os.remove(tmp_path)
+            else:
+                self.backend.put_file(key, tmp_path)
+            return digest, url, size
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def local_path(self, url):
+        return self.backend.local_path(url)
+
+    def gc(self, grace_hours=None):
+        """Delete blobs that have been unreferenced for longer than grace_hours. Returns the count."""
+        grace = grace_hours if grace_hours is not None else BLOB_GC_GRACE_HOURS
+        candidates = run_named_query("blob_unreferenced", (f"-{grace} hours",))
+        removed = 0
+        for digest in candidates["digest"] if not candidates.empty else []:
+            # Re-checks ref_count, so a blob referenced since the query is kept
+            if execute_named("blob_delete", (digest,)):
+                self.backend.delete(blob_key(digest))
+                removed += 1
+        return removed
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def _backend_from_env():
+    if BLOB_BACKEND == "s3":
+        return S3Backend(BLOB_S3_BUCKET, BLOB_S3_PREFIX, BLOB_S3_ENDPOINT)
+    if BLOB_BACKEND == "local":
+        return LocalBackend(BLOB_ROOT)
+    raise ValueError(f"Unknown BLOB_BACKEND '{BLOB_BACKEND}'")
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = BlobStore(_backend_from_env())
+    return _store
+
+
+def set_store(store):
+    """Replace the process-wide store (e.g. BlobStore(S3Backend(...)))."""
+    global _store
+    with _store_lock:
+        _store = store
+
+
+def local_path(url):
+    """A path PIL/pypdf can open for a stored blob URL (other paths are returned unchanged)."""
+    if isinstance(url, str) and url.startswith("s3://"):
+        return get_store().local_path(url)
+    return url
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or garbage-collect the upload blob store.")
+    parser.add_argument("command", choices=["stats", "gc"])
+    parser.add_argument("--grace-hours", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if args.command == "gc":
+        removed = get_store().gc(args.grace_hours)
+        print(f"Removed {removed} unreferenced blob(s).")
+    stats = run_named_query("blob_stats")
+    if not stats.empty:
+        row = stats.iloc[0]
+        print(f"{int(row['blobs'])} blobs, {int(row['total_bytes'] or 0):,} bytes, "
+              f"{int(row['references'] or 0)} references, {int(row['unreferenced'] or 0)} unreferenced")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
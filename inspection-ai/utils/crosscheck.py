@@ -0,0 +1,312 @@
+import os
+import re
+import time
+import zlib
+import hashlib
+import argparse
+import tempfile
+import threading
+from collections import Counter, OrderedDict
+from functools import lru_cache
+import numpy as np
+from utils import ai
+from utils import analysis_cache
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # only needed when EMBEDDING_MODEL is set
+    SentenceTransformer = None
+
+# Local cross-check of AI findings against an inspector's report.
+#
+# Every finding and every report sentence is embedded, and matches,
+# discrepancies and the similarity score come from one cosine-similarity
+# matrix product. Gemini (or the mock) is asked only for the narrative
+# summary. Embeddings come from a CPU sentence-transformers model when
+# EMBEDDING_MODEL is set and the package is installed. Otherwise a hashed
+# TF-IDF over words and word pairs is used, with a few defect synonyms folded
+# together (damp/wet/leak -> moisture, ...).
+#
+# A report's sentence matrix is saved as .npz under EMBEDDING_DIR, keyed by
+# the text's sha256, so it is built once per document. The full result is
+# cached in AI_ANALYSIS_CACHE per (finding set, document).
+#
+#     python -m utils.crosscheck findings.txt report.txt   # one finding per line
+#     python -m utils.crosscheck bench --findings 200 --sentences 5000
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL")  # e.g. all-MiniLM-L6-v2
+EMBEDDING_DIR = os.getenv("EMBEDDING_DIR", os.path.join("uploads", "embeddings"))
+CROSSCHECK_THRESHOLD = os.getenv("CROSSCHECK_THRESHOLD")
+HASH_DIM = 2048
+MAX_LISTED = 10  # matches / discrepancies shown per side; the score uses all of them
+# Part of the result cache key - bump when matching or scoring changes
+CROSSCHECK_VERSION = "v1"
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "at", "by", "for", "with", "is", "are", "was",
+    "were", "be", "been", "it", "its", "this", "that", "there", "as", "from", "has", "have", "detected",
+}
+SYNONYMS = {
+    "damp": "moisture", "dampness": "moisture", "wet": "moisture", "water": "moisture", "leak": "moisture",
+    "leaking": "moisture", "mould": "moisture", "mold": "moisture", "condensation": "moisture",
+    "fracture": "crack", "split": "crack", "cracking": "crack", "cracked": "crack",
+    "wiring": "electrical", "wire": "electrical", "wires": "electrical", "cable": "electrical", "socket": "electrical",
+}
+# A report sentence with one of these (after synonyms) describes a defect
+DEFECT_WORDS = [
+    "moisture", "crack", "electrical", "defect", "damage", "corrosion", "rot", "subsidence", "structural", "stain",
+    "broken", "loose",
+]
+
+
+def _stem(word):
+    for suffix in ("ness", "ing", "ed", "es", "s", "e"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def _terms(text):
+    words = [_stem(SYNONYMS.get(w, w)) for w in _WORD_RE.findall(text.lower()) if w not in STOPWORDS]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+DEFECT_TERMS = {_stem(w) for w in DEFECT_WORDS}
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class HashedTfidf:
+    """TF-IDF over hashed word and word-pair features; IDF comes from the report's sentences."""
+
+    name = "tfidf"
+    threshold = 0.25
+
+    def __init__(self, dim=HASH_DIM):
+        self.dim = dim
+
+    def _counts(self, texts):
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts = Counter(zlib.crc32(t.encode("utf-8")) % self.dim for t in _terms(text))
+            if counts:
+                matrix[row, np.fromiter(counts.keys(), dtype=np.int64)] = np.fromiter(counts.values(), dtype=np.float32)
+        return matrix
+
+    def fit(self, sentences):
+        counts = self._counts(sentences)
+        df = np.count_nonzero(counts, axis=0)
+        idf = (np.log((1 + len(sentences)) / (1 + df)) + 1).astype(np.float32)
+        return {"idf": idf}, self._weigh(counts, idf)
+
+    def transform(self, state, texts):
+        return self._weigh(self._counts(texts), state["idf"])
+
+    def _weigh(self, counts, idf):
+        # sublinear tf: a repeated word shouldn't dominate a sentence
+        weights = np.where(counts > 0, 1 + np.log(np.maximum(counts, 1)), 0).astype(np.float32)
+        return _normalize(weights * idf)
+
+
+class ModelEmbedder:
+    """A sentence-transformers model on CPU."""
+
+    threshold = 0.5
+
+    def __init__(self, model_name):
+        if SentenceTransformer is None:
+            raise RuntimeError("EMBEDDING_MODEL requires sentence-transformers (pip install sentence-transformers)")
+        self.name = model_name
+        self.model = SentenceTransformer(model_name, device="cpu")
+
+    def fit(self, sentences):
+        return {}, self.transform({}, sentences)
+
+    def transform(self, state, texts):
+        return np.asarray(self.model.encode(list(texts), normalize_embeddings=True), dtype=np.float32)
+
+
+@lru_cache(maxsize=None)
+def get_embedder():
+    if EMBEDDING_MODEL:
+        try:
+            return ModelEmbedder(EMBEDDING_MODEL)
+        except Exception as e:
+            print(f"Embedding model unavailable, using TF-IDF: {e}")
+    return HashedTfidf()
+
+
+def split_sentences(text):
+    """Report sentences worth matching (3+ words), de-duplicated, in order."""
+    seen = {}
+    for sentence in _SENTENCE_RE.split(text or ""):
+        sentence = " ".join(sentence.split())
+        if len(sentence.split()) >= 3:
+            seen.setdefault(sentence, None)
+    return list(seen)
+
+
+def _sha(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def report_index(report_text, embedder=None):
+    """
+    (sentences, state, matrix, defect_rows) for a report: built once per text
+    and embedder, then loaded from disk. defect_rows indexes the sentences
+    that describe a defect.
+    """
+    embedder = embedder or get_embedder()
+    key = f"{re.sub(r'[^A-Za-z0-9_.-]', '_', embedder.name)}-{_sha(report_text)}"
+    with _indexes_lock:
+        if key in _indexes:
+            _indexes.move_to_end(key)
+            return _indexes[key]
+
+    path = os.path.join(EMBEDDING_DIR, f"{key}.npz")
+    try:
+        with np.load(path) as data:
+            index = (data["sentences"].tolist(), {k[6:]: data[k] for k in data.files if k.startswith("state_")},
+                     data["matrix"], data["defect_rows"])
+    except (OSError, KeyError, ValueError):
+        sentences = split_sentences(report_text)
+        state, matrix = embedder.fit(sentences) if sentences else ({}, np.zeros((0, 1), dtype=np.float32))
+        defect_rows = np.array([i for i, s in enumerate(sentences) if _is_defect(s)], dtype=np.int64)
+        index = (sentences, state, matrix, defect_rows)
+        try:
+            os.makedirs(EMBEDDING_DIR, exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp.npz"
+            np.savez_compressed(tmp, sentences=np.array(sentences, dtype=str), matrix=matrix,
+                                defect_rows=defect_rows, **{f"state_{k}": v for k, v in state.items()})
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"Could not save embedding index {path}: {e}")
+
+    with _indexes_lock:
+        _indexes[key] = index
+        while len(_indexes) > 16:
+            _indexes.popitem(last=False)
+    return index
+
+
+def _is_defect(sentence):
+    return any(t in DEFECT_TERMS for t in _terms(sentence))
+
+
+def match(findings, report_text, embedder=None, threshold=None):
+    """
+    Vector cross-check of finding texts against a report. Returns the
+    comparison dict (similarity_score, matches, discrepancies) without the
+    narrative summary.
+    """
+    embedder = embedder or get_embedder()
+    threshold = threshold if threshold is not None else float(CROSSCHECK_THRESHOLD or embedder.threshold)
+    sentences, state, report_matrix, defect_rows = report_index(report_text, embedder)
+    findings = list(findings)
+    if not findings or not sentences:
+        return {"similarity_score": 0, "matches": [], "discrepancies": [f"AI: {f} (no report text to compare)" for f in findings][:MAX_LISTED],
+                "matched_findings": 0, "total_findings": len(findings), "report_defects": 0, "unmatched_report": 0}
+
+    similarity = embedder.transform(state, findings) @ report_matrix.T  # findings x sentences
+    best_sentence = similarity.argmax(axis=1)
+    best_score = similarity[np.arange(len(findings)), best_sentence]
+    finding_hit = best_score >= threshold
+
+    report_hit = similarity[:, defect_rows].max(axis=0) >= threshold if len(defect_rows) else np.zeros(0, dtype=bool)
+
+    matches = [f"{findings[i]} ↔ \"{sentences[best_sentence[i]]}\" ({best_score[i]:.2f})"
+               for i in np.argsort(-best_score) if finding_hit[i]]
+    discrepancies = [f"AI found: {findings[i]} (not in report)" for i in np.flatnonzero(~finding_hit)][:MAX_LISTED]
+    discrepancies += [f"Report notes: \"{sentences[defect_rows[j]]}\" (not seen by AI)" for j in np.flatnonzero(~report_hit)][:MAX_LISTED]
+
+    agreed = int(finding_hit.sum()) + int(report_hit.sum())
+    total = len(findings) + len(defect_rows)
+    return {
+        "similarity_score": round(100 * agreed / total) if total else 0,
+        "matches": matches[:MAX_LISTED],
+        "discrepancies": discrepancies,
+        "matched_findings": int(finding_hit.sum()),
+        "total_findings": len(findings),
+        "report_defects": len(defect_rows),
+        "unmatched_report": int((~report_hit).sum()),
+    }
+
+
+def cross_check(findings, report_text):
+    """
+    match() plus the narrative summary from the text model, cached per
+    (finding set, document). The result also carries the local matching
+    time in "match_ms".
+    """
+    embedder = get_embedder()
+    findings = list(findings)
+    digest = _sha(_sha("\n".join(findings)) + _sha(report_text or ""))
+    version = f"crosscheck-{CROSSCHECK_VERSION}"
+    cache_model = f"{embedder.name}/{ai.TEXT_MODEL if ai.GEMINI_API_KEY else ai.MOCK_MODEL}"
+    cached = analysis_cache.get_cached(digest, cache_model, version)
+    if cached is not None:
+        return cached
+
+    start = time.perf_counter()
+    result = match(findings, report_text, embedder)
+    result["match_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    result["summary"], usage = ai.cross_check_narrative(result)
+    analysis_cache.put_cached(digest, f"{embedder.name}/{usage['model']}", version, result)
+    return result
+
+
+def _sample(findings, sentences, seed=3):
+    rooms = ["Kitchen", "Bathroom", "Master Bedroom", "Living Room", "Loft"]
+    defects = [("moisture", "Damp patch below the window"), ("structural", "Hairline crack above the door"),
+               ("electrical", "Exposed wiring at the socket"), ("finishing", "Loose tiles near the shower")]
+    finding_texts = [f"{rooms[i % 5]}: {defects[(i + seed) % 4][0]} {defects[(i + seed) % 4][1]}" for i in range(findings)]
+    report = "\n".join(f"{rooms[i % 5]} item {i}: {defects[(i * 3) % 4][1].lower()}, reading {i % 40}%."
+                       if i % 3 else f"General note {i}: paintwork in fair condition throughout."
+                       for i in range(sentences))
+    return finding_texts, report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cross-check AI findings against a report locally.")
+    parser.add_argument("findings", help="file with one finding per line, or 'bench'")
+    parser.add_argument("report", nargs="?")
+    parser.add_argument("--findings", dest="n_findings", type=int, default=200)
+    parser.add_argument("--sentences", type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    embedder = get_embedder()
+    if args.findings != "bench":
+        with open(args.findings, encoding="utf-8") as f:
+            findings = [line.strip() for line in f if line.strip()]
+        with open(args.report, encoding="utf-8") as f:
+            report = f.read()
+        result = match(findings, report, embedder)
+        print(f"Similarity {result['similarity_score']}% ({embedder.name}): "
+              f"{result['matched_findings']}/{result['total_findings']} findings matched, "
+              f"{result['unmatched_report']}/{result['report_defects']} report defects unmatched")
+        for line in result["matches"] + result["discrepancies"]:
+            print(f"    {line}")
+        return 0
+
+    global EMBEDDING_DIR
+    EMBEDDING_DIR = tempfile.mkdtemp()
+    findings, report = _sample(args.n_findings, args.sentences)
+    for label in ("cold (build index)", "warm (index cached)"):
+        start = time.perf_counter()
+        result = match(findings, report, embedder)
+        print(f"{label:<22}{(time.perf_counter() - start) * 1000:>9.1f} ms  score {result['similarity_score']}%")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,213 @@
+import os
+import time
+import argparse
+import tempfile
+import threading
+import multiprocessing
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+from pypdf import PdfReader
+from utils.db import BatchWriter, run_named_query
+
+# Document ingestion for inspector reports (wizard step 3).
+#
+# PDF pages are extracted in a pool of worker processes (pypdf is pure
+# Python, so threads would not help), each worker reading a range of pages
+# from the stored file. Pages come back in order and are packed into
+# DOCUMENT_CHUNKS rows of about CHUNK_CHARS characters, written as they fill
+# up, so the full text is kept without holding it all in memory.
+# DOCUMENT_PAGES records each page's size and extraction time.
+#
+#     python -m utils.documents extract report.pdf --workers 4   # per-page timings, no DB
+#     python -m utils.documents bench --pages 200                # serial vs pool on a generated PDF
+
+CHUNK_CHARS = int(os.getenv("DOC_CHUNK_CHARS", "4000"))
+EXTRACT_WORKERS = int(os.getenv("DOC_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Smaller documents are extracted in-process; shipping them to the pool costs more than it saves
+PARALLEL_MIN_PAGES = 16
+FLUSH_CHUNKS = 16
+
+# Extraction pools by worker count, started on first use (see _extract_pool)
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class IngestResult:
+    doc_id: str
+    pages: int
+    chars: int
+    chunks: int
+    seconds: float
+    slowest_page: int = 0
+    slowest_ms: float = 0.0
+
+
+def _extract_range(path, start, stop):
+    """Worker: [(page_number, text, ms)] for pages start..stop-1 (1-based numbers)."""
+    reader = PdfReader(path)
+    pages = []
+    for index in range(start, stop):
+        began = time.perf_counter()
+        try:
+            text = reader.pages[index].extract_text() or ""
+        except Exception as e:
+            print(f"Page {index + 1} of {path} could not be read: {e}")
+            text = ""
+        pages.append((index + 1, text, (time.perf_counter() - began) * 1000))
+    return pages
+
+
+def _extract_pool(workers):
+    # Spawned, not forked: the parent holds open SQLite connections. Kept for
+    # the life of the process (app server, job worker or CLI) so the start-up
+    # cost is paid once.
+    with _pools_lock:
+        if workers not in _pools:
+            _pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pools[workers]
+
+
+def iter_pdf_pages(path, workers=None):
+    """Yield (page_number, text, ms) for every page of the PDF at path, in page order."""
+    workers = workers or EXTRACT_WORKERS
+    count = len(PdfReader(path).pages)
+    if workers <= 1 or count < PARALLEL_MIN_PAGES:
+        yield from _extract_range(path, 0, count)
+        return
+    # Several ranges per worker so one slow (image-heavy) range doesn't hold up the rest
+    size = max(1, -(-count // (workers * 4)))
+    starts = range(0, count, size)
+    stops = [min(start + size, count) for start in starts]
+    pool = _extract_pool(workers)
+    for pages in pool.map(_extract_range, [path] * len(starts), starts, stops):
+        yield from pages
+
+
+def iter_chunks(pages, chunk_chars=CHUNK_CHARS):
+    """
+    Pack (page_number, text) pairs into (page_start, page_end, text) chunks of
+    about chunk_chars, split on the last line break in the second half of
+    each window, else at chunk_chars (so no chunk but the last is under
+    half of chunk_chars).
+    """
+    # Chunks are cut from buffer at an advancing offset; only the tail left
+    # over (under chunk_chars) is copied when the next page is appended
+    buffer, pos, first = "", 0, None
+    for page_number, text in pages:
+        if first is None:
+            first = page_number
+        buffer = buffer[pos:] + text + "\n"
+        pos = 0
+        while len(buffer) - pos >= chunk_chars:
+            cut = buffer.rfind("\n", pos + chunk_chars // 2, pos + chunk_chars)
+            cut = cut + 1 if cut >= 0 else pos + chunk_chars
+            yield first, page_number, buffer[pos:cut]
+            pos = cut
+            first = page_number if pos < len(buffer) else None
+    if buffer[pos:].strip():
+        yield first, page_number, buffer[pos:]
+
+
+def ingest_document(doc_id, path=None, text=None, workers=None):
+    """
+    Store the text of a document as chunks: the PDF at path, or plain text.
+    Returns an IngestResult. Raises RuntimeError if the rows can't be
+    written, so the job that called it is retried.
+    """
+    started = time.perf_counter()
+    batch = BatchWriter()
+    timings = []
+
+    def pages():
+        if text is not None:
+            yield 1, text
+            return
+        for page_number, page_text, ms in iter_pdf_pages(path, workers):
+            timings.append((page_number, ms))
+            batch.add("insert_document_page", (doc_id, page_number, len(page_text), round(ms, 2)))
+            yield page_number, page_text
+
+    chunks = chars = 0
+    for page_start, page_end, chunk in iter_chunks(pages()):
+        batch.add("insert_document_chunk", (doc_id, chunks, page_start, page_end, chunk))
+        chunks += 1
+        chars += len(chunk)
+        if chunks % FLUSH_CHUNKS == 0 and batch.flush() is None:
+            raise RuntimeError(f"Saving the text of {doc_id} failed")
+    if batch.flush() is None:
+        raise RuntimeError(f"Saving the text of {doc_id} failed")
+
+    slowest_page, slowest_ms = max(timings, key=lambda t: t[1], default=(0, 0.0))
+    return IngestResult(doc_id, len(timings) or 1, chars, chunks, time.perf_counter() - started, slowest_page, slowest_ms)
+
+
+def document_text(doc_id):
+    """The full stored text of a document, or "" if it has no chunks."""
+    chunks = run_named_query("document_chunks", (doc_id,))
+    return "".join(chunks["content"]) if not chunks.empty else ""
+
+
+def _sample_pdf(path, pages):
+    from utils.pdf import PdfWriter, _Layout
+
+    paragraph = ("Moisture staining observed along the north wall below the window sill. "
+                 "Hairline cracking to plaster at the door head; monitor for movement. ") * 3
+    with open(path, "wb") as out:
+        writer = PdfWriter(out, title="Sample inspection report")
+        layout = _Layout(writer, "Sample inspection report")
+        while layout.pages < pages:
+            layout.text(paragraph, size=10)
+        writer.close()
+
+
+def _serial_concat(path):
+    # What the wizard used to do: one thread, += per page
+    text_content = ""
+    for page in PdfReader(path).pages:
+        text_content += page.extract_text() + "\n"
+    return text_content
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PDF text extraction timings.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    extract = sub.add_parser("extract")
+    extract.add_argument("path")
+    extract.add_argument("--workers", type=int, default=EXTRACT_WORKERS)
+    bench = sub.add_parser("bench")
+    bench.add_argument("--pages", type=int, default=200)
+    bench.add_argument("--workers", type=int, default=EXTRACT_WORKERS)
+    args = parser.parse_args(argv)
+
+    if args.command == "extract":
+        start = time.perf_counter()
+        pages = list(iter_pdf_pages(args.path, args.workers))
+        elapsed = time.perf_counter() - start
+        chunks = list(iter_chunks((n, text) for n, text, _ in pages))
+        for n, text, ms in sorted(pages, key=lambda p: -p[2])[:10]:
+            print(f"    page {n:<5}{ms:>9.1f} ms{len(text):>9,} chars")
+        print(f"{len(pages)} pages, {sum(len(t) for _, t, _ in pages):,} chars, {len(chunks)} chunks "
+              f"in {elapsed:.2f}s ({len(pages) / elapsed:.1f} pages/sec)")
+        return 0
+
+    path = os.path.join(tempfile.mkdtemp(), "sample.pdf")
+    _sample_pdf(path, args.pages)
+    start = time.perf_counter()
+    serial = _serial_concat(path)
+    print(f"serial += concat     {time.perf_counter() - start:>7.2f}s")
+    for workers in sorted({1, args.workers}):
+        if workers > 1:
+            # warm the pool: the server pays process start-up once, not per document
+            list(_extract_pool(workers).map(abs, range(workers)))
+        start = time.perf_counter()
+        pages = list(iter_pdf_pages(path, workers))
+        elapsed = time.perf_counter() - start
+        same = "".join(t + "\n" for _, t, _ in pages) == serial
+        print(f"workers={workers:<3}          {elapsed:>7.2f}s  {len(pages) / elapsed:.1f} pages/sec"
+              f"{'' if same else '  (text differs!)'}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
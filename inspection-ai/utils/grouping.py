@@ -0,0 +1,100 @@
+import time
+import random
+import argparse
+import pandas as pd
+
+# Row iteration and grouping helpers for the pages.
+#
+# DataFrame.iterrows() builds a Series per row, and filtering a frame once
+# per parent row (findings_df[findings_df['room_id'] == room_id]) is
+# O(parents x children). records() hands out plain dicts, and
+# grouped_records() indexes children by key in one pass, so a room's
+# findings are a dict lookup.
+#
+#     python -m utils.grouping --rooms 500 --findings 20000   # benchmark
+
+def records(df):
+    """Rows of df as a list of dicts (column -> value), for page loops."""
+    if df is None or df.empty:
+        return []
+    columns = list(df.columns)
+    # itertuples + zip skips the per-row Series of iterrows() and is cheaper than to_dict("records")
+    return [dict(zip(columns, row)) for row in df.itertuples(index=False, name=None)]
+
+
+def grouped_records(df, key):
+    """{key value: [row dict, ...]} in one pass, rows kept in frame order."""
+    groups = {}
+    for row in records(df):
+        groups.setdefault(row[key], []).append(row)
+    return groups
+
+
+def _synthetic(rooms, findings, seed=5):
+    rnd = random.Random(seed)
+    rooms_df = pd.DataFrame({
+        "room_id": [f"RM{i:05d}" for i in range(rooms)],
+        "room_name": [f"Room {i}" for i in range(rooms)],
+        "risk_category": "MEDIUM RISK",
+        "risk_score": 30.0,
+    })
+    findings_df = pd.DataFrame({
+        "finding_id": [f"F{i:06d}" for i in range(findings)],
+        "room_id": [f"RM{rnd.randrange(rooms):05d}" for _ in range(findings)],
+        "severity": [rnd.choice(["critical", "high", "medium", "low"]) for _ in range(findings)],
+        "finding_category": "moisture",
+        "finding_description": "Damp patch near window",
+    })
+    return rooms_df, findings_df
+
+
+def _render_filtered(rooms_df, findings_df):
+    # What Analysis Results used to do per rerun
+    lines = 0
+    for _, room in rooms_df.iterrows():
+        room_findings = findings_df[findings_df["room_id"] == room["room_id"]]
+        for _, f in room_findings.iterrows():
+            lines += len(f"**[{f['severity']}] {f['finding_category']}**: {f['finding_description']}")
+    return lines
+
+
+def _render_grouped(rooms_df, findings_df):
+    lines = 0
+    findings_by_room = grouped_records(findings_df, "room_id")
+    for room in records(rooms_df):
+        for f in findings_by_room.get(room["room_id"], []):
+            lines += len(f"**[{f['severity']}] {f['finding_category']}**: {f['finding_description']}")
+    return lines
+
+
+def bench(rooms, findings, repeat=3):
+    rooms_df, findings_df = _synthetic(rooms, findings)
+    results = {}
+    for name, fn in (("filter per room + iterrows", _render_filtered), ("grouped_records", _render_grouped)):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            out = fn(rooms_df, findings_df)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = (best, out)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark room -> findings rendering.")
+    parser.add_argument("--rooms", type=int, default=500)
+    parser.add_argument("--findings", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    results = bench(args.rooms, args.findings, args.repeat)
+    outputs = {out for _, out in results.values()}
+    print(f"{args.rooms} rooms, {args.findings:,} findings (best of {args.repeat}):")
+    for name, (elapsed, _) in results.items():
+        print(f"    {name:<28}{elapsed * 1000:>10.1f} ms")
+    return 0 if len(outputs) == 1 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
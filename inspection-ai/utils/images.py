@@ -0,0 +1,94 @@
+import os
+import uuid
+import argparse
+from PIL import Image, ImageOps
+
+# Downscaled JPEG derivatives of uploaded photos.
+#
+# Phone photos are several MB; Gemini does not need more than ~1.5k pixels
+# on the long edge and galleries only need thumbnails. Derivatives are made
+# once at upload (utils/pipeline.py) and cached on disk next to the blob:
+#
+#     uploads/blobs/ab/cd/<sha256>
+#     uploads/blobs/ab/cd/<sha256>.analysis.jpg
+#     uploads/blobs/ab/cd/<sha256>.thumb.jpg
+#
+# EXIF orientation is applied, so derivatives are upright without metadata.
+#
+#     python -m utils.images photo1.jpg photo2.jpg   # size before/after
+
+ANALYSIS_MAX_EDGE = int(os.getenv("ANALYSIS_MAX_EDGE", "1536"))
+THUMB_MAX_EDGE = int(os.getenv("THUMB_MAX_EDGE", "320"))
+
+# kind -> (max long edge, JPEG quality)
+DERIVATIVES = {
+    "analysis": (ANALYSIS_MAX_EDGE, 85),
+    "thumb": (THUMB_MAX_EDGE, 75),
+}
+
+
+def derivative_path(path, kind):
+    return f"{path}.{kind}.jpg"
+
+
+def make_derivative(path, kind):
+    """
+    Path of the `kind` derivative of a local image, creating it if needed.
+    Returns None if the source can't be read as an image.
+    """
+    out = derivative_path(path, kind)
+    if os.path.exists(out):
+        return out
+    max_edge, quality = DERIVATIVES[kind]
+    try:
+        with Image.open(path) as img:
+            # JPEG sources decode at a reduced scale directly
+            img.draft("RGB", (max_edge, max_edge))
+            img = ImageOps.exif_transpose(img)
+            if img.mode != "RGB":
+                img = img.convert("RGB")
+            img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+            tmp = f"{out}.{uuid.uuid4().hex}.part"
+            img.save(tmp, "JPEG", quality=quality, optimize=True)
+        os.replace(tmp, out)
+        return out
+    except Exception as e:
+        print(f"Could not create {kind} image for {path}: {e}")
+        return None
+
+
+def prepare_derivatives(path):
+    """Create every derivative of an uploaded image (called at upload time)."""
+    if not isinstance(path, str) or not os.path.isfile(path):
+        return {}
+    return {kind: make_derivative(path, kind) for kind in DERIVATIVES}
+
+
+def analysis_image(path):
+    """The file to send for AI analysis: the analysis derivative, else the original."""
+    if not isinstance(path, str) or not os.path.isfile(path):
+        return path
+    return make_derivative(path, "analysis") or path
+
+
+def thumbnail(path):
+    """The display thumbnail for a local image, else the original."""
+    if not isinstance(path, str) or not os.path.isfile(path):
+        return path
+    return make_derivative(path, "thumb") or path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show derivative sizes for local images.")
+    parser.add_argument("paths", nargs="+")
+    args = parser.parse_args(argv)
+
+    for path in args.paths:
+        made = prepare_derivatives(path)
+        sizes = ", ".join(f"{kind} {os.path.getsize(p):,}" for kind, p in made.items() if p)
+        print(f"{path}: original {os.path.getsize(path):,} bytes; {sizes or 'not an image'}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,351 @@
+import os
+import json
+import time
+import uuid
+import random
+import signal
+import socket
+import hashlib
+import argparse
+import multiprocessing
+from utils import db
+from utils.db import BatchWriter, execute_named, get_db_connection, run_query
+from utils.queries import get_query
+from utils.blobstore import local_path
+from utils.documents import ingest_document, document_text
+from utils.pipeline import StoredUpload, iter_image_analyses
+from utils.summarize import summarize_document
+
+# Background jobs for the Inspection Wizard's AI work.
+#
+# The wizard stores uploads, then enqueues a job per room / document in the
+# JOBS table and polls its status. The work survives reruns and browser
+# refreshes. A worker claims a job with one UPDATE ... RETURNING, so two
+# workers never get the same job. The claim leases the job for
+# JOB_VISIBILITY_TIMEOUT seconds, and progress updates extend the lease. A
+# job whose worker died becomes visible again when its lease runs out.
+# Failures are retried with exponential backoff plus jitter, up to
+# max_attempts; a job that fails for good runs its handler's on_fail
+# cleanup (e.g. an unsaved document's chunks). Enqueueing with an
+# idempotency key that is already queued returns the existing job. Handlers
+# check whether their rows were saved before redoing work, so a retried job
+# never writes twice.
+#
+# JOB_QUEUE=inline (default) runs each job in the Streamlit script right
+# after enqueueing it, through the same claim/complete path; the wizard's
+# last step runs due retries and expired leases with run_job(). The work
+# still lives in the script thread, so deployments should use
+# JOB_QUEUE=worker: the wizard only enqueues and polls; run workers with:
+#
+#     python -m utils.jobs worker --processes 4
+#     python -m utils.jobs status
+#     python -m utils.jobs purge --days 7      # drop finished jobs
+#
+# Workers write from their own process, so the app's query cache sees those
+# rows once the wizard notices the job finished (poll), or after
+# QUERY_CACHE_TTL.
+
+JOB_QUEUE = os.getenv("JOB_QUEUE", "inline").lower()
+JOB_VISIBILITY_TIMEOUT = float(os.getenv("JOB_VISIBILITY_TIMEOUT", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_BACKOFF_BASE = float(os.getenv("JOB_BACKOFF_BASE", "2"))
+JOB_BACKOFF_MAX = float(os.getenv("JOB_BACKOFF_MAX", "300"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+# kind -> (function, named statements it writes)
+HANDLERS = {}
+# kind -> cleanup(payload), run when a job of that kind fails for good
+ON_FAIL = {}
+
+
+def handler(kind, writes=(), on_fail=None):
+    """
+    Register fn(payload, job) as the handler for a job kind. Its return value
+    is stored as the result. on_fail(payload) removes partial work once the
+    job has failed for good.
+    """
+    def register(fn):
+        HANDLERS[kind] = (fn, tuple(writes))
+        if on_fail:
+            ON_FAIL[kind] = on_fail
+        return fn
+    return register
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def idempotency_key(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def enqueue(kind, payload, key=None, group_id=None, max_attempts=None):
+    """Add a job and return its id. With a key that was used before, the existing job's id is returned instead."""
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    job_id = f"JOB-{uuid.uuid4().hex[:12]}"
+    execute_named("job_enqueue", (job_id, kind, key, group_id, json.dumps(payload),
+                                  max_attempts or JOB_MAX_ATTEMPTS, time.time()))
+    if key is None:
+        return job_id
+    existing = run_query(get_query("job_by_key"), (key,), use_cache=False)
+    return existing.iloc[0]["job_id"] if not existing.empty else None
+
+
+class Job:
+    """A claimed job, handed to its handler."""
+
+    def __init__(self, row, owner, on_progress=None):
+        self.job_id, self.kind, payload, self.attempts, self.max_attempts = row
+        self.payload = json.loads(payload)
+        self.owner = owner
+        self.on_progress = on_progress
+
+    def progress(self, done, total):
+        """Record progress; also renews the lease, so long jobs should call it regularly."""
+        now = time.time()
+        execute_named("job_heartbeat", (done, total, now + JOB_VISIBILITY_TIMEOUT, now, self.job_id, self.owner))
+        if self.on_progress:
+            self.on_progress(done, total)
+
+
+def _claim(owner, job_id=None):
+    now = time.time()
+    try:
+        with get_db_connection() as conn:
+            if job_id is None:
+                row = conn.execute(get_query("job_claim"), (owner, now, JOB_VISIBILITY_TIMEOUT)).fetchone()
+            else:
+                row = conn.execute(get_query("job_claim_id"), (owner, now, JOB_VISIBILITY_TIMEOUT, job_id)).fetchone()
+            conn.commit()
+    except Exception as e:
+        print(f"Job claim failed: {e}")
+        return None
+    return row
+
+
+def backoff(attempts):
+    """Delay before retry number `attempts`: exponential, capped, with jitter so retries don't line up."""
+    delay = min(JOB_BACKOFF_MAX, JOB_BACKOFF_BASE * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _give_up(job, error):
+    if job.kind in ON_FAIL:
+        try:
+            ON_FAIL[job.kind](job.payload)
+        except Exception as e:
+            print(f"Job {job.job_id} ({job.kind}) cleanup failed: {e}")
+    execute_named("job_fail", (error, time.time(), job.job_id, job.owner))
+    return FAILED
+
+
+def _execute(job):
+    fn, _ = HANDLERS.get(job.kind, (None, ()))
+    if fn is None:
+        return _give_up(job, f"Unknown job kind: {job.kind}")
+    if job.attempts > job.max_attempts:
+        # Leases ran out this often: the job keeps killing (or outliving) its workers
+        return _give_up(job, "Gave up after repeated lease timeouts")
+    try:
+        result = fn(job.payload, job)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        print(f"Job {job.job_id} ({job.kind}) attempt {job.attempts} failed: {error}")
+        if job.attempts >= job.max_attempts:
+            return _give_up(job, error)
+        now = time.time()
+        execute_named("job_retry", (now + backoff(job.attempts), error, now, job.job_id, job.owner))
+        return QUEUED
+    execute_named("job_complete", (json.dumps(result), time.time(), job.job_id, job.owner))
+    return DONE
+
+
+def run_next(owner=None):
+    """Claim and run the next visible job. Returns its final status, or None if the queue is empty."""
+    owner = owner or worker_id()
+    row = _claim(owner)
+    return _execute(Job(row, owner)) if row else None
+
+
+def run_job(job_id, on_progress=None):
+    """Run one job now in this process (JOB_QUEUE=inline). Returns its status, or None if it isn't runnable."""
+    owner = worker_id()
+    row = _claim(owner, job_id)
+    return _execute(Job(row, owner, on_progress)) if row else None
+
+
+def job_status(group_id):
+    """Status rows of a group's jobs (never from the query cache)."""
+    return run_query(get_query("job_status"), (group_id,), use_cache=False)
+
+
+def poll(group_id, seen_done):
+    """
+    job_status(), plus: for jobs that finished since the last poll (ids not
+    in seen_done), drop cached reads of the tables their handler writes.
+    seen_done is updated in place.
+    """
+    status = job_status(group_id)
+    for row in status.itertuples(index=False):
+        if row.status == DONE and row.job_id not in seen_done:
+            seen_done.add(row.job_id)
+            db.invalidate_named(*HANDLERS.get(row.kind, (None, ()))[1])
+    return status
+
+
+# --- Handlers ---
+
+@handler("analyze_room", writes=("create_room", "insert_image", "insert_finding"))
+def analyze_room(payload, job):
+    """Analyze a room's stored images and save the room, image and finding rows in one transaction."""
+    if not run_query(get_query("job_room_saved"), (payload["room_id"],), use_cache=False).empty:
+        return {"skipped": "room already saved"}
+
+    images = [StoredUpload(i["name"], i["url"]) for i in payload["images"]]
+    property_id, room_id = payload["property_id"], payload["room_id"]
+    batch = BatchWriter()
+    batch.add("create_room", (room_id, property_id, payload["room_name"], payload["room_type"]))
+    failed = []
+    results = iter_image_analyses(images, simulation_override=payload.get("simulation_override"),
+                                  use_cache=payload.get("use_cache", True))
+    for done, (image, url, analysis, error) in enumerate(results, start=1):
+        job.progress(done, len(images))
+        if error is not None:
+            failed.append(image.name)
+            continue
+        batch.add("insert_image", (
+            str(uuid.uuid4()), payload["session_id"], payload["user_id"], property_id, room_id,
+            url, image.name,
+            analysis['defect_type'], analysis['confidence'],
+            analysis['description'], analysis['severity']
+        ))
+        if analysis['defect_type'] != 'none':
+            batch.add("insert_finding", (
+                str(uuid.uuid4()), room_id, property_id,
+                analysis['defect_type'], f"{analysis['description']} Action: {analysis['action']}",
+                analysis['severity'], analysis['confidence']
+            ))
+    if failed and len(failed) == len(images):
+        raise RuntimeError(f"No image could be analyzed ({', '.join(failed)})")
+    if batch.flush() is None:
+        raise RuntimeError("Saving room results failed")
+    return {"room_id": room_id, "images": len(images) - len(failed), "failed": failed}
+
+
+def _drop_document_text(payload):
+    """Remove the chunks and page timings of a document that was never saved."""
+    doc_id = payload["doc_id"]
+    if not run_query(get_query("job_document_saved"), (doc_id,), use_cache=False).empty:
+        return
+    batch = BatchWriter()
+    batch.add("delete_document_chunks", (doc_id,))
+    batch.add("delete_document_pages", (doc_id,))
+    if batch.flush() is None:
+        raise RuntimeError(f"Could not remove the text of {doc_id}")
+
+
+@handler("analyze_document", writes=("insert_document", "insert_document_chunk", "insert_document_page"),
+         on_fail=_drop_document_text)
+def analyze_document(payload, job):
+    """Extract, summarize and save one uploaded inspector report."""
+    doc_id = payload["doc_id"]
+    if not run_query(get_query("job_document_saved"), (doc_id,), use_cache=False).empty:
+        return {"skipped": "document already saved"}
+
+    path = local_path(payload["file_url"])
+    if payload["pdf"]:
+        ingest = ingest_document(doc_id, path=path)
+    else:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            ingest = ingest_document(doc_id, text=f.read())
+    job.progress(1, 2)
+    text_content = document_text(doc_id)
+    if not text_content:
+        return {"pages": ingest.pages, "chars": 0}
+
+    summary = summarize_document(text_content)
+    analysis = summary.result
+    if execute_named("insert_document", (
+        doc_id, payload["property_id"], payload["user_id"],
+        payload["filename"], payload["file_url"], f"{text_content[:500]}...",
+        analysis.get('ai_summary', ''), analysis.get('ai_suggestions', '')
+    )) is None:
+        raise RuntimeError("Saving the document failed")
+    job.progress(2, 2)
+    return {"pages": ingest.pages, "chars": len(text_content), "tokens": summary.stats.input_tokens,
+            "seconds": round(ingest.seconds + summary.stats.seconds, 2)}
+
+
+# --- Worker ---
+
+def _worker(stop, db_file):
+    # Ctrl-C reaches the whole process group; let the parent decide when to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    db.DB_FILE = db_file
+    owner = worker_id()
+    print(f"Worker {owner} started")
+    while not stop.is_set():
+        try:
+            status = run_next(owner)
+        except Exception as e:  # keep the worker alive; the job's lease will expire
+            print(f"Worker {owner}: {e}")
+            status = None
+        if status is None:
+            stop.wait(JOB_POLL_INTERVAL)
+    print(f"Worker {owner} stopped")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run or inspect the background job queue.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    work = sub.add_parser("worker")
+    work.add_argument("--processes", type=int, default=1)
+    work.add_argument("--drain", action="store_true", help="exit once the queue is empty")
+    sub.add_parser("status")
+    purge = sub.add_parser("purge")
+    purge.add_argument("--days", type=float, default=7)
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        counts = run_query(get_query("job_counts"), use_cache=False)
+        for row in counts.itertuples(index=False):
+            print(f"{row.status:<10}{row.jobs:>8}")
+        return 0
+
+    if args.command == "purge":
+        removed = execute_named("job_purge", (time.time() - args.days * 86400,))
+        print(f"Removed {removed} finished job(s).")
+        return 0
+
+    if args.drain:
+        owner = worker_id()
+        ran = 0
+        while run_next(owner) is not None:
+            ran += 1
+        print(f"Ran {ran} job(s).")
+        return 0
+
+    # Spawned, not forked: each worker opens its own SQLite connections
+    ctx = multiprocessing.get_context("spawn")
+    stop = ctx.Event()
+    workers = [ctx.Process(target=_worker, args=(stop, db.DB_FILE)) for _ in range(args.processes)]
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    for w in workers:
+        w.start()
+    try:
+        for w in workers:
+            w.join()
+    except KeyboardInterrupt:
+        # Jobs in flight finish first; a worker killed mid-job is retried once its lease expires
+        stop.set()
+        for w in workers:
+            w.join()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,984 @@
+import sqlite3
+import threading
+import argparse
+import os
+from utils.pool import get_pool
+from utils.risk_scores import rebuild_risk_scores
+
+# Versioned schema migrations for the local SQLite database.
+# Each migration runs once, inside its own transaction, and is recorded in
+# SCHEMA_VERSION. Pages never run DDL: utils.db calls ensure_migrated() the
+# first time a connection is borrowed in a process, and deploys can run
+#
+#     python -m utils.migrations
+#
+# ahead of time so even that first check finds nothing pending.
+
+
+def _0001_initial_schema(c):
+    """Base tables and views (previously created by init_db on every import)."""
+    
+    # 1. USERS
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS USERS (
+            user_id TEXT PRIMARY KEY,
+            username TEXT,
+            email TEXT UNIQUE,
+            password TEXT,
+            user_type TEXT,
+            full_name TEXT,
+            phone TEXT,
+            verified BOOLEAN,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            last_login DATETIME
+        )
+    """)
+    
+    # 2. INSPECTOR_PROFILES
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS INSPECTOR_PROFILES (
+            inspector_id TEXT PRIMARY KEY,
+            user_id TEXT REFERENCES USERS(user_id),
+            license_number TEXT,
+            certifications TEXT, -- Stored as JSON string
+            specialization TEXT, -- Stored as JSON string
+            years_experience INTEGER,
+            rating REAL,
+            total_inspections INTEGER DEFAULT 0,
+            verified_inspector BOOLEAN
+        )
+    """)
+    
+    # 3. PROPERTIES
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS PROPERTIES (
+            property_id TEXT PRIMARY KEY,
+            house_number TEXT,
+            property_name TEXT,
+            address TEXT,
+            property_type TEXT,
+            construction_status TEXT,
+            total_rooms INTEGER,
+            owner_user_id TEXT REFERENCES USERS(user_id),
+            report_visibility TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    
+    # 4. ROOMS
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS ROOMS (
+            room_id TEXT PRIMARY KEY,
+            property_id TEXT REFERENCES PROPERTIES(property_id),
+            room_name TEXT,
+            room_type TEXT,
+            area_sqft REAL,
+            floor_number INTEGER
+        )
+    """)
+    
+    # 5. INSPECTION_FINDINGS
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS INSPECTION_FINDINGS (
+            finding_id TEXT PRIMARY KEY,
+            room_id TEXT REFERENCES ROOMS(room_id),
+            property_id TEXT REFERENCES PROPERTIES(property_id),
+            finding_category TEXT,
+            finding_description TEXT,
+            severity TEXT,
+            inspector_notes TEXT,
+            detected_by TEXT,
+            confidence_score REAL,
+            finding_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    
+    # 6. INSPECTION_IMAGES
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS INSPECTION_IMAGES (
+            image_id TEXT PRIMARY KEY,
+            upload_session_id TEXT,
+            user_id TEXT REFERENCES USERS(user_id),
+            property_id TEXT REFERENCES PROPERTIES(property_id),
+            room_id TEXT REFERENCES ROOMS(room_id),
+            upload_scenario TEXT,
+            image_url TEXT,
+            original_filename TEXT,
+            ai_detected_defects TEXT,
+            ai_confidence_score REAL,
+            ai_description TEXT,
+            ai_severity TEXT,
+            inspector_verified BOOLEAN,
+            inspector_override_notes TEXT,
+            upload_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # 7. INSPECTOR_REPORTS
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS INSPECTOR_REPORTS (
+            report_id TEXT PRIMARY KEY,
+            property_id TEXT REFERENCES PROPERTIES(property_id),
+            inspector_id TEXT REFERENCES INSPECTOR_PROFILES(inspector_id),
+            inspection_date DATETIME,
+            manual_risk_score REAL,
+            ai_risk_score REAL,
+            score_variance REAL,
+            agreement_percentage REAL,
+            final_approved_score REAL,
+            inspector_summary TEXT,
+            status TEXT
+        )
+    """)
+    
+    
+    # 8. INSPECTION_DOCUMENTS
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS INSPECTION_DOCUMENTS (
+        doc_id TEXT PRIMARY KEY,
+        property_id TEXT,
+        user_id TEXT,
+        filename TEXT,
+        file_url TEXT,
+        extracted_text TEXT,
+        ai_summary TEXT,
+        ai_suggestions TEXT,
+        upload_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (property_id) REFERENCES PROPERTIES(property_id),
+        FOREIGN KEY (user_id) REFERENCES USERS(user_id)
+    )
+    """)
+    
+    # 9. INSPECTION_RATINGS
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS INSPECTION_RATINGS (
+        rating_id TEXT PRIMARY KEY,
+        report_id TEXT REFERENCES INSPECTOR_REPORTS(report_id),
+        user_id TEXT REFERENCES USERS(user_id),
+        inspector_id TEXT REFERENCES INSPECTOR_PROFILES(inspector_id),
+        rating_score INTEGER,
+        feedback TEXT,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+
+    
+    # 10. ACCESS_REQUESTS
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS ACCESS_REQUESTS (
+        request_id TEXT PRIMARY KEY,
+        property_id TEXT REFERENCES PROPERTIES(property_id),
+        requester_user_id TEXT REFERENCES USERS(user_id),
+        owner_user_id TEXT REFERENCES USERS(user_id),
+        status TEXT, -- 'pending', 'approved', 'rejected'
+        request_date DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+
+
+    # 11. INSPECTION_SERVICE_REQUESTS
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS INSPECTION_SERVICE_REQUESTS (
+        service_id TEXT PRIMARY KEY,
+        property_id TEXT REFERENCES PROPERTIES(property_id),
+        requester_user_id TEXT REFERENCES USERS(user_id),
+        status TEXT, -- 'requested', 'in_progress', 'completed'
+        request_date DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+    # VIEWS (Simulated as Tables for SQLite simpler handling or Real Views)
+    # SQLite supports views, let's try creating them.
+    
+    # ROOM_RISK_SCORES View
+    c.execute("DROP VIEW IF EXISTS ROOM_RISK_SCORES")
+    c.execute("""
+    CREATE VIEW ROOM_RISK_SCORES AS
+    SELECT 
+        r.room_id,
+        r.property_id,
+        r.room_name,
+        r.room_type,
+        
+        SUM(CASE WHEN f.severity = 'critical' THEN 1 ELSE 0 END) AS critical_count,
+        SUM(CASE WHEN f.severity = 'high' THEN 1 ELSE 0 END) AS high_count,
+        SUM(CASE WHEN f.severity = 'medium' THEN 1 ELSE 0 END) AS medium_count,
+        SUM(CASE WHEN f.severity = 'low' THEN 1 ELSE 0 END) AS low_count,
+        
+        MIN(100, 
+            (SUM(CASE WHEN f.severity = 'critical' THEN 1 ELSE 0 END) * 40) +
+            (SUM(CASE WHEN f.severity = 'high' THEN 1 ELSE 0 END) * 25) +
+            (SUM(CASE WHEN f.severity = 'medium' THEN 1 ELSE 0 END) * 15) +
+            (SUM(CASE WHEN f.severity = 'low' THEN 1 ELSE 0 END) * 5)
+        ) AS risk_score,
+        
+        CASE 
+            WHEN SUM(CASE WHEN f.severity = 'critical' THEN 1 ELSE 0 END) > 0 THEN 'CRITICAL'
+            WHEN SUM(CASE WHEN f.severity = 'high' THEN 1 ELSE 0 END) > 0 THEN 'HIGH RISK'
+            WHEN SUM(CASE WHEN f.severity = 'medium' THEN 1 ELSE 0 END) > 1 THEN 'MEDIUM RISK'
+            WHEN COUNT(f.finding_id) > 0 THEN 'LOW RISK'
+            ELSE 'NO ISSUES'
+        END AS risk_category
+
+    FROM ROOMS r
+    LEFT JOIN INSPECTION_FINDINGS f ON r.room_id = f.room_id
+    GROUP BY r.room_id, r.property_id, r.room_name, r.room_type
+    """)
+
+    # PROPERTY_RISK_SCORES View
+    c.execute("DROP VIEW IF EXISTS PROPERTY_RISK_SCORES")
+    c.execute("""
+    CREATE VIEW PROPERTY_RISK_SCORES AS
+    SELECT 
+        p.property_id,
+        p.property_name,
+        p.address,
+        COUNT(DISTINCT f.finding_id) AS total_findings,
+        SUM(CASE WHEN f.severity = 'critical' THEN 1 ELSE 0 END) AS critical_findings,
+        SUM(CASE WHEN f.severity = 'high' THEN 1 ELSE 0 END) AS high_findings,
+        
+        MIN(100, 
+            (SUM(CASE WHEN f.severity = 'critical' THEN 1 ELSE 0 END) * 40) + 
+            (SUM(CASE WHEN f.severity = 'high' THEN 1 ELSE 0 END) * 20) + 
+            (SUM(CASE WHEN f.severity = 'medium' THEN 1 ELSE 0 END) * 10) + 
+            (SUM(CASE WHEN f.severity = 'low' THEN 1 ELSE 0 END) * 2)
+        ) AS property_risk_score,
+        
+        CASE 
+            WHEN SUM(CASE WHEN f.severity = 'critical' THEN 1 ELSE 0 END) >= 1 THEN 'CRITICAL'
+            WHEN SUM(CASE WHEN f.severity = 'high' THEN 1 ELSE 0 END) >= 1 THEN 'HIGH RISK'
+            WHEN SUM(CASE WHEN f.severity = 'medium' THEN 1 ELSE 0 END) >= 2 THEN 'MEDIUM RISK'
+            WHEN COUNT(f.finding_id) > 0 THEN 'LOW RISK'
+            ELSE 'NO ISSUES'
+        END AS risk_rating,
+        
+        'Check actionable findings' AS recommendation
+
+    FROM PROPERTIES p
+    LEFT JOIN ROOMS r ON p.property_id = r.property_id
+    LEFT JOIN INSPECTION_FINDINGS f ON r.room_id = f.room_id
+    GROUP BY p.property_id, p.property_name, p.address
+    """)
+
+    # PROPERTY_INSPECTION_SUMMARY View
+    c.execute("DROP VIEW IF EXISTS PROPERTY_INSPECTION_SUMMARY")
+    c.execute("""
+    CREATE VIEW PROPERTY_INSPECTION_SUMMARY AS
+    SELECT 
+        p.property_id,
+        p.property_name,
+        prs.property_risk_score,
+        prs.risk_rating,
+        'Executive Summary: Risk level is ' || prs.risk_rating AS executive_summary,
+        'Action Required' AS recommended_actions
+    FROM PROPERTIES p
+    JOIN PROPERTY_RISK_SCORES prs ON p.property_id = prs.property_id
+    """)
+
+    # AI_CLASSIFIED_DEFECTS (Mock View)
+    c.execute("DROP VIEW IF EXISTS AI_CLASSIFIED_DEFECTS")
+    c.execute("""
+    CREATE VIEW AI_CLASSIFIED_DEFECTS AS
+    SELECT 
+        f.finding_id,
+        f.property_id,
+        r.room_name,
+        f.finding_category,
+        f.finding_description,
+        f.severity AS original_severity,
+        f.confidence_score,
+        
+        f.severity AS ai_predicted_severity,
+        'Urgent' AS urgency_score,
+        f.finding_description AS defect_summary
+    FROM INSPECTION_FINDINGS f
+    LEFT JOIN ROOMS r ON f.room_id = r.room_id
+    """)
+
+
+def _0002_users_password(c):
+    """Older databases were created before USERS.password existed."""
+    columns = [row[1] for row in c.execute("PRAGMA table_info(USERS)")]
+    if "password" not in columns:
+        c.execute("ALTER TABLE USERS ADD COLUMN password TEXT")
+
+
+def _0003_materialized_risk_scores(c):
+    """
+    Replace the ROOM_RISK_SCORES / PROPERTY_RISK_SCORES views with tables
+    maintained by triggers (see utils/risk_scores.py). Finding inserts,
+    updates and deletes adjust per-severity counters in place; room and
+    property changes re-aggregate only the affected room/property.
+    """
+    c.execute("DROP VIEW IF EXISTS PROPERTY_INSPECTION_SUMMARY")
+    c.execute("DROP VIEW IF EXISTS ROOM_RISK_SCORES")
+    c.execute("DROP VIEW IF EXISTS PROPERTY_RISK_SCORES")
+
+    # Reference definitions, used by check_risk_scores()
+    c.execute("""
+    CREATE VIEW ROOM_RISK_SCORES_LIVE AS
+    SELECT 
+        r.room_id,
+        r.property_id,
+        r.room_name,
+        r.room_type,
+        
+        SUM(CASE WHEN f.severity = 'critical' THEN 1 ELSE 0 END) AS critical_count,
+        SUM(CASE WHEN f.severity = 'high' THEN 1 ELSE 0 END) AS high_count,
+        SUM(CASE WHEN f.severity = 'medium' THEN 1 ELSE 0 END) AS medium_count,
+        SUM(CASE WHEN f.severity = 'low' THEN 1 ELSE 0 END) AS low_count,
+        
+        MIN(100, 
+            (SUM(CASE WHEN f.severity = 'critical' THEN 1 ELSE 0 END) * 40) +
+            (SUM(CASE WHEN f.severity = 'high' THEN 1 ELSE 0 END) * 25) +
+            (SUM(CASE WHEN f.severity = 'medium' THEN 1 ELSE 0 END) * 15) +
+            (SUM(CASE WHEN f.severity = 'low' THEN 1 ELSE 0 END) * 5)
+        ) AS risk_score,
+        
+        CASE 
+            WHEN SUM(CASE WHEN f.severity = 'critical' THEN 1 ELSE 0 END) > 0 THEN 'CRITICAL'
+            WHEN SUM(CASE WHEN f.severity = 'high' THEN 1 ELSE 0 END) > 0 THEN 'HIGH RISK'
+            WHEN SUM(CASE WHEN f.severity = 'medium' THEN 1 ELSE 0 END) > 1 THEN 'MEDIUM RISK'
+            WHEN COUNT(f.finding_id) > 0 THEN 'LOW RISK'
+            ELSE 'NO ISSUES'
+        END AS risk_category
+
+    FROM ROOMS r
+    LEFT JOIN INSPECTION_FINDINGS f ON r.room_id = f.room_id
+    GROUP BY r.room_id, r.property_id, r.room_name, r.room_type
+    """)
+
+    c.execute("""
+    CREATE VIEW PROPERTY_RISK_SCORES_LIVE AS
+    SELECT 
+        p.property_id,
+        p.property_name,
+        p.address,
+        COUNT(DISTINCT f.finding_id) AS total_findings,
+        SUM(CASE WHEN f.severity = 'critical' THEN 1 ELSE 0 END) AS critical_findings,
+        SUM(CASE WHEN f.severity = 'high' THEN 1 ELSE 0 END) AS high_findings,
+        
+        MIN(100, 
+            (SUM(CASE WHEN f.severity = 'critical' THEN 1 ELSE 0 END) * 40) + 
+            (SUM(CASE WHEN f.severity = 'high' THEN 1 ELSE 0 END) * 20) + 
+            (SUM(CASE WHEN f.severity = 'medium' THEN 1 ELSE 0 END) * 10) + 
+            (SUM(CASE WHEN f.severity = 'low' THEN 1 ELSE 0 END) * 2)
+        ) AS property_risk_score,
+        
+        CASE 
+            WHEN SUM(CASE WHEN f.severity = 'critical' THEN 1 ELSE 0 END) >= 1 THEN 'CRITICAL'
+            WHEN SUM(CASE WHEN f.severity = 'high' THEN 1 ELSE 0 END) >= 1 THEN 'HIGH RISK'
+            WHEN SUM(CASE WHEN f.severity = 'medium' THEN 1 ELSE 0 END) >= 2 THEN 'MEDIUM RISK'
+            WHEN COUNT(f.finding_id) > 0 THEN 'LOW RISK'
+            ELSE 'NO ISSUES'
+        END AS risk_rating,
+        
+        'Check actionable findings' AS recommendation
+
+    FROM PROPERTIES p
+    LEFT JOIN ROOMS r ON p.property_id = r.property_id
+    LEFT JOIN INSPECTION_FINDINGS f ON r.room_id = f.room_id
+    GROUP BY p.property_id, p.property_name, p.address
+    """)
+
+    c.execute("""
+    CREATE TABLE ROOM_RISK_SCORES (
+        room_id TEXT PRIMARY KEY,
+        property_id TEXT,
+        room_name TEXT,
+        room_type TEXT,
+        critical_count INTEGER NOT NULL DEFAULT 0,
+        high_count INTEGER NOT NULL DEFAULT 0,
+        medium_count INTEGER NOT NULL DEFAULT 0,
+        low_count INTEGER NOT NULL DEFAULT 0,
+        finding_count INTEGER NOT NULL DEFAULT 0,
+        risk_score INTEGER GENERATED ALWAYS AS (
+            MIN(100, critical_count * 40 + high_count * 25 + medium_count * 15 + low_count * 5)
+        ) VIRTUAL,
+        risk_category TEXT GENERATED ALWAYS AS (
+            CASE
+                WHEN critical_count > 0 THEN 'CRITICAL'
+                WHEN high_count > 0 THEN 'HIGH RISK'
+                WHEN medium_count > 1 THEN 'MEDIUM RISK'
+                WHEN finding_count > 0 THEN 'LOW RISK'
+                ELSE 'NO ISSUES'
+            END
+        ) VIRTUAL
+    )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_room_risk_scores_property ON ROOM_RISK_SCORES(property_id)")
+
+    c.execute("""
+    CREATE TABLE PROPERTY_RISK_SCORES (
+        property_id TEXT PRIMARY KEY,
+        property_name TEXT,
+        address TEXT,
+        total_findings INTEGER NOT NULL DEFAULT 0,
+        critical_findings INTEGER NOT NULL DEFAULT 0,
+        high_findings INTEGER NOT NULL DEFAULT 0,
+        medium_findings INTEGER NOT NULL DEFAULT 0,
+        low_findings INTEGER NOT NULL DEFAULT 0,
+        property_risk_score INTEGER GENERATED ALWAYS AS (
+            MIN(100, critical_findings * 40 + high_findings * 20 + medium_findings * 10 + low_findings * 2)
+        ) VIRTUAL,
+        risk_rating TEXT GENERATED ALWAYS AS (
+            CASE
+                WHEN critical_findings >= 1 THEN 'CRITICAL'
+                WHEN high_findings >= 1 THEN 'HIGH RISK'
+                WHEN medium_findings >= 2 THEN 'MEDIUM RISK'
+                WHEN total_findings > 0 THEN 'LOW RISK'
+                ELSE 'NO ISSUES'
+            END
+        ) VIRTUAL,
+        recommendation TEXT GENERATED ALWAYS AS ('Check actionable findings') VIRTUAL
+    )
+    """)
+
+    # Triggers look findings up by room, so that access path must be indexed
+    c.execute("CREATE INDEX IF NOT EXISTS idx_findings_room ON INSPECTION_FINDINGS(room_id)")
+
+    # Findings: O(1) counter deltas on the room row and its property row
+    for event, sign, row in (("INSERT", "+", "NEW"), ("DELETE", "-", "OLD")):
+        c.execute(f"""
+        CREATE TRIGGER trg_findings_risk_{event.lower()} AFTER {event} ON INSPECTION_FINDINGS
+        BEGIN
+            UPDATE ROOM_RISK_SCORES SET
+                critical_count = critical_count {sign} ({row}.severity IS 'critical'),
+                high_count = high_count {sign} ({row}.severity IS 'high'),
+                medium_count = medium_count {sign} ({row}.severity IS 'medium'),
+                low_count = low_count {sign} ({row}.severity IS 'low'),
+                finding_count = finding_count {sign} ({row}.finding_id IS NOT NULL)
+            WHERE room_id = {row}.room_id;
+
+            UPDATE PROPERTY_RISK_SCORES SET
+                critical_findings = critical_findings {sign} ({row}.severity IS 'critical'),
+                high_findings = high_findings {sign} ({row}.severity IS 'high'),
+                medium_findings = medium_findings {sign} ({row}.severity IS 'medium'),
+                low_findings = low_findings {sign} ({row}.severity IS 'low'),
+                total_findings = total_findings {sign} ({row}.finding_id IS NOT NULL)
+            WHERE property_id = (SELECT property_id FROM ROOMS WHERE room_id = {row}.room_id);
+        END
+        """)
+
+    c.execute("""
+    CREATE TRIGGER trg_findings_risk_update
+    AFTER UPDATE OF finding_id, room_id, severity ON INSPECTION_FINDINGS
+    BEGIN
+        UPDATE ROOM_RISK_SCORES SET
+            critical_count = critical_count - (OLD.severity IS 'critical'),
+            high_count = high_count - (OLD.severity IS 'high'),
+            medium_count = medium_count - (OLD.severity IS 'medium'),
+            low_count = low_count - (OLD.severity IS 'low'),
+            finding_count = finding_count - (OLD.finding_id IS NOT NULL)
+        WHERE room_id = OLD.room_id;
+        UPDATE PROPERTY_RISK_SCORES SET
+            critical_findings = critical_findings - (OLD.severity IS 'critical'),
+            high_findings = high_findings - (OLD.severity IS 'high'),
+            medium_findings = medium_findings - (OLD.severity IS 'medium'),
+            low_findings = low_findings - (OLD.severity IS 'low'),
+            total_findings = total_findings - (OLD.finding_id IS NOT NULL)
+        WHERE property_id = (SELECT property_id FROM ROOMS WHERE room_id = OLD.room_id);
+
+        UPDATE ROOM_RISK_SCORES SET
+            critical_count = critical_count + (NEW.severity IS 'critical'),
+            high_count = high_count + (NEW.severity IS 'high'),
+            medium_count = medium_count + (NEW.severity IS 'medium'),
+            low_count = low_count + (NEW.severity IS 'low'),
+            finding_count = finding_count + (NEW.finding_id IS NOT NULL)
+        WHERE room_id = NEW.room_id;
+        UPDATE PROPERTY_RISK_SCORES SET
+            critical_findings = critical_findings + (NEW.severity IS 'critical'),
+            high_findings = high_findings + (NEW.severity IS 'high'),
+            medium_findings = medium_findings + (NEW.severity IS 'medium'),
+            low_findings = low_findings + (NEW.severity IS 'low'),
+            total_findings = total_findings + (NEW.finding_id IS NOT NULL)
+        WHERE property_id = (SELECT property_id FROM ROOMS WHERE room_id = NEW.room_id);
+    END
+    """)
+
+    # Rooms: add/remove the room's totals on its property, re-aggregating
+    # only that room's findings when it is (re)created.
+    room_insert = """
+        INSERT INTO ROOM_RISK_SCORES (
+            room_id, property_id, room_name, room_type,
+            critical_count, high_count, medium_count, low_count, finding_count
+        )
+        SELECT
+            NEW.room_id, NEW.property_id, NEW.room_name, NEW.room_type,
+            COALESCE(SUM(severity IS 'critical'), 0),
+            COALESCE(SUM(severity IS 'high'), 0),
+            COALESCE(SUM(severity IS 'medium'), 0),
+            COALESCE(SUM(severity IS 'low'), 0),
+            COUNT(finding_id)
+        FROM INSPECTION_FINDINGS WHERE room_id = NEW.room_id;
+
+        UPDATE PROPERTY_RISK_SCORES SET
+            critical_findings = critical_findings + (SELECT critical_count FROM ROOM_RISK_SCORES WHERE room_id = NEW.room_id),
+            high_findings = high_findings + (SELECT high_count FROM ROOM_RISK_SCORES WHERE room_id = NEW.room_id),
+            medium_findings = medium_findings + (SELECT medium_count FROM ROOM_RISK_SCORES WHERE room_id = NEW.room_id),
+            low_findings = low_findings + (SELECT low_count FROM ROOM_RISK_SCORES WHERE room_id = NEW.room_id),
+            total_findings = total_findings + (SELECT finding_count FROM ROOM_RISK_SCORES WHERE room_id = NEW.room_id)
+        WHERE property_id = NEW.property_id;
+    """
+    room_delete = """
+        UPDATE PROPERTY_RISK_SCORES SET
+            critical_findings = critical_findings - (SELECT critical_count FROM ROOM_RISK_SCORES WHERE room_id = OLD.room_id),
+            high_findings = high_findings - (SELECT high_count FROM ROOM_RISK_SCORES WHERE room_id = OLD.room_id),
+            medium_findings = medium_findings - (SELECT medium_count FROM ROOM_RISK_SCORES WHERE room_id = OLD.room_id),
+            low_findings = low_findings - (SELECT low_count FROM ROOM_RISK_SCORES WHERE room_id = OLD.room_id),
+            total_findings = total_findings - (SELECT finding_count FROM ROOM_RISK_SCORES WHERE room_id = OLD.room_id)
+        WHERE property_id = OLD.property_id;
+
+        DELETE FROM ROOM_RISK_SCORES WHERE room_id = OLD.room_id;
+    """
+    c.execute(f"CREATE TRIGGER trg_rooms_risk_insert AFTER INSERT ON ROOMS BEGIN {room_insert} END")
+    c.execute(f"CREATE TRIGGER trg_rooms_risk_delete AFTER DELETE ON ROOMS BEGIN {room_delete} END")
+    c.execute(f"CREATE TRIGGER trg_rooms_risk_update AFTER UPDATE ON ROOMS BEGIN {room_delete} {room_insert} END")
+
+    # Properties: (re)build the property row from its rooms' totals
+    property_insert = """
+        INSERT INTO PROPERTY_RISK_SCORES (
+            property_id, property_name, address,
+            total_findings, critical_findings, high_findings, medium_findings, low_findings
+        )
+        SELECT
+            NEW.property_id, NEW.property_name, NEW.address,
+            COALESCE(SUM(finding_count), 0),
+            COALESCE(SUM(critical_count), 0),
+            COALESCE(SUM(high_count), 0),
+            COALESCE(SUM(medium_count), 0),
+            COALESCE(SUM(low_count), 0)
+        FROM ROOM_RISK_SCORES WHERE property_id = NEW.property_id;
+    """
+    c.execute(f"CREATE TRIGGER trg_properties_risk_insert AFTER INSERT ON PROPERTIES BEGIN {property_insert} END")
+    c.execute("""
+    CREATE TRIGGER trg_properties_risk_delete AFTER DELETE ON PROPERTIES
+    BEGIN
+        DELETE FROM PROPERTY_RISK_SCORES WHERE property_id = OLD.property_id;
+    END
+    """)
+    c.execute(f"""
+    CREATE TRIGGER trg_properties_risk_update
+    AFTER UPDATE OF property_id, property_name, address ON PROPERTIES
+    BEGIN
+        DELETE FROM PROPERTY_RISK_SCORES WHERE property_id = OLD.property_id;
+        {property_insert}
+    END
+    """)
+
+    rebuild_risk_scores(c)
+
+    c.execute("""
+    CREATE VIEW PROPERTY_INSPECTION_SUMMARY AS
+    SELECT 
+        p.property_id,
+        p.property_name,
+        prs.property_risk_score,
+        prs.risk_rating,
+        'Executive Summary: Risk level is ' || prs.risk_rating AS executive_summary,
+        'Action Required' AS recommended_actions
+    FROM PROPERTIES p
+    JOIN PROPERTY_RISK_SCORES prs ON p.property_id = prs.property_id
+    """)
+
+
+def _0004_index_set(c):
+    """
+    Secondary indexes for the access paths the pages filter on.
+    USERS.email is already covered by its UNIQUE constraint (login lookup).
+    """
+    c.execute("CREATE INDEX IF NOT EXISTS idx_inspector_profiles_user ON INSPECTOR_PROFILES(user_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_properties_owner ON PROPERTIES(owner_user_id, created_at)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_rooms_property ON ROOMS(property_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_findings_property ON INSPECTION_FINDINGS(property_id, severity)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_images_property ON INSPECTION_IMAGES(property_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_images_room ON INSPECTION_IMAGES(room_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_inspector_reports_property ON INSPECTOR_REPORTS(property_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_documents_property ON INSPECTION_DOCUMENTS(property_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_ratings_inspector ON INSPECTION_RATINGS(inspector_id)")
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_access_requests_property_requester
+        ON ACCESS_REQUESTS(property_id, requester_user_id, status)
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_access_requests_owner_status ON ACCESS_REQUESTS(owner_user_id, status)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_service_requests_status ON INSPECTION_SERVICE_REQUESTS(status)")
+
+
+def _0005_ai_analysis_cache(c):
+    """Persistent image-analysis results keyed by content hash (utils/analysis_cache.py)."""
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS AI_ANALYSIS_CACHE (
+        content_hash TEXT,
+        model TEXT,
+        prompt_version TEXT,
+        result TEXT, -- Stored as JSON string
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        last_used_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        hit_count INTEGER DEFAULT 0,
+        PRIMARY KEY (content_hash, model, prompt_version)
+    )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_ai_cache_last_used ON AI_ANALYSIS_CACHE(last_used_at)")
+
+
+def _0006_blob_refs(c):
+    """Content-addressed upload blobs and their reference counts (utils/blobstore.py)."""
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS BLOBS (
+        digest TEXT PRIMARY KEY, -- sha256 of the content
+        url TEXT UNIQUE,
+        size_bytes INTEGER,
+        ref_count INTEGER DEFAULT 0,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_blobs_unreferenced ON BLOBS(created_at) WHERE ref_count = 0")
+
+    # INSPECTION_IMAGES.image_url and INSPECTION_DOCUMENTS.file_url hold blob URLs
+    for table, column in (("INSPECTION_IMAGES", "image_url"), ("INSPECTION_DOCUMENTS", "file_url")):
+        name = table.lower()
+        c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{name}_blob_ref_insert
+        AFTER INSERT ON {table} WHEN NEW.{column} IS NOT NULL
+        BEGIN
+            UPDATE BLOBS SET ref_count = ref_count + 1 WHERE url = NEW.{column};
+        END
+        """)
+        c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{name}_blob_ref_delete
+        AFTER DELETE ON {table} WHEN OLD.{column} IS NOT NULL
+        BEGIN
+            UPDATE BLOBS SET ref_count = ref_count - 1 WHERE url = OLD.{column};
+        END
+        """)
+        c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{name}_blob_ref_update
+        AFTER UPDATE OF {column} ON {table} WHEN OLD.{column} IS NOT NEW.{column}
+        BEGIN
+            UPDATE BLOBS SET ref_count = ref_count - 1 WHERE url = OLD.{column};
+            UPDATE BLOBS SET ref_count = ref_count + 1 WHERE url = NEW.{column};
+        END
+        """)
+
+
+def _0007_property_search(c):
+    """FTS5 index over property name, address and house number (utils/search.py)."""
+    # External content: the index reads column values from PROPERTIES by rowid,
+    # so nothing is stored twice. Rebuild after a VACUUM (python -m utils.search rebuild).
+    c.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS PROPERTY_SEARCH USING fts5(
+        property_name, address, house_number,
+        content='PROPERTIES', content_rowid='rowid',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='1 2 3'
+    )
+    """)
+    # ORDER BY rank: a house number hit counts double
+    c.execute("INSERT INTO PROPERTY_SEARCH(PROPERTY_SEARCH, rank) VALUES ('rank', 'bm25(1.0, 1.0, 2.0)')")
+
+    c.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_property_search_insert
+    AFTER INSERT ON PROPERTIES
+    BEGIN
+        INSERT INTO PROPERTY_SEARCH (rowid, property_name, address, house_number)
+        VALUES (NEW.rowid, NEW.property_name, NEW.address, NEW.house_number);
+    END
+    """)
+    c.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_property_search_delete
+    AFTER DELETE ON PROPERTIES
+    BEGIN
+        INSERT INTO PROPERTY_SEARCH (PROPERTY_SEARCH, rowid, property_name, address, house_number)
+        VALUES ('delete', OLD.rowid, OLD.property_name, OLD.address, OLD.house_number);
+    END
+    """)
+    c.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_property_search_update
+    AFTER UPDATE OF property_name, address, house_number ON PROPERTIES
+    BEGIN
+        INSERT INTO PROPERTY_SEARCH (PROPERTY_SEARCH, rowid, property_name, address, house_number)
+        VALUES ('delete', OLD.rowid, OLD.property_name, OLD.address, OLD.house_number);
+        INSERT INTO PROPERTY_SEARCH (rowid, property_name, address, house_number)
+        VALUES (NEW.rowid, NEW.property_name, NEW.address, NEW.house_number);
+    END
+    """)
+    c.execute("INSERT INTO PROPERTY_SEARCH(PROPERTY_SEARCH) VALUES ('rebuild')")
+
+
+def _0008_report_versions(c):
+    """Per-property change counter for the cached report loader (utils/reports.py)."""
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS REPORT_VERSIONS (
+        property_id TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    c.execute("INSERT OR IGNORE INTO REPORT_VERSIONS (property_id) SELECT property_id FROM PROPERTIES")
+
+    bump = """
+        INSERT INTO REPORT_VERSIONS (property_id, version) VALUES ({ref}.property_id, 1)
+        ON CONFLICT(property_id) DO UPDATE SET version = version + 1;
+    """
+    # Everything the Analysis Results page shows hangs off these tables
+    for table in ("PROPERTIES", "ROOMS", "INSPECTION_FINDINGS", "INSPECTOR_REPORTS", "INSPECTION_DOCUMENTS"):
+        name = table.lower()
+        events = [("insert", "NEW"), ("delete", "OLD")]
+        for event, ref in events:
+            c.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{name}_report_version_{event}
+            AFTER {event.upper()} ON {table}
+            BEGIN
+                {bump.format(ref=ref)}
+            END
+            """)
+        c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{name}_report_version_update
+        AFTER UPDATE ON {table}
+        BEGIN
+            {bump.format(ref="OLD")}
+            {bump.format(ref="NEW")}
+        END
+        """)
+
+
+def _0009_document_chunks(c):
+    """Full document text in chunks, plus per-page extraction timings (utils/documents.py)."""
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS DOCUMENT_CHUNKS (
+        doc_id TEXT,
+        chunk_index INTEGER,
+        page_start INTEGER,
+        page_end INTEGER,
+        content TEXT,
+        PRIMARY KEY (doc_id, chunk_index)
+    )
+    """)
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS DOCUMENT_PAGES (
+        doc_id TEXT,
+        page_number INTEGER,
+        char_count INTEGER,
+        extract_ms REAL,
+        PRIMARY KEY (doc_id, page_number)
+    )
+    """)
+    c.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_inspection_documents_chunks_delete
+    AFTER DELETE ON INSPECTION_DOCUMENTS
+    BEGIN
+        DELETE FROM DOCUMENT_CHUNKS WHERE doc_id = OLD.doc_id;
+        DELETE FROM DOCUMENT_PAGES WHERE doc_id = OLD.doc_id;
+    END
+    """)
+    # Documents ingested before this migration only kept a preview
+    c.execute("""
+    INSERT OR IGNORE INTO DOCUMENT_CHUNKS (doc_id, chunk_index, page_start, page_end, content)
+    SELECT doc_id, 0, 1, 1, extracted_text FROM INSPECTION_DOCUMENTS WHERE extracted_text IS NOT NULL
+    """)
+
+
+def _0010_jobs(c):
+    """Background job queue for AI analysis (utils/jobs.py)."""
+    # Times are unix epoch seconds. run_after is when the job is next visible
+    # to workers: the backoff for a queued retry, the lease end while running.
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS JOBS (
+        job_id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        idempotency_key TEXT UNIQUE,
+        group_id TEXT,
+        payload TEXT NOT NULL, -- JSON
+        status TEXT NOT NULL DEFAULT 'queued', -- queued/running/done/failed
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL DEFAULT 5,
+        run_after REAL NOT NULL,
+        locked_by TEXT,
+        progress_done INTEGER DEFAULT 0,
+        progress_total INTEGER DEFAULT 0,
+        result TEXT, -- JSON
+        last_error TEXT,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_jobs_ready ON JOBS(status, run_after)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_jobs_group ON JOBS(group_id, created_at)")
+
+
+def _0011_defect_rules(c):
+    """Keyword rules for the deterministic classifier (utils/rules.py), as in schema.sql."""
+    c.execute("""
+    CREATE TABLE IF NOT EXISTS DEFECT_CLASSIFICATION_RULES (
+        rule_id INTEGER PRIMARY KEY,
+        defect_keyword TEXT NOT NULL, -- crack, damp, leak, exposed_wiring, etc.
+        defect_category TEXT, -- structural/electrical/moisture/plumbing/finishing
+        severity_level TEXT, -- critical/high/medium/low
+        risk_weight REAL, -- 0-1 for scoring
+        description TEXT
+    )
+    """)
+    # schema.sql's rules, then the words the mock backend used to match on file names
+    c.executemany("INSERT OR IGNORE INTO DEFECT_CLASSIFICATION_RULES VALUES (?, ?, ?, ?, ?, ?)", [
+        (1, 'crack', 'structural', 'high', 0.85, 'Structural integrity compromised'),
+        (2, 'exposed_wiring', 'electrical', 'critical', 1.00, 'Immediate safety hazard'),
+        (3, 'damp', 'moisture', 'high', 0.80, 'Water ingress issues'),
+        (4, 'leak', 'plumbing', 'medium', 0.60, 'Active water leakage'),
+        (5, 'poor_finish', 'finishing', 'low', 0.30, 'Cosmetic issues'),
+        (6, 'wet', 'moisture', 'high', 0.80, 'Water ingress issues'),
+        (7, 'mold', 'moisture', 'high', 0.80, 'Mould growth from persistent damp'),
+        (8, 'mould', 'moisture', 'high', 0.80, 'Mould growth from persistent damp'),
+        (9, 'water', 'moisture', 'high', 0.80, 'Water ingress issues'),
+        (10, 'wire', 'electrical', 'critical', 1.00, 'Exposed or damaged wiring'),
+        (11, 'wiring', 'electrical', 'critical', 1.00, 'Exposed or damaged wiring'),
+        (12, 'cable', 'electrical', 'critical', 1.00, 'Exposed or damaged wiring'),
+        (13, 'electric', 'electrical', 'critical', 1.00, 'Electrical hazard'),
+        (14, 'split', 'structural', 'high', 0.85, 'Structural integrity compromised'),
+    ])
+
+
+def _0012_report_versions_inspector(c):
+    """Bump REPORT_VERSIONS when an inspector shown on a report is renamed or reassigned."""
+    c.execute("CREATE INDEX IF NOT EXISTS idx_inspector_reports_inspector ON INSPECTOR_REPORTS(inspector_id)")
+    bump = """
+        INSERT INTO REPORT_VERSIONS (property_id, version)
+        SELECT property_id, 1 FROM INSPECTOR_REPORTS WHERE {where} AND property_id IS NOT NULL
+        ON CONFLICT(property_id) DO UPDATE SET version = version + 1;
+    """
+    by_user = "inspector_id IN (SELECT inspector_id FROM INSPECTOR_PROFILES WHERE user_id = {ref}.user_id)"
+    c.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_users_report_version_update
+    AFTER UPDATE OF user_id, full_name ON USERS
+    BEGIN
+        {bump.format(where=by_user.format(ref="OLD"))}
+        {bump.format(where=by_user.format(ref="NEW"))}
+    END
+    """)
+    by_profile = "inspector_id = {ref}.inspector_id"
+    for event, refs in (("insert", ["NEW"]), ("update", ["OLD", "NEW"]), ("delete", ["OLD"])):
+        body = "".join(bump.format(where=by_profile.format(ref=ref)) for ref in refs)
+        c.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_inspector_profiles_report_version_{event}
+        AFTER {event.upper()} ON INSPECTOR_PROFILES
+        BEGIN
+            {body}
+        END
+        """)
+
+
+# (version, name, function) - append only, never renumber.
+MIGRATIONS = [
+    (1, "initial_schema", _0001_initial_schema),
+    (2, "users_password", _0002_users_password),
+    (3, "materialized_risk_scores", _0003_materialized_risk_scores),
+    (4, "index_set", _0004_index_set),
+    (5, "ai_analysis_cache", _0005_ai_analysis_cache),
+    (6, "blob_refs", _0006_blob_refs),
+    (7, "property_search", _0007_property_search),
+    (8, "report_versions", _0008_report_versions),
+    (9, "document_chunks", _0009_document_chunks),
+    (10, "jobs", _0010_jobs),
+    (11, "defect_rules", _0011_defect_rules),
+    (12, "report_versions_inspector", _0012_report_versions_inspector),
+]
+
+_migrated = set()
+_migrate_lock = threading.Lock()
+
+
+def _ensure_version_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS SCHEMA_VERSION (
+            version INTEGER PRIMARY KEY,
+            name TEXT,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.commit()
+
+
+def applied_versions(conn):
+    """Set of migration versions already recorded in SCHEMA_VERSION."""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'SCHEMA_VERSION'"
+    ).fetchone()
+    if not exists:
+        return set()
+    return {row[0] for row in conn.execute("SELECT version FROM SCHEMA_VERSION")}
+
+
+def pending_migrations(conn):
+    done = applied_versions(conn)
+    return [m for m in MIGRATIONS if m[0] not in done]
+
+
+def run_migrations(conn, verbose=False):
+    """Apply all pending migrations in order. Returns the versions applied."""
+    pending = pending_migrations(conn)
+    if not pending:
+        return []
+
+    _ensure_version_table(conn)
+    applied = []
+    for version, name, migration in pending:
+        c = conn.cursor()
+        try:
+            c.execute("BEGIN IMMEDIATE")
+            # Another process may have migrated while we waited for the lock
+            if c.execute("SELECT 1 FROM SCHEMA_VERSION WHERE version = ?", (version,)).fetchone():
+                conn.rollback()
+                continue
+            migration(c)
+            c.execute("INSERT INTO SCHEMA_VERSION (version, name) VALUES (?, ?)", (version, name))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+        if verbose:
+            print(f"Applied migration {version:04d}_{name}")
+    return applied
+
+
+def ensure_migrated(db_file, max_size=8):
+    """Run pending migrations at most once per process for db_file."""
+    if db_file in _migrated:
+        return
+    with _migrate_lock:
+        if db_file in _migrated:
+            return
+        pool = get_pool(db_file, max_size=max_size)
+        conn = pool.acquire()
+        try:
+            run_migrations(conn)
+        finally:
+            pool.release(conn)
+        _migrated.add(db_file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply pending SQLite schema migrations.")
+    parser.add_argument("--db", default=os.getenv("INSPECTION_DB_FILE", "local_db.sqlite"))
+    parser.add_argument("--status", action="store_true", help="List migrations without applying them")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.status:
+            done = applied_versions(conn)
+            for version, name, _ in MIGRATIONS:
+                mark = "applied" if version in done else "pending"
+                print(f"{version:04d}_{name}: {mark}")
+            return 0
+        applied = run_migrations(conn, verbose=True)
+        if not applied:
+            print("Schema is up to date.")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
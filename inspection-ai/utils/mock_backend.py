@@ -0,0 +1,284 @@
+import os
+import json
+import time
+import re
+import zlib
+import random
+import asyncio
+import argparse
+import threading
+from utils import rules
+
+# Offline stand-in for Gemini used by utils/ai.py when no API key is set, a
+# call fails, or the user forces a result from the wizard sidebar.
+#
+# The backend produces the mock results and waits according to a latency
+# model, chosen with MOCK_LATENCY:
+#
+#     MOCK_LATENCY=zero                  # no waiting (default)
+#     MOCK_LATENCY=fixed                 # demo timings: 1.0s per image, 1.5s per text call
+#     MOCK_LATENCY=fixed:0.2             # the same delay for every call
+#     MOCK_LATENCY=sampled:trace.jsonl   # replay latencies recorded from real Gemini calls
+#
+# Real Gemini latencies are appended to GEMINI_TRACE_FILE (JSON lines of
+# {"kind": ..., "latency_s": ...}) when it is set, which is the input for
+# the sampled model. Summarize a trace with:
+#
+#     python -m utils.mock_backend trace.jsonl
+
+GEMINI_TRACE_FILE = os.getenv("GEMINI_TRACE_FILE")
+
+# Call kinds; each latency model can treat them differently
+IMAGE = "image"
+BATCH = "batch"
+SIMULATION = "simulation"
+DOCUMENT = "document"
+COMPARISON = "comparison"
+CHUNK = "chunk"
+
+DEMO_DELAYS = {IMAGE: 1.0, BATCH: 1.0, SIMULATION: 1.0, DOCUMENT: 1.5, COMPARISON: 1.5, CHUNK: 0.5}
+
+
+class ZeroLatency:
+    def delay(self, kind):
+        return 0.0
+
+
+class FixedLatency:
+    """Same delay per call kind; seconds overrides every kind when given."""
+
+    def __init__(self, seconds=None, delays=None):
+        self.seconds = seconds
+        self.delays = delays or DEMO_DELAYS
+
+    def delay(self, kind):
+        if self.seconds is not None:
+            return self.seconds
+        return self.delays.get(kind, 0.0)
+
+
+class SampledLatency:
+    """Draws delays from recorded samples per kind (falls back to all samples)."""
+
+    def __init__(self, samples, seed=None):
+        self.samples = {kind: list(values) for kind, values in samples.items() if values}
+        self._all = [v for values in self.samples.values() for v in values]
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_trace(cls, path, seed=None):
+        return cls(load_trace(path), seed=seed)
+
+    def delay(self, kind):
+        values = self.samples.get(kind) or self._all
+        if not values:
+            return 0.0
+        with self._lock:
+            return self._random.choice(values)
+
+
+def latency_from_spec(spec):
+    """Build a latency model from a MOCK_LATENCY value."""
+    name, _, arg = (spec or "zero").partition(":")
+    name = name.strip().lower()
+    if name == "zero":
+        return ZeroLatency()
+    if name == "fixed":
+        return FixedLatency(float(arg) if arg else None)
+    if name == "sampled":
+        if not arg:
+            raise ValueError("MOCK_LATENCY=sampled needs a trace file, e.g. sampled:trace.jsonl")
+        return SampledLatency.from_trace(arg)
+    raise ValueError(f"Unknown MOCK_LATENCY '{spec}'")
+
+
+def load_trace(path):
+    """Read a latency trace into {kind: [seconds, ...]}."""
+    samples = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            samples.setdefault(row.get("kind", IMAGE), []).append(float(row["latency_s"]))
+    return samples
+
+
+_trace_lock = threading.Lock()
+
+
+def record_latency(kind, seconds):
+    """Append one real Gemini call to GEMINI_TRACE_FILE (no-op when unset)."""
+    if not GEMINI_TRACE_FILE:
+        return
+    line = json.dumps({"kind": kind, "latency_s": round(seconds, 4), "ts": time.time()})
+    try:
+        with _trace_lock, open(GEMINI_TRACE_FILE, "a") as f:
+            f.write(line + "\n")
+    except OSError as e:
+        print(f"Could not record Gemini latency: {e}")
+
+
+SIMULATED_RESULTS = {
+    "damp": {
+        "defect_type": "moisture",
+        "val_defect_name": "damped wall",
+        "severity": "critical",
+        "confidence": 0.99,
+        "description": "Simulated: Detected severe dampness and potential mold.",
+        "action": "Urgent: Waterproofing required immediately."
+    },
+    "wiring": {
+        "defect_type": "electrical",
+        "val_defect_name": "exposed wiring",
+        "severity": "critical",
+        "confidence": 0.99,
+        "description": "Simulated: Exposed electrical wiring detected.",
+        "action": "Danger: Isolate circuit and call electrician."
+    },
+    "structural": {
+        "defect_type": "structural",
+        "val_defect_name": "structural cracks",
+        "severity": "high",
+        "confidence": 0.99,
+        "description": "Simulated: Major structural cracking detected.",
+        "action": "Consult structural engineer."
+    },
+    "ok": {
+        "defect_type": "none",
+        "val_defect_name": "ok",
+        "severity": "ok",
+        "confidence": 0.99,
+        "description": "Simulated: No defects found.",
+        "action": "None"
+    },
+}
+
+MOCK_DOCUMENT_RESULT = {
+    "ai_summary": "Simulated Analysis: The document appears to clearly outline structural and moisture issues. It recommends immediate waterproofing.",
+    "ai_suggestions": "- Apply hydrophobic coating to exterior walls.\n- Replace corroded piping in the utility area.\n- verify load-bearing columns."
+}
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+class MockBackend:
+    """Mock results plus a latency model. Swap either with set_backend()."""
+
+    def __init__(self, latency=None):
+        self.latency = latency or ZeroLatency()
+
+    def wait(self, kind):
+        delay = self.latency.delay(kind)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def wait_async(self, kind):
+        delay = self.latency.delay(kind)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def simulated_result(self, simulation_override):
+        result = SIMULATED_RESULTS.get(simulation_override)
+        return dict(result) if result else None
+
+    def image_result(self, image_path_or_url):
+        """
+        Rule match on the file name (DEFECT_CLASSIFICATION_RULES, see
+        utils/rules.py), otherwise a defect picked by the name's hash, so the
+        same name always gets the same result.
+        """
+        name = str(image_path_or_url)
+        rule = rules.get_engine().classify(name)
+        if rule:
+            return rules.image_result(rule)
+
+        outcomes = [
+            {"type": "moisture", "name": "damped wall", "sev": "critical", "desc": "Wall saturation detected.", "act": "Waterproof now."},
+            {"type": "electrical", "name": "exposed wiring", "sev": "critical", "desc": "Dangerous wiring detected.", "act": "Fix wiring."},
+            {"type": "structural", "name": "structural cracks", "sev": "high", "desc": "Wall fractures detected.", "act": "Monitor cracks."},
+            {"type": "none", "name": "ok", "sev": "ok", "desc": "No defects.", "act": "None."}
+        ]
+        # Default to finding something for demo (30/30/30/10 across names)
+        bucket = zlib.crc32(os.path.basename(name).lower().encode("utf-8")) % 100
+        choice = outcomes[min(bucket // 30, 3)]
+        return {
+            "defect_type": choice["type"], "val_defect_name": choice["name"],
+            "severity": choice["sev"], "confidence": 0.9,
+            "description": choice["desc"], "action": choice["act"]
+        }
+
+    def document_result(self, text_content):
+        return dict(MOCK_DOCUMENT_RESULT)
+
+    def narrative_result(self, comparison):
+        return {"summary": (
+            f"Simulated: {comparison['matched_findings']} of {comparison['total_findings']} AI findings are confirmed by the report, "
+            f"and {comparison['unmatched_report']} of {comparison['report_defects']} reported defects were not seen in the images."
+        )}
+
+    def chunk_result(self, text):
+        """
+        Extractive stand-in for a chunk summary: the first sentences that match
+        a defect rule (utils/rules.py), and the categories of those rules.
+        """
+        engine = rules.get_engine()
+        picked, defects = [], set()
+        for sentence in _SENTENCE_RE.split(" ".join(text.split())):
+            hits = engine.categories(sentence)
+            if hits and len(picked) < 3 and sentence not in picked:
+                picked.append(sentence[:200])
+            defects |= hits
+        return {
+            "summary": " ".join(picked) or "No defects mentioned in this part.",
+            "defects": sorted(defects),
+        }
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = MockBackend(latency_from_spec(os.getenv("MOCK_LATENCY", "zero")))
+    return _backend
+
+
+def set_backend(backend):
+    """Replace the process-wide mock backend (e.g. MockBackend(ZeroLatency()) in a load test)."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize a recorded Gemini latency trace.")
+    parser.add_argument("trace", nargs="?", default=GEMINI_TRACE_FILE)
+    args = parser.parse_args(argv)
+    if not args.trace:
+        parser.error("pass a trace file or set GEMINI_TRACE_FILE")
+
+    samples = load_trace(args.trace)
+    if not samples:
+        print("Trace is empty.")
+        return 1
+    print(f"{'kind':<12}{'calls':>7}{'mean':>9}{'p50':>9}{'p95':>9}{'max':>9}")
+    for kind, values in sorted(samples.items()):
+        print(f"{kind:<12}{len(values):>7}{sum(values) / len(values):>9.3f}"
+              f"{_percentile(values, 50):>9.3f}{_percentile(values, 95):>9.3f}{max(values):>9.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
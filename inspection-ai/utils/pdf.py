@@ -0,0 +1,430 @@
+import io
+import os
+import re
+import sys
+import time
+import zlib
+import sqlite3
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from PIL import Image
+from utils import db
+from utils.reports import load_report
+from utils.grouping import records, grouped_records
+from utils.blobstore import local_path
+from utils.images import thumbnail
+
+# PDF inspection reports.
+#
+# PdfWriter is a small PDF 1.4 writer: objects go to the output stream as
+# soon as they are complete (only the page being laid out is held in memory)
+# and the page tree and xref table are written at the end. Text uses the
+# built-in Helvetica fonts; photos are embedded as their JPEG thumbnails
+# (utils/images.py), each once per document.
+#
+#     python -m utils.pdf render PROP0000001 -o report.pdf
+#     python -m utils.pdf batch -o reports/ --workers 4          # every property
+#     python -m utils.pdf bench --properties 200 --workers 4     # pages/sec on a seeded DB
+
+REPORT_DIR = os.getenv("REPORT_DIR", os.path.join("uploads", "reports"))
+# Smaller batches render in-process: starting spawned workers (each imports
+# pandas and opens its own connections) costs more than it saves
+PDF_POOL_MIN_REPORTS = int(os.getenv("PDF_POOL_MIN_REPORTS", "200"))
+
+PAGE_W, PAGE_H = 595, 842  # A4 in points
+MARGIN = 50
+THUMB_W, THUMB_H = 115, 86
+
+SEVERITY_COLORS = {
+    "critical": (0.75, 0.1, 0.1),
+    "high": (0.85, 0.45, 0.0),
+    "medium": (0.7, 0.6, 0.0),
+    "low": (0.2, 0.5, 0.2),
+}
+
+
+def _pdf_string(text):
+    data = str(text).encode("cp1252", "replace")
+    return b"(" + data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+class PdfWriter:
+    """Streams a PDF to a binary file object. Call close() to finish the document."""
+
+    CATALOG, PAGES, FONT, FONT_BOLD = 1, 2, 3, 4
+
+    def __init__(self, out, title=None):
+        self.out = out
+        self.pos = 0
+        self.offsets = {}
+        self.next_obj = 5
+        self.kids = []
+        self.title = title
+        self._jpegs = {}
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._object(self.CATALOG, b"<< /Type /Catalog /Pages 2 0 R >>")
+        self._object(self.FONT, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+        self._object(self.FONT_BOLD, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>")
+
+    def _write(self, data):
+        self.out.write(data)
+        self.pos += len(data)
+
+    def _new_obj(self):
+        num = self.next_obj
+        self.next_obj += 1
+        return num
+
+    def _object(self, num, body, stream=None):
+        self.offsets[num] = self.pos
+        self._write(b"%d 0 obj\n" % num + body)
+        if stream is not None:
+            self._write(b"\nstream\n" + stream + b"\nendstream")
+        self._write(b"\nendobj\n")
+
+    def add_jpeg(self, path):
+        """Embed a JPEG (other formats are re-encoded) once per document. Returns (obj, width, height) or None."""
+        if path in self._jpegs:
+            return self._jpegs[path]
+        try:
+            with Image.open(path) as img:
+                width, height = img.size
+                if img.format == "JPEG" and img.mode in ("RGB", "L"):
+                    mode = img.mode
+                    with open(path, "rb") as f:
+                        data = f.read()
+                else:
+                    img = img.convert("RGB")
+                    mode = "RGB"
+                    buf = io.BytesIO()
+                    img.save(buf, "JPEG", quality=80)
+                    data = buf.getvalue()
+        except Exception as e:
+            print(f"Skipping image {path}: {e}")
+            self._jpegs[path] = None
+            return None
+        num = self._new_obj()
+        colorspace = b"/DeviceRGB" if mode == "RGB" else b"/DeviceGray"
+        self._object(num, b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace %s "
+                          b"/BitsPerComponent 8 /Filter /DCTDecode /Length %d >>"
+                     % (width, height, colorspace, len(data)), data)
+        self._jpegs[path] = (num, width, height)
+        return self._jpegs[path]
+
+    def add_page(self, content, images=()):
+        """Write one page: content is the raw content-stream bytes, images the XObject numbers it uses."""
+        data = zlib.compress(content)
+        content_num = self._new_obj()
+        self._object(content_num, b"<< /Length %d /Filter /FlateDecode >>" % len(data), data)
+        xobjects = b" ".join(b"/Im%d %d 0 R" % (n, n) for n in sorted(set(images)))
+        page_num = self._new_obj()
+        self._object(page_num, b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R "
+                               b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> /XObject << %s >> >> >>"
+                     % (PAGE_W, PAGE_H, content_num, xobjects))
+        self.kids.append(page_num)
+
+    def close(self):
+        kids = b" ".join(b"%d 0 R" % k for k in self.kids)
+        self._object(self.PAGES, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self.kids)))
+        info = self._new_obj()
+        self._object(info, b"<< /Producer (Inspection AI) /Title %s >>" % _pdf_string(self.title or "Inspection Report"))
+        xref = self.pos
+        self._write(b"xref\n0 %d\n0000000000 65535 f \n" % self.next_obj)
+        for num in range(1, self.next_obj):
+            self._write(b"%010d 00000 n \n" % self.offsets[num])
+        self._write(b"trailer\n<< /Size %d /Root 1 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                    % (self.next_obj, info, xref))
+        return len(self.kids)
+
+
+class _Layout:
+    """Top-to-bottom flow of text, rules and thumbnails over as many pages as needed."""
+
+    def __init__(self, writer, footer):
+        self.writer = writer
+        self.footer = footer
+        self.ops = []
+        self.images = []
+        self.y = PAGE_H - MARGIN
+        self.pages = 0
+
+    def _flush(self):
+        self.pages += 1
+        self.ops.append(b"BT /F1 8 Tf 0.5 g %d %d Td %s Tj ET"
+                        % (MARGIN, MARGIN / 2, _pdf_string(f"{self.footer} - page {self.pages}")))
+        self.writer.add_page(b"\n".join(self.ops), self.images)
+        self.ops, self.images = [], []
+        self.y = PAGE_H - MARGIN
+
+    def ensure(self, height):
+        if self.y - height < MARGIN:
+            self._flush()
+
+    def text(self, text, size=10, bold=False, color=(0, 0, 0), indent=0, gap=0.35):
+        width = PAGE_W - 2 * MARGIN - indent
+        # Helvetica averages ~0.5em per character; good enough for wrapping
+        per_line = max(10, int(width / (size * 0.5)))
+        for line in _wrap(str(text), per_line):
+            self.ensure(size * (1 + gap))
+            self.y -= size * (1 + gap)
+            self.ops.append(b"BT /%s %d Tf %.3f %.3f %.3f rg %d %.1f Td %s Tj ET" % (
+                b"F2" if bold else b"F1", size, *color, MARGIN + indent, self.y, _pdf_string(line)))
+
+    def space(self, height):
+        self.y -= height
+
+    def rule(self):
+        self.ensure(8)
+        self.y -= 6
+        self.ops.append(b"0.8 G 0.5 w %d %.1f m %d %.1f l S" % (MARGIN, self.y, PAGE_W - MARGIN, self.y))
+
+    def thumbnails(self, paths):
+        per_row = int((PAGE_W - 2 * MARGIN) // (THUMB_W + 8))
+        placed = [img for img in (self.writer.add_jpeg(p) for p in paths) if img]
+        for start in range(0, len(placed), per_row):
+            self.ensure(THUMB_H + 8)
+            self.y -= THUMB_H + 8
+            for col, (num, width, height) in enumerate(placed[start:start + per_row]):
+                scale = min(THUMB_W / width, THUMB_H / height)
+                w, h = width * scale, height * scale
+                x = MARGIN + col * (THUMB_W + 8)
+                self.ops.append(b"q %.2f 0 0 %.2f %.2f %.2f cm /Im%d Do Q" % (w, h, x, self.y + (THUMB_H - h), num))
+                self.images.append(num)
+
+    def finish(self):
+        if self.ops or not self.pages:
+            self._flush()
+        return self.pages
+
+
+def _wrap(text, width):
+    lines = []
+    for paragraph in text.splitlines() or [""]:
+        line = ""
+        for word in paragraph.split():
+            if line and len(line) + 1 + len(word) > width:
+                lines.append(line)
+                line = ""
+            while len(word) > width:
+                lines.append(word[:width])
+                word = word[width:]
+            line = f"{line} {word}" if line else word
+        lines.append(line)
+    return lines
+
+
+def render_report(report, images, out):
+    """
+    Write the PDF for a PropertyReport (utils/reports.py) to the binary
+    stream out. images is the report_images frame. Returns the page count.
+    """
+    writer = PdfWriter(out, title=f"Inspection Report - {report.property_name}")
+    page = _Layout(writer, f"{report.property_name} ({report.property_id})")
+    images_by_room = grouped_records(images, "room_id")
+
+    page.text(f"Inspection Report: {report.property_name}", size=18, bold=True)
+    page.text(report.address or "", size=10, color=(0.35, 0.35, 0.35))
+    page.space(6)
+    page.text(f"Risk score {report.property_risk_score:.0f}/100  |  {report.risk_rating}  |  "
+              f"{report.critical_findings} critical / {report.total_findings} findings", size=11, bold=True)
+    if report.inspector is not None:
+        page.text(f"Inspected by {report.inspector.inspector_name}", size=10)
+    page.rule()
+
+    page.text("Executive Summary", size=13, bold=True)
+    page.text(report.executive_summary, size=10)
+    for action in report.recommended_actions.split(". "):
+        if action.strip():
+            page.text(f"- {action.strip()}", size=10, indent=10)
+    if report.recommendation:
+        page.text(report.recommendation, size=10)
+    page.rule()
+
+    page.text("Room Analysis", size=13, bold=True)
+    for room in records(report.rooms):
+        page.space(4)
+        page.text(f"{room['room_name']} - {room['risk_category']} ({room['risk_score']:.0f})", size=11, bold=True)
+        room_findings = report.findings_by_room.get(room["room_id"], [])
+        if not room_findings:
+            page.text("No issues found.", size=9, color=(0.4, 0.4, 0.4), indent=10)
+        for f in room_findings:
+            color = SEVERITY_COLORS.get(str(f["severity"]).lower(), (0, 0, 0))
+            page.text(f"[{f['severity']}] {f['finding_category']}: {f['finding_description']}",
+                      size=9, color=color, indent=10)
+        thumbs = [thumbnail(local_path(img["image_url"])) for img in images_by_room.get(room["room_id"], [])]
+        page.thumbnails([t for t in thumbs if isinstance(t, str) and os.path.isfile(t)])
+
+    for doc in records(report.documents):
+        page.rule()
+        page.text(f"Document: {doc['filename']}", size=12, bold=True)
+        page.text(doc["ai_summary"] or "", size=10)
+        page.text(doc["ai_suggestions"] or "", size=10)
+
+    page.finish()
+    return writer.close()
+
+
+def render_property_pdf(property_id, path):
+    """Render one property's report to path (written atomically). Returns the page count, or 0 if no data."""
+    report = load_report(property_id)
+    if report is None:
+        return 0
+    images = db.run_named_query("report_images", (property_id,))
+    # A unique temp file, so concurrent renders of the same path never share one
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            pages = render_report(report, images, out)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return pages
+
+
+def report_pdf_path(property_id):
+    """
+    Path of an up-to-date PDF for the property, rendering it if needed.
+    Files are named by report version, so a stale PDF is never served.
+    """
+    report = load_report(property_id)
+    if report is None:
+        return None
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    name = f"{property_id}-v{report.version}.pdf"
+    path = os.path.join(REPORT_DIR, name)
+    if not os.path.exists(path):
+        render_property_pdf(property_id, path)
+        # Earlier versions are never served again
+        for old in os.listdir(REPORT_DIR):
+            if old != name and re.fullmatch(re.escape(property_id) + r"-v\d+\.pdf", old):
+                try:
+                    os.remove(os.path.join(REPORT_DIR, old))
+                except FileNotFoundError:
+                    pass
+    return path
+
+
+def report_pdf_bytes(property_id):
+    """Contents of report_pdf_path(), or b"" if there is no report (for a deferred download button)."""
+    path = report_pdf_path(property_id)
+    if path is None:
+        return b""
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _init_worker(db_file):
+    db.DB_FILE = db_file
+
+
+def _render_one(property_id, out_dir):
+    path = os.path.join(out_dir, f"{property_id}.pdf")
+    start = time.perf_counter()
+    pages = render_property_pdf(property_id, path)
+    return property_id, pages, time.perf_counter() - start
+
+
+def _render_chunk(property_ids, out_dir):
+    return [_render_one(pid, out_dir) for pid in property_ids]
+
+
+def render_batch(property_ids, out_dir, workers=None, pool_min=None):
+    """
+    Render many properties in parallel worker processes (spawned, so each
+    opens its own SQLite connections). Batches of fewer than pool_min
+    (default PDF_POOL_MIN_REPORTS) reports render in this process.
+    Yields (property_id, pages, seconds).
+    """
+    property_ids = list(property_ids)
+    os.makedirs(out_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    pool_min = PDF_POOL_MIN_REPORTS if pool_min is None else pool_min
+    if workers == 1 or len(property_ids) < pool_min:
+        for pid in property_ids:
+            yield _render_one(pid, out_dir)
+        return
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_init_worker, initargs=(db.DB_FILE,)) as pool:
+        # a few chunks per worker keeps the processes busy without a round trip per report
+        size = max(1, len(property_ids) // (workers * 4))
+        chunks = [property_ids[i:i + size] for i in range(0, len(property_ids), size)]
+        futures = [pool.submit(_render_chunk, chunk, out_dir) for chunk in chunks]
+        for future in as_completed(futures):
+            yield from future.result()
+
+
+def _seed_bench(db_file, properties, images_per_property):
+    from utils.migrations import run_migrations
+    from utils.query_plans import seed_database
+
+    conn = sqlite3.connect(db_file)
+    run_migrations(conn)
+    seed_database(conn, rows=properties * 10)
+    photo = os.path.join(os.path.dirname(db_file), "photo.jpg")
+    Image.effect_noise((2000, 1500), 40).convert("RGB").save(photo, "JPEG", quality=85)
+    if images_per_property:
+        conn.execute("BEGIN")
+        conn.execute(f"""
+            INSERT INTO INSPECTION_IMAGES (image_id, property_id, room_id, image_url, original_filename)
+            SELECT r.room_id || '-' || n.value, r.property_id, r.room_id, ?, 'photo.jpg'
+            FROM ROOMS r, json_each('[{",".join(str(i) for i in range(images_per_property))}]') n
+        """, (photo,))
+        conn.commit()
+    ids = [row[0] for row in conn.execute("SELECT property_id FROM PROPERTIES ORDER BY property_id LIMIT ?", (properties,))]
+    conn.close()
+    return ids
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render inspection report PDFs.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    one = sub.add_parser("render")
+    one.add_argument("property_id")
+    one.add_argument("-o", "--output", required=True)
+    batch = sub.add_parser("batch")
+    batch.add_argument("property_ids", nargs="*", help="default: every property")
+    batch.add_argument("-o", "--output-dir", required=True)
+    batch.add_argument("--workers", type=int, default=None)
+    bench = sub.add_parser("bench")
+    bench.add_argument("--properties", type=int, default=200)
+    bench.add_argument("--images", type=int, default=2, help="photos per room")
+    bench.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+
+    if args.command == "render":
+        pages = render_property_pdf(args.property_id, args.output)
+        print(f"{args.output}: {pages} page(s)" if pages else f"No report data for {args.property_id}")
+        return 0 if pages else 1
+
+    if args.command == "batch":
+        ids = args.property_ids or db.run_query("SELECT property_id FROM PROPERTIES", use_cache=False)["property_id"].tolist()
+        start = time.perf_counter()
+        total = sum(pages for _, pages, _ in render_batch(ids, args.output_dir, args.workers))
+        elapsed = time.perf_counter() - start
+        print(f"{len(ids)} reports, {total} pages in {elapsed:.1f}s ({total / elapsed:.1f} pages/sec)")
+        return 0
+
+    work = tempfile.mkdtemp()
+    db_file = os.path.join(work, "pdf_bench.sqlite")
+    ids = _seed_bench(db_file, args.properties, args.images)
+    _init_worker(db_file)
+    for workers in sorted({1, args.workers}):
+        out_dir = os.path.join(work, f"out-{workers}")
+        start = time.perf_counter()
+        # Always measure the pool, whatever the batch size
+        results = list(render_batch(ids, out_dir, workers, pool_min=0))
+        elapsed = time.perf_counter() - start
+        pages = sum(p for _, p, _ in results)
+        size = sum(os.path.getsize(os.path.join(out_dir, f)) for f in os.listdir(out_dir))
+        print(f"workers={workers:<3} {len(results)} reports, {pages} pages, {size / 1e6:.1f} MB "
+              f"in {elapsed:.1f}s -> {pages / elapsed:.1f} pages/sec")
+    print(f"Output kept in {work}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
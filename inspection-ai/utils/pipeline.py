@@ -0,0 +1,128 @@
+import os
+from typing import NamedTuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from utils.s3 import store_file
+from utils import ai
+from utils.blobstore import local_path
+from utils.images import prepare_derivatives
+
+# Concurrent upload + AI analysis for the Inspection Wizard.
+#
+# Work runs on a bounded thread pool (uploads and Gemini calls are I/O
+# bound; with Gemini enabled, images go out several per request), while
+# results are yielded back to the calling Streamlit thread as each image
+# finishes, so the page can update progress and persist rows without
+# touching st.* from worker threads. Gemini requests are rate limited (and
+# cut off during outages) inside utils/ai.py, see utils/ratelimit.py.
+
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "4"))
+
+
+class StoredUpload(NamedTuple):
+    """An upload already in the blob store, e.g. handed to a job worker (utils/jobs.py)."""
+    name: str
+    url: str
+
+
+def store_uploads(files, max_workers=None):
+    """
+    Store uploads (and their derivatives) concurrently. Returns (stored, failed):
+    StoredUpload per stored file, in order, and (name, error) per failure for
+    the caller to report (worker threads never touch st.*).
+    """
+    files = list(files)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers or ANALYSIS_WORKERS, len(files) or 1))) as pool:
+        outcomes = list(pool.map(_try_upload, files))
+    stored = [StoredUpload(f.name, url) for f, (url, error) in zip(files, outcomes) if error is None]
+    failed = [(f.name, error) for f, (url, error) in zip(files, outcomes) if error is not None]
+    return stored, failed
+
+
+def _try_upload(file_obj):
+    try:
+        return _upload(file_obj), None
+    except Exception as e:
+        print(f"Upload failed for {getattr(file_obj, 'name', file_obj)}: {e}")
+        return None, e
+
+
+def _upload(file_obj):
+    """Store the upload and make its analysis/thumbnail derivatives. Raises on failure."""
+    if isinstance(file_obj, StoredUpload):
+        return file_obj.url
+    url = store_file(file_obj)
+    prepare_derivatives(local_path(url))
+    return url
+
+
+def _process(file_obj, simulation_override, use_cache):
+    url = _upload(file_obj)
+    analysis = ai.analyze_image_mock(url, simulation_override=simulation_override, use_cache=use_cache,
+                                     filename=getattr(file_obj, "name", None))
+    return url, analysis
+
+
+def _analyze_batch(urls, use_cache, filenames=None):
+    return ai.analyze_images_batch(urls, use_cache=use_cache, filenames=filenames)
+
+
+def _uses_gemini(simulation_override):
+    return bool(ai.GEMINI_API_KEY) and (not simulation_override or simulation_override == "auto")
+
+
+def iter_image_analyses(files, simulation_override=None, max_workers=None, batch_size=None, use_cache=True):
+    """
+    Upload and analyze files concurrently (StoredUpload items skip the
+    upload). Yields
+    (file_obj, url, analysis, error) in completion order; error is None on
+    success, otherwise url/analysis are None.
+
+    With Gemini enabled, images are sent batch_size at a time in a single
+    request (ai.analyze_images_batch) and batches run concurrently.
+    """
+    workers = max(1, min(max_workers or ANALYSIS_WORKERS, len(files) or 1))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analysis") as pool:
+        if _uses_gemini(simulation_override):
+            yield from _iter_batched(pool, files, batch_size or ai.BATCH_SIZE, use_cache)
+            return
+
+        futures = {pool.submit(_process, f, simulation_override, use_cache): f for f in files}
+        for future in as_completed(futures):
+            file_obj = futures[future]
+            try:
+                url, analysis = future.result()
+            except Exception as e:
+                print(f"Analysis failed for {getattr(file_obj, 'name', file_obj)}: {e}")
+                yield file_obj, None, None, e
+                continue
+            yield file_obj, url, analysis, None
+
+
+def _iter_batched(pool, files, batch_size, use_cache):
+    uploaded = []
+    upload_futures = {pool.submit(_upload, f): f for f in files}
+    for future in as_completed(upload_futures):
+        file_obj = upload_futures[future]
+        try:
+            uploaded.append((file_obj, future.result()))
+        except Exception as e:
+            print(f"Upload failed for {getattr(file_obj, 'name', file_obj)}: {e}")
+            yield file_obj, None, None, e
+
+    batches = [uploaded[i:i + batch_size] for i in range(0, len(uploaded), batch_size)]
+    batch_futures = {
+        pool.submit(_analyze_batch, [url for _, url in batch], use_cache,
+                    [getattr(f, "name", None) for f, _ in batch]): batch
+        for batch in batches
+    }
+    for future in as_completed(batch_futures):
+        batch = batch_futures[future]
+        try:
+            analyses = future.result()
+        except Exception as e:
+            print(f"Batch analysis failed: {e}")
+            for file_obj, _ in batch:
+                yield file_obj, None, None, e
+            continue
+        for (file_obj, url), analysis in zip(batch, analyses):
+            yield file_obj, url, analysis, None
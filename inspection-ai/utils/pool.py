@@ -0,0 +1,162 @@
+import sqlite3
+import threading
+import time
+import queue
+import atexit
+
+# Tuned for a local, read-heavy Streamlit workload.
+# Negative cache_size is in KiB (so -20000 ~= 20MB per connection).
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "cache_size": -20000,
+    "mmap_size": 268435456,
+    "temp_store": "MEMORY",
+}
+
+
+class ConnectionPool:
+    """
+    Bounded pool of SQLite connections shared by all Streamlit sessions.
+    Connections are opened lazily (up to max_size), configured once with
+    DEFAULT_PRAGMAS, and handed back to the pool instead of being leaked.
+    """
+
+    def __init__(self, db_file, max_size=8, timeout=10.0, pragmas=None):
+        self.db_file = db_file
+        self.max_size = max_size
+        self.timeout = timeout
+        self.pragmas = dict(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._closed = False
+        self._stats = {"hits": 0, "misses": 0, "waits": 0, "wait_seconds": 0.0, "timeouts": 0}
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_file,
+            check_same_thread=False,
+            timeout=self.pragmas.get("busy_timeout", 5000) / 1000.0,
+            cached_statements=256,
+        )
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def acquire(self):
+        """Take a connection from the pool, opening one if below max_size."""
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+
+        try:
+            conn = self._idle.get_nowait()
+            with self._lock:
+                self._stats["hits"] += 1
+            return conn
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._opened < self.max_size:
+                self._opened += 1
+                self._stats["misses"] += 1
+                create = True
+            else:
+                self._stats["waits"] += 1
+                create = False
+
+        if create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._opened -= 1
+                raise
+
+        # Pool exhausted: block until another session releases a connection
+        start = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise TimeoutError(f"No SQLite connection available after {self.timeout}s")
+        with self._lock:
+            self._stats["wait_seconds"] += time.perf_counter() - start
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool (rolling back any open transaction)."""
+        if conn.in_transaction:
+            conn.rollback()
+        if self._closed:
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+            return
+        self._idle.put(conn)
+
+    def close(self):
+        """Close all idle connections; connections in use are closed on release."""
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+
+    def stats(self):
+        """Pool hit/miss/wait counters plus current size."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["open"] = self._opened
+        stats["idle"] = self._idle.qsize()
+        stats["max_size"] = self.max_size
+        return stats
+
+
+class PooledConnection:
+    """Context manager that borrows a connection from a pool."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.conn = None
+
+    def __enter__(self):
+        self.conn = self.pool.acquire()
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.pool.release(self.conn)
+        self.conn = None
+        return False
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_file, **kwargs):
+    """Process-wide pool per database file (Streamlit reruns reuse it)."""
+    with _pools_lock:
+        pool = _pools.get(db_file)
+        if pool is None or pool._closed:
+            pool = ConnectionPool(db_file, **kwargs)
+            _pools[db_file] = pool
+        return pool
+
+
+def close_all_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+atexit.register(close_all_pools)
@@ -0,0 +1,386 @@
+# Named, parameterized SQL used by the pages and utils modules.
+#
+# Statements are registered once at import with their Snowflake-isms
+# rewritten for SQLite, so each name always maps to the same SQL text and
+# SQLite compiles it once per pooled connection (sqlite3's statement cache
+# is keyed by text). Pages call them through utils.db:
+#
+#     run_named_query("results_findings", (prop_id,))
+#     execute_named("create_room", (room_id, prop_id, name, room_type))
+
+QUERIES = {}
+# Names whose results must never enter the query cache (e.g. keyed by a password)
+UNCACHED = set()
+
+
+def prepare_sql(sql):
+    """Rewrite Snowflake syntax the pages use into its SQLite equivalent."""
+    # ILIKE is LIKE in SQLite (case insensitive by default for ASCII)
+    sql = sql.replace("ILIKE", "LIKE")
+    sql = sql.replace("ARRAY_CONSTRUCT", "")
+    return sql.strip()
+
+
+def register_query(name, sql, cacheable=True):
+    """Register a named statement. Re-registering a name with different SQL is an error."""
+    sql = prepare_sql(sql)
+    if QUERIES.get(name, sql) != sql:
+        raise ValueError(f"Query '{name}' is already registered with different SQL")
+    QUERIES[name] = sql
+    if not cacheable:
+        UNCACHED.add(name)
+    return sql
+
+
+def get_query(name):
+    try:
+        return QUERIES[name]
+    except KeyError:
+        raise KeyError(f"Unknown query '{name}'") from None
+
+
+# --- Login / Sign up (app.py) ---
+# The cache key would hold the plaintext password
+register_query("login", """
+    SELECT user_id, user_type, full_name FROM USERS WHERE email = ? AND password = ?
+""", cacheable=False)
+register_query("create_user", """
+    INSERT INTO USERS (user_id, email, password, user_type, full_name, phone, verified, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, TRUE, CURRENT_TIMESTAMP)
+""")
+register_query("create_inspector_profile", """
+    INSERT INTO INSPECTOR_PROFILES (inspector_id, user_id, license_number, verified_inspector)
+    VALUES (?, ?, ?, FALSE)
+""")
+
+# --- Properties / service requests (02, 03) ---
+register_query("dashboard_existing_property", """
+    SELECT property_id FROM PROPERTIES
+    WHERE owner_user_id = ?
+    AND (house_number = ? OR address = ?)
+""")
+register_query("dashboard_recent_inspections", """
+    SELECT p.property_id, p.property_name, p.address, p.house_number,
+           prs.risk_rating, prs.property_risk_score
+    FROM PROPERTIES p
+    LEFT JOIN PROPERTY_RISK_SCORES prs ON p.property_id = prs.property_id
+    WHERE p.owner_user_id = ?
+    ORDER BY p.created_at DESC LIMIT 3
+""")
+register_query("create_property", """
+    INSERT INTO PROPERTIES (
+        property_id, house_number, property_name, address,
+        property_type, construction_status, total_rooms,
+        owner_user_id, report_visibility
+    ) VALUES (?, ?, ?, ?, 'residential', 'existing', 1, ?, 'private')
+""")
+register_query("create_service_request", """
+    INSERT INTO INSPECTION_SERVICE_REQUESTS (service_id, property_id, requester_user_id, status)
+    VALUES (?, ?, ?, 'requested')
+""")
+register_query("start_property_details", """
+    SELECT house_number, address FROM PROPERTIES WHERE property_id = ?
+""")
+register_query("start_property_exists", """
+    SELECT 1 FROM PROPERTIES WHERE property_id = ?
+""")
+register_query("service_request_in_progress", """
+    UPDATE INSPECTION_SERVICE_REQUESTS SET status = 'in_progress' WHERE service_id = ?
+""")
+
+# --- Inspection wizard (04) ---
+register_query("create_room", """
+    INSERT INTO ROOMS (room_id, property_id, room_name, room_type)
+    VALUES (?, ?, ?, ?)
+""")
+register_query("insert_image", """
+    INSERT INTO INSPECTION_IMAGES (
+        image_id, upload_session_id, user_id, property_id, room_id,
+        upload_scenario, image_url, original_filename,
+        ai_detected_defects, ai_confidence_score, ai_description, ai_severity
+    ) VALUES (?, ?, ?, ?, ?, 'room_set', ?, ?, ?, ?, ?, ?)
+""")
+register_query("insert_finding", """
+    INSERT INTO INSPECTION_FINDINGS (
+        finding_id, room_id, property_id,
+        finding_category, finding_description, severity,
+        detected_by, confidence_score
+    ) VALUES (?, ?, ?, ?, ?, ?, 'ai', ?)
+""")
+register_query("insert_document", """
+    INSERT INTO INSPECTION_DOCUMENTS (
+        doc_id, property_id, user_id, filename, file_url,
+        extracted_text, ai_summary, ai_suggestions
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+""")
+# Full text of a document in order (utils/documents.py)
+register_query("insert_document_chunk", """
+    INSERT OR REPLACE INTO DOCUMENT_CHUNKS (doc_id, chunk_index, page_start, page_end, content)
+    VALUES (?, ?, ?, ?, ?)
+""")
+register_query("insert_document_page", """
+    INSERT OR REPLACE INTO DOCUMENT_PAGES (doc_id, page_number, char_count, extract_ms)
+    VALUES (?, ?, ?, ?)
+""")
+# A document whose analysis failed for good (utils/jobs.py)
+register_query("delete_document_chunks", """
+    DELETE FROM DOCUMENT_CHUNKS WHERE doc_id = ?
+""")
+register_query("delete_document_pages", """
+    DELETE FROM DOCUMENT_PAGES WHERE doc_id = ?
+""")
+register_query("document_chunks", """
+    SELECT chunk_index, page_start, page_end, content
+    FROM DOCUMENT_CHUNKS WHERE doc_id = ? ORDER BY chunk_index
+""")
+
+# --- Analysis results (05) ---
+# Property header + score; the summary text is what PROPERTY_INSPECTION_SUMMARY derives
+register_query("report_header", """
+    SELECT p.property_id, p.property_name, p.address,
+           prs.property_risk_score, prs.risk_rating, prs.recommendation,
+           prs.total_findings, prs.critical_findings, prs.high_findings,
+           'Executive Summary: Risk level is ' || prs.risk_rating AS executive_summary,
+           'Action Required' AS recommended_actions
+    FROM PROPERTIES p
+    JOIN PROPERTY_RISK_SCORES prs ON p.property_id = prs.property_id
+    WHERE p.property_id = ?
+""")
+register_query("report_version", """
+    SELECT version FROM REPORT_VERSIONS WHERE property_id = ?
+""")
+register_query("results_room_scores", """
+    SELECT * FROM ROOM_RISK_SCORES WHERE property_id = ?
+""")
+register_query("results_findings", """
+    SELECT f.*, r.room_name
+    FROM INSPECTION_FINDINGS f
+    JOIN ROOMS r ON f.room_id = r.room_id
+    WHERE f.property_id = ?
+    ORDER BY f.severity
+""")
+register_query("results_inspector", """
+    SELECT ir.report_id, ir.inspector_id, u.full_name as inspector_name, u.user_id as inspector_user_id
+    FROM INSPECTOR_REPORTS ir
+    JOIN INSPECTOR_PROFILES ip ON ir.inspector_id = ip.inspector_id
+    JOIN USERS u ON ip.user_id = u.user_id
+    WHERE ir.property_id = ?
+    LIMIT 1
+""")
+register_query("results_documents", """
+    SELECT * FROM INSPECTION_DOCUMENTS WHERE property_id = ?
+""")
+register_query("report_images", """
+    SELECT image_id, room_id, image_url, original_filename
+    FROM INSPECTION_IMAGES WHERE property_id = ?
+    ORDER BY room_id, image_id
+""")
+register_query("insert_rating", """
+    INSERT INTO INSPECTION_RATINGS (rating_id, report_id, user_id, inspector_id, rating_score, feedback)
+    VALUES (?, ?, ?, ?, ?, ?)
+""")
+register_query("update_inspector_rating", """
+    UPDATE INSPECTOR_PROFILES
+    SET rating = (SELECT AVG(rating_score) FROM INSPECTION_RATINGS WHERE inspector_id = ?),
+        total_inspections = total_inspections + 1
+    WHERE inspector_id = ?
+""")
+
+# --- Inspector dashboard (06) ---
+register_query("inspector_metrics", """
+    SELECT
+        total_inspections,
+        rating,
+        years_experience
+    FROM INSPECTOR_PROFILES
+    WHERE user_id = ?
+""")
+register_query("inspector_assignments", """
+    SELECT sr.service_id, p.property_id, p.property_name, p.address, sr.status, u.full_name as requester
+    FROM INSPECTION_SERVICE_REQUESTS sr
+    JOIN PROPERTIES p ON sr.property_id = p.property_id
+    JOIN USERS u ON sr.requester_user_id = u.user_id
+    WHERE sr.status = 'requested'
+""")
+register_query("inspector_access_requests", """
+    SELECT ar.request_id, p.property_name, u.full_name as requester_name, ar.request_date, ar.status
+    FROM ACCESS_REQUESTS ar
+    JOIN PROPERTIES p ON ar.property_id = p.property_id
+    JOIN USERS u ON ar.requester_user_id = u.user_id
+    WHERE ar.owner_user_id = ? AND ar.status = 'pending'
+""")
+register_query("update_access_request_status", """
+    UPDATE ACCESS_REQUESTS SET status = ? WHERE request_id = ?
+""")
+
+# --- Inspector workflow (07) ---
+register_query("workflow_ai_findings", """
+    SELECT * FROM AI_CLASSIFIED_DEFECTS WHERE property_id = ?
+""")
+register_query("workflow_document", """
+    SELECT doc_id, extracted_text, filename FROM INSPECTION_DOCUMENTS WHERE property_id = ? LIMIT 1
+""")
+register_query("workflow_ai_score", """
+    SELECT property_risk_score FROM PROPERTY_RISK_SCORES WHERE property_id = ?
+""")
+register_query("workflow_inspector_id", """
+    SELECT inspector_id FROM INSPECTOR_PROFILES WHERE user_id = ?
+""")
+register_query("insert_inspector_report", """
+    INSERT INTO INSPECTOR_REPORTS (
+        report_id, property_id, inspector_id, inspection_date,
+        manual_risk_score, ai_risk_score, score_variance,
+        final_approved_score, inspector_summary, status
+    ) VALUES (?, ?, ?, CURRENT_DATE, ?, ?, ?, ?, ?, 'submitted')
+""")
+
+# --- Search (08) ---
+# Full-text match (see utils/search.py for the MATCH expression), best first
+register_query("search_properties", """
+    SELECT p.property_id, p.property_name, p.address, p.house_number, p.report_visibility, p.owner_user_id
+    FROM PROPERTY_SEARCH
+    JOIN PROPERTIES p ON p.rowid = PROPERTY_SEARCH.rowid
+    WHERE PROPERTY_SEARCH MATCH ?
+    ORDER BY PROPERTY_SEARCH.rank
+    LIMIT ? OFFSET ?
+""")
+register_query("search_properties_count", """
+    SELECT COUNT(*) AS total FROM PROPERTY_SEARCH WHERE PROPERTY_SEARCH MATCH ?
+""")
+# Substring match for very short input (utils/search.py like_pattern), house-number hits first
+register_query("search_properties_like", """
+    SELECT property_id, property_name, address, house_number, report_visibility, owner_user_id
+    FROM PROPERTIES
+    WHERE house_number LIKE ?1 ESCAPE '\\' OR address LIKE ?1 ESCAPE '\\'
+    ORDER BY house_number LIKE ?1 ESCAPE '\\' DESC, property_id
+    LIMIT ?2 OFFSET ?3
+""")
+register_query("search_properties_like_count", """
+    SELECT COUNT(*) AS total FROM PROPERTIES
+    WHERE house_number LIKE ?1 ESCAPE '\\' OR address LIKE ?1 ESCAPE '\\'
+""")
+# Access state of one user (?1) for a JSON array of property ids (?2); see utils/access.py
+register_query("access_resolve", """
+    SELECT p.property_id, p.owner_user_id, p.report_visibility,
+           EXISTS (SELECT 1 FROM ACCESS_REQUESTS ar
+                   WHERE ar.property_id = p.property_id AND ar.requester_user_id = ?1
+                   AND ar.status = 'approved') AS approved,
+           EXISTS (SELECT 1 FROM ACCESS_REQUESTS ar
+                   WHERE ar.property_id = p.property_id AND ar.requester_user_id = ?1
+                   AND ar.status = 'pending') AS pending
+    FROM PROPERTIES p
+    WHERE p.property_id IN (SELECT value FROM json_each(?2))
+""")
+register_query("create_access_request", """
+    INSERT INTO ACCESS_REQUESTS (request_id, property_id, requester_user_id, owner_user_id, status)
+    VALUES (?, ?, ?, ?, 'pending')
+""")
+
+# --- AI analysis cache (utils/analysis_cache.py) ---
+register_query("ai_cache_get", """
+    SELECT result FROM AI_ANALYSIS_CACHE
+    WHERE content_hash = ? AND model = ? AND prompt_version = ?
+    AND last_used_at >= datetime('now', ?)
+""")
+register_query("ai_cache_touch", """
+    UPDATE AI_ANALYSIS_CACHE
+    SET hit_count = hit_count + 1, last_used_at = CURRENT_TIMESTAMP
+    WHERE content_hash = ? AND model = ? AND prompt_version = ?
+""")
+register_query("ai_cache_put", """
+    INSERT OR REPLACE INTO AI_ANALYSIS_CACHE (content_hash, model, prompt_version, result)
+    VALUES (?, ?, ?, ?)
+""")
+register_query("ai_cache_expire", """
+    DELETE FROM AI_ANALYSIS_CACHE WHERE last_used_at < datetime('now', ?)
+""")
+register_query("ai_cache_trim", """
+    DELETE FROM AI_ANALYSIS_CACHE WHERE rowid IN (
+        SELECT rowid FROM AI_ANALYSIS_CACHE ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+    )
+""")
+register_query("ai_cache_count", """
+    SELECT COUNT(*) FROM AI_ANALYSIS_CACHE
+""")
+
+# --- Upload blob store (utils/blobstore.py) ---
+register_query("blob_register", """
+    INSERT INTO BLOBS (digest, url, size_bytes) VALUES (?, ?, ?)
+    ON CONFLICT(digest) DO UPDATE SET created_at = CURRENT_TIMESTAMP WHERE ref_count = 0
+""")
+register_query("blob_unreferenced", """
+    SELECT digest, url FROM BLOBS WHERE ref_count = 0 AND created_at < datetime('now', ?)
+""")
+register_query("blob_delete", """
+    DELETE FROM BLOBS WHERE digest = ? AND ref_count = 0
+""")
+register_query("blob_stats", """
+    SELECT COUNT(*) AS blobs, SUM(size_bytes) AS total_bytes,
+           SUM(ref_count) AS "references", SUM(ref_count = 0) AS unreferenced
+    FROM BLOBS
+""")
+
+# --- Job queue (utils/jobs.py); times are epoch seconds passed in ---
+register_query("job_enqueue", """
+    INSERT INTO JOBS (job_id, kind, idempotency_key, group_id, payload, max_attempts, run_after, created_at, updated_at)
+    VALUES (?1, ?2, ?3, ?4, ?5, ?6, ?7, ?7, ?7)
+    ON CONFLICT(idempotency_key) DO NOTHING
+""")
+register_query("job_by_key", """
+    SELECT job_id FROM JOBS WHERE idempotency_key = ?
+""")
+# Takes the next visible job (queued, or running with an expired lease) in one statement
+register_query("job_claim", """
+    UPDATE JOBS SET status = 'running', attempts = attempts + 1, locked_by = ?1,
+                    run_after = ?2 + ?3, updated_at = ?2
+    WHERE job_id = (
+        SELECT job_id FROM JOBS
+        WHERE status IN ('queued', 'running') AND run_after <= ?2
+        ORDER BY run_after LIMIT 1
+    )
+    RETURNING job_id, kind, payload, attempts, max_attempts
+""")
+register_query("job_claim_id", """
+    UPDATE JOBS SET status = 'running', attempts = attempts + 1, locked_by = ?1,
+                    run_after = ?2 + ?3, updated_at = ?2
+    WHERE job_id = ?4 AND status IN ('queued', 'running') AND run_after <= ?2
+    RETURNING job_id, kind, payload, attempts, max_attempts
+""")
+register_query("job_heartbeat", """
+    UPDATE JOBS SET progress_done = ?, progress_total = ?, run_after = ?, updated_at = ?
+    WHERE job_id = ? AND locked_by = ?
+""")
+register_query("job_complete", """
+    UPDATE JOBS SET status = 'done', result = ?, locked_by = NULL, updated_at = ?
+    WHERE job_id = ? AND locked_by = ?
+""")
+register_query("job_retry", """
+    UPDATE JOBS SET status = 'queued', run_after = ?, last_error = ?, locked_by = NULL, updated_at = ?
+    WHERE job_id = ? AND locked_by = ?
+""")
+register_query("job_fail", """
+    UPDATE JOBS SET status = 'failed', last_error = ?, locked_by = NULL, updated_at = ?
+    WHERE job_id = ? AND locked_by = ?
+""")
+register_query("job_status", """
+    SELECT job_id, kind, status, attempts, progress_done, progress_total, result, last_error
+    FROM JOBS WHERE group_id = ? ORDER BY created_at
+""")
+register_query("job_counts", """
+    SELECT status, COUNT(*) AS jobs FROM JOBS GROUP BY status
+""")
+register_query("job_purge", """
+    DELETE FROM JOBS WHERE status IN ('done', 'failed') AND updated_at < ?
+""")
+register_query("job_room_saved", """
+    SELECT 1 FROM ROOMS WHERE room_id = ?
+""")
+register_query("job_document_saved", """
+    SELECT 1 FROM INSPECTION_DOCUMENTS WHERE doc_id = ?
+""")
+
+# --- Defect classification rules (utils/rules.py) ---
+register_query("defect_rules", """
+    SELECT rule_id, defect_keyword, defect_category, severity_level, risk_weight, description
+    FROM DEFECT_CLASSIFICATION_RULES ORDER BY rule_id
+""")
@@ -0,0 +1,167 @@
+import os
+import re
+import time
+import threading
+from collections import OrderedDict, defaultdict
+import streamlit as st
+
+# In-process cache for utils.db reads.
+#
+# Streamlit reruns the whole page on every widget interaction; with this
+# cache the repeated reads are answered from memory. Entries are keyed by
+# (SQL, params) and tagged with every table the query reads - views are
+# expanded to their base tables. A write through utils.db (execute,
+# executemany, BatchWriter) drops only the entries that read a table the
+# statement writes, including tables written by triggers (risk scores,
+# search index, report versions, ...). Both maps are read from
+# sqlite_master, so new migrations are picked up automatically.
+#
+# Writes made outside utils.db (another process) are seen after
+# QUERY_CACHE_TTL seconds. The cache is held in st.cache_resource, so it is
+# shared by all sessions and emptied by Streamlit's "Clear cache".
+#
+#     QUERY_CACHE=off                # disable
+#     QUERY_CACHE_MAX_MB=64          # memory cap, least recently used evicted first
+#     QUERY_CACHE_TTL=300
+
+QUERY_CACHE_ENABLED = os.getenv("QUERY_CACHE", "on").lower() not in ("off", "0", "false")
+QUERY_CACHE_MAX_MB = float(os.getenv("QUERY_CACHE_MAX_MB", "64"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "300"))
+
+_READ_RE = re.compile(r"\b(?:FROM|JOIN)\s+([A-Za-z_]\w*)", re.IGNORECASE)
+_WRITE_RE = re.compile(
+    r"\b(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+([A-Za-z_]\w*)",
+    re.IGNORECASE,
+)
+_NOT_TABLES = {"SET", "SELECT", "VALUES"}
+
+
+def _names(regex, sql):
+    return {name.upper() for name in regex.findall(sql)} - _NOT_TABLES
+
+
+class TableDependencies:
+    """Which base tables a read depends on, and which tables a write touches."""
+
+    def __init__(self, conn):
+        self.views = {}
+        self.triggers = defaultdict(set)
+        for kind, name, table, sql in conn.execute("SELECT type, name, tbl_name, sql FROM sqlite_master"):
+            if not sql:
+                continue
+            if kind == "view":
+                self.views[name.upper()] = _names(_READ_RE, sql)
+            elif kind == "trigger":
+                body = sql.split("BEGIN", 1)[-1]
+                self.triggers[table.upper()] |= _names(_WRITE_RE, body)
+
+    def reads(self, sql):
+        tables, stack = set(), list(_names(_READ_RE, sql))
+        while stack:
+            name = stack.pop()
+            if name not in tables:
+                tables.add(name)
+                stack.extend(self.views.get(name, ()))
+        return tables
+
+    def writes(self, sql):
+        """Tables changed by sql, or None if it can't tell (treat as everything)."""
+        tables, stack = set(), list(_names(_WRITE_RE, sql))
+        if not stack:
+            return None
+        while stack:
+            name = stack.pop()
+            if name not in tables:
+                tables.add(name)
+                stack.extend(self.triggers.get(name, ()))
+        return tables
+
+
+class QueryCache:
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (df, tables, nbytes, stored_at)
+        self._by_table = defaultdict(set)
+        self._generation = defaultdict(int)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "expired": 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[3] > self.ttl:
+                self._drop(key)
+                self._stats["expired"] += 1
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[0]
+
+    def generations(self, tables):
+        """Taken before running a query; put() refuses the result if any table was written meanwhile."""
+        with self._lock:
+            return {t: self._generation[t] for t in tables}
+
+    def put(self, key, df, tables, generations):
+        nbytes = int(df.memory_usage(deep=True).sum())
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if any(self._generation[t] != g for t, g in generations.items()):
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (df, tables, nbytes, time.monotonic())
+            for t in tables:
+                self._by_table[t].add(key)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes and self._entries:
+                self._drop(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def invalidate(self, tables):
+        with self._lock:
+            for t in tables:
+                self._generation[t] += 1
+                for key in list(self._by_table.get(t, ())):
+                    self._drop(key)
+                    self._stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            for t in list(self._generation):
+                self._generation[t] += 1
+            self._entries.clear()
+            self._by_table.clear()
+            self._bytes = 0
+
+    def _drop(self, key):
+        df, tables, nbytes, _ = self._entries.pop(key)
+        self._bytes -= nbytes
+        for t in tables:
+            keys = self._by_table.get(t)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[t]
+
+    def stats(self):
+        with self._lock:
+            total = self._stats["hits"] + self._stats["misses"]
+            return dict(
+                self._stats,
+                entries=len(self._entries),
+                bytes=self._bytes,
+                max_bytes=self.max_bytes,
+                hit_rate=round(self._stats["hits"] / total, 3) if total else 0.0,
+            )
+
+
+@st.cache_resource(show_spinner=False)
+def get_query_cache():
+    return QueryCache(int(QUERY_CACHE_MAX_MB * 1024 * 1024), QUERY_CACHE_TTL)
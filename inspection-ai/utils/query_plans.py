@@ -0,0 +1,260 @@
+import sqlite3
+import argparse
+import os
+import random
+import re
+import tempfile
+import time
+from utils.migrations import run_migrations
+from utils.queries import QUERIES
+
+# Query-plan regression check for the SQLite schema.
+#
+# Seeds a scratch database (default ~1M rows spread across the tables the
+# pages read), runs ANALYZE, then EXPLAIN QUERY PLAN on every statement
+# registered in utils/queries.py. Any plan step that walks a whole base
+# table (or a whole index) is reported and the command exits non-zero:
+#
+#     python -m utils.query_plans                 # seed 1M rows in a temp file
+#     python -m utils.query_plans --rows 50000    # quicker local run
+#     python -m utils.query_plans --db seeded.sqlite --keep
+#
+# tests/test_query_plans.py runs the same check on a small seed with pytest.
+
+# Sample parameters for every statement in utils/queries.py. A registered
+# query without an entry here is reported, so new queries get checked too.
+PROP = "PROP0000001"
+USER = "USER000001"
+INSP = "INSP000001"
+PLAN_PARAMS = {
+    "login": ("user1@example.com", "secret"),
+    "create_user": ("USER-new", "new@example.com", "secret", "normal_user", "New User", "555"),
+    "create_inspector_profile": ("INSP-new", USER, "LIC1"),
+    "dashboard_existing_property": (USER, "101", "1 Main St"),
+    "dashboard_recent_inspections": (USER,),
+    "create_property": ("PROP-new", "101", "Home", "1 Main St", USER),
+    "create_service_request": ("SR-new", PROP, USER),
+    "start_property_details": (PROP,),
+    "start_property_exists": (PROP,),
+    "service_request_in_progress": ("SR0000001",),
+    "create_room": ("RM-new", PROP, "Kitchen", "kitchen"),
+    "insert_image": ("IMG-new", "SESS", USER, PROP, "RM0000001", "/x.jpg", "x.jpg", "moisture", 0.9, "Damp", "high"),
+    "insert_finding": ("FND-new", "RM0000001", PROP, "moisture", "Damp", "high", 0.9),
+    "insert_document": ("DOC-new", PROP, USER, "r.pdf", "/r.pdf", "text", "summary", "suggestions"),
+    "insert_document_chunk": ("DOC-new", 0, 1, 1, "text"),
+    "insert_document_page": ("DOC-new", 1, 4, 1.5),
+    "delete_document_chunks": ("DOC0000001",),
+    "delete_document_pages": ("DOC0000001",),
+    "document_chunks": ("DOC0000001",),
+    "report_header": (PROP,),
+    "report_version": (PROP,),
+    "results_room_scores": (PROP,),
+    "results_findings": (PROP,),
+    "results_inspector": (PROP,),
+    "results_documents": (PROP,),
+    "report_images": (PROP,),
+    "insert_rating": ("RAT-new", "REP0000001", USER, INSP, 5, "Great"),
+    "update_inspector_rating": (INSP, INSP),
+    "inspector_metrics": (USER,),
+    "inspector_assignments": (),
+    "inspector_access_requests": (USER,),
+    "update_access_request_status": ("approved", "REQ0000001"),
+    "workflow_ai_findings": (PROP,),
+    "workflow_document": (PROP,),
+    "workflow_ai_score": (PROP,),
+    "workflow_inspector_id": (USER,),
+    "insert_inspector_report": ("REP-new", PROP, INSP, 40, 35.0, 5.0, 40, "Summary"),
+    "search_properties": ('"301"*', 20, 0),
+    "search_properties_count": ('"301"*',),
+    "access_resolve": (USER, f'["{PROP}", "PROP0000002"]'),
+    "create_access_request": ("REQ-new", PROP, USER, USER),
+    "ai_cache_get": ("abc123", "gemini-pro-vision", "v1", "-30 days"),
+    "ai_cache_touch": ("abc123", "gemini-pro-vision", "v1"),
+    "ai_cache_put": ("abc123", "gemini-pro-vision", "v1", "{}"),
+    "ai_cache_expire": ("-30 days",),
+    "ai_cache_trim": (10000,),
+    "ai_cache_count": (),
+    "blob_register": ("ab" * 32, "/uploads/blobs/ab/ab/" + "ab" * 32, 1024),
+    "blob_unreferenced": ("-24 hours",),
+    "blob_delete": ("ab" * 32,),
+    "blob_stats": (),
+    "job_enqueue": ("JOB-new", "analyze_room", "room:abc", PROP, "{}", 5, 1.7e9),
+    "job_by_key": ("room:abc",),
+    "job_claim": ("host:1", 1.7e9, 300),
+    "job_claim_id": ("host:1", 1.7e9, 300, "JOB0000001"),
+    "job_heartbeat": (1, 4, 1.7e9, 1.7e9, "JOB0000001", "host:1"),
+    "job_complete": ("{}", 1.7e9, "JOB0000001", "host:1"),
+    "job_retry": (1.7e9, "error", 1.7e9, "JOB0000001", "host:1"),
+    "job_fail": ("error", 1.7e9, "JOB0000001", "host:1"),
+    "job_status": (PROP,),
+    "job_purge": (1.7e9,),
+    "job_room_saved": ("RM0000001",),
+    "job_document_saved": ("DOC0000001",),
+}
+
+# Queries that cannot avoid a scan, with the reason. Keep this list short.
+KNOWN_SCANS = {
+    "ai_cache_trim": "LRU trim walks the cache in last_used_at order (periodic maintenance)",
+    "ai_cache_count": "stats only; counts the whole cache table",
+    "blob_stats": "stats only; sums over the whole blob table",
+    "job_counts": "stats only; counts jobs per status",
+    "defect_rules": "loads the whole (small) rules table once per process",
+    "search_properties_like": "substring search, only for input of up to SEARCH_SUBSTRING_MAX characters",
+    "search_properties_like_count": "substring search, only for input of up to SEARCH_SUBSTRING_MAX characters",
+}
+
+_SCAN_RE = re.compile(r"^SCAN (\w+)")
+
+
+def _base_tables(conn):
+    return {row[0].upper() for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def _alias_map(sql):
+    """Map query aliases (e.g. 'f', 'sr') back to table names."""
+    aliases = {}
+    for table, alias in re.findall(r"(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", sql, re.IGNORECASE):
+        aliases[table.upper()] = table.upper()
+        if alias and alias.upper() not in ("WHERE", "JOIN", "LEFT", "ON", "ORDER", "GROUP", "LIMIT", "INNER"):
+            aliases[alias.upper()] = table.upper()
+    return aliases
+
+
+def full_scans(conn, sql, params=()):
+    """Return the EXPLAIN QUERY PLAN steps of sql that scan a whole base table."""
+    tables = _base_tables(conn)
+    aliases = _alias_map(sql)
+    scans = []
+    for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params):
+        detail = row[-1]
+        match = _SCAN_RE.match(detail)
+        # FTS5 lookups show up as "SCAN <table> VIRTUAL TABLE INDEX ..."
+        if not match or "VIRTUAL TABLE" in detail:
+            continue
+        name = match.group(1).upper()
+        if aliases.get(name, name) in tables:
+            scans.append(detail)
+    return scans
+
+
+def check_query_plans(conn):
+    """Returns {query_name: [problems]} for every registered query that regressed."""
+    failures = {}
+    for name, sql in QUERIES.items():
+        if name in KNOWN_SCANS:
+            continue
+        if name not in PLAN_PARAMS:
+            failures[name] = ["no sample parameters in PLAN_PARAMS"]
+            continue
+        scans = full_scans(conn, sql, PLAN_PARAMS[name])
+        if scans:
+            failures[name] = scans
+    return failures
+
+
+def seed_database(conn, rows=1_000_000, seed=7):
+    """Fill the schema with ~rows synthetic rows, proportioned like production data."""
+    rnd = random.Random(seed)
+    n_users = max(10, rows // 50)
+    n_inspectors = max(2, n_users // 10)
+    n_props = max(10, rows // 10)
+    n_rooms = max(10, rows * 3 // 10)
+    n_findings = max(10, rows * 4 // 10)
+    n_access = max(10, rows // 20)
+    n_service = max(10, rows // 40)
+    n_reports = max(10, rows // 50)
+    n_docs = max(10, rows // 50)
+    severities = ["critical", "high", "medium", "low"]
+
+    c = conn.cursor()
+    c.execute("BEGIN")
+    c.executemany(
+        "INSERT INTO USERS (user_id, email, password, user_type, full_name) VALUES (?, ?, ?, ?, ?)",
+        ((f"USER{i:06d}", f"user{i}@example.com", "secret", "normal_user", f"User {i}") for i in range(n_users)),
+    )
+    c.executemany(
+        "INSERT INTO INSPECTOR_PROFILES (inspector_id, user_id, rating, total_inspections) VALUES (?, ?, ?, ?)",
+        ((f"INSP{i:06d}", f"USER{i:06d}", 4.0, 0) for i in range(n_inspectors)),
+    )
+    c.executemany(
+        """INSERT INTO PROPERTIES (property_id, house_number, property_name, address, owner_user_id, report_visibility)
+           VALUES (?, ?, ?, ?, ?, ?)""",
+        ((f"PROP{i:07d}", str(i), f"Property {i}", f"{i} Main St", f"USER{rnd.randrange(n_users):06d}",
+          rnd.choice(["private", "public"])) for i in range(n_props)),
+    )
+    c.executemany(
+        "INSERT INTO ROOMS (room_id, property_id, room_name, room_type) VALUES (?, ?, ?, ?)",
+        ((f"RM{i:07d}", f"PROP{rnd.randrange(n_props):07d}", f"Room {i}", "bedroom") for i in range(n_rooms)),
+    )
+    c.executemany(
+        """INSERT INTO INSPECTION_FINDINGS (finding_id, room_id, property_id, finding_category, severity, confidence_score)
+           SELECT ?, room_id, property_id, 'structural', ?, 0.9 FROM ROOMS WHERE room_id = ?""",
+        ((f"FND{i:07d}", rnd.choice(severities), f"RM{rnd.randrange(n_rooms):07d}") for i in range(n_findings)),
+    )
+    c.executemany(
+        """INSERT INTO ACCESS_REQUESTS (request_id, property_id, requester_user_id, owner_user_id, status)
+           VALUES (?, ?, ?, ?, ?)""",
+        ((f"REQ{i:07d}", f"PROP{rnd.randrange(n_props):07d}", f"USER{rnd.randrange(n_users):06d}",
+          f"USER{rnd.randrange(n_users):06d}", rnd.choice(["pending", "approved", "rejected"])) for i in range(n_access)),
+    )
+    c.executemany(
+        "INSERT INTO INSPECTION_SERVICE_REQUESTS (service_id, property_id, requester_user_id, status) VALUES (?, ?, ?, ?)",
+        ((f"SR{i:07d}", f"PROP{rnd.randrange(n_props):07d}", f"USER{rnd.randrange(n_users):06d}",
+          rnd.choice(["requested", "in_progress", "completed", "completed"])) for i in range(n_service)),
+    )
+    c.executemany(
+        "INSERT INTO INSPECTOR_REPORTS (report_id, property_id, inspector_id, status) VALUES (?, ?, ?, 'submitted')",
+        ((f"REP{i:07d}", f"PROP{rnd.randrange(n_props):07d}", f"INSP{rnd.randrange(n_inspectors):06d}") for i in range(n_reports)),
+    )
+    c.executemany(
+        "INSERT INTO INSPECTION_DOCUMENTS (doc_id, property_id, user_id, filename) VALUES (?, ?, ?, ?)",
+        ((f"DOC{i:07d}", f"PROP{rnd.randrange(n_props):07d}", f"USER{rnd.randrange(n_users):06d}", "report.pdf") for i in range(n_docs)),
+    )
+    c.executemany(
+        "INSERT INTO INSPECTION_RATINGS (rating_id, report_id, user_id, inspector_id, rating_score) VALUES (?, ?, ?, ?, ?)",
+        ((f"RAT{i:07d}", f"REP{i:07d}", f"USER{rnd.randrange(n_users):06d}", f"INSP{rnd.randrange(n_inspectors):06d}",
+          rnd.randint(1, 5)) for i in range(n_reports)),
+    )
+    conn.commit()
+    conn.execute("ANALYZE")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fail if any page query plans a full table scan.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Approximate number of rows to seed")
+    parser.add_argument("--db", help="Scratch database path (default: a temp file)")
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded database")
+    args = parser.parse_args(argv)
+
+    db_file = args.db or os.path.join(tempfile.mkdtemp(), "query_plans.sqlite")
+    if os.path.exists(db_file):
+        parser.error(f"{db_file} already exists; pass a new path")
+
+    conn = sqlite3.connect(db_file)
+    try:
+        run_migrations(conn)
+        start = time.perf_counter()
+        seed_database(conn, args.rows)
+        print(f"Seeded ~{args.rows:,} rows in {time.perf_counter() - start:.1f}s ({db_file})")
+
+        failures = check_query_plans(conn)
+        for name, reason in KNOWN_SCANS.items():
+            print(f"SKIP {name}: {reason}")
+        for name in QUERIES:
+            if name in KNOWN_SCANS:
+                continue
+            if name in failures:
+                print(f"FAIL {name}:")
+                for step in failures[name]:
+                    print(f"    {step}")
+            else:
+                print(f"ok   {name}")
+        return 1 if failures else 0
+    finally:
+        conn.close()
+        if not args.keep and not args.db:
+            os.remove(db_file)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,393 @@
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import threading
+from contextlib import contextmanager, asynccontextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Rate limiting and circuit breaking for Gemini calls (used by utils/ai.py).
+#
+# Every Gemini request goes through the shared `gemini` guard. First, the
+# circuit breaker decides whether to try Gemini at all. After
+# GEMINI_BREAKER_FAILURES consecutive failures it opens, and calls fail
+# straight away with CircuitOpenError, which ai.py handles like any other
+# Gemini error: it falls back to the mock. After GEMINI_BREAKER_RESET
+# seconds, a single probe call is let through. Its result closes the
+# breaker again or keeps it open. Second, two token buckets hold the request
+# to GEMINI_RPM requests and GEMINI_TPM tokens per minute, with up to
+# GEMINI_BURST_SECONDS of burst (the default of 1 spaces requests evenly).
+# Limits are per process; with N job workers (utils/jobs.py), divide the
+# quota by N+1.
+#
+# Test against a local fake Gemini (GEMINI_API_ENDPOINT points ai.py at it):
+#
+#     python -m utils.ratelimit serve --port 8765 --outage 10:30 --rpm 30
+#     GEMINI_API_KEY=fake GEMINI_API_ENDPOINT=http://127.0.0.1:8765 streamlit run app.py
+#     python -m utils.ratelimit bench --calls 60  # in-process fake with an outage; breaker state and counters
+
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", "60"))
+GEMINI_TPM = float(os.getenv("GEMINI_TPM", "1000000"))
+GEMINI_BURST_SECONDS = float(os.getenv("GEMINI_BURST_SECONDS", "1"))
+GEMINI_BREAKER_FAILURES = int(os.getenv("GEMINI_BREAKER_FAILURES", "5"))
+GEMINI_BREAKER_RESET = float(os.getenv("GEMINI_BREAKER_RESET", "30"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+log = logging.getLogger(__name__)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling Gemini while the breaker is open."""
+
+
+class TokenBucket:
+    """Refills per_minute units per minute, holding at most `capacity`."""
+
+    def __init__(self, per_minute, capacity):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, capacity)
+        self._level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount):
+        """
+        Take amount units and return the seconds to wait before using them.
+        The level may go negative, so callers queue behind earlier reservations.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+            self._updated = now
+            # A single request larger than the bucket would otherwise never fit
+            self._level -= min(amount, self.capacity)
+            return -self._level / self.rate if self._level < 0 else 0.0
+
+    def debit(self, amount):
+        """Charge units used beyond the reservation (e.g. actual vs estimated tokens)."""
+        with self._lock:
+            self._level -= amount
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute buckets; a limit of 0 disables that bucket."""
+
+    def __init__(self, rpm=GEMINI_RPM, tpm=GEMINI_TPM, burst_seconds=GEMINI_BURST_SECONDS):
+        self.requests = TokenBucket(rpm, rpm * burst_seconds / 60) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm, tpm * burst_seconds / 60) if tpm > 0 else None
+        self._lock = threading.Lock()
+        self.granted = 0
+        self.throttled = 0
+        self.waited_s = 0.0
+
+    def reserve(self, tokens=0):
+        delay = 0.0
+        if self.requests:
+            delay = self.requests.reserve(1)
+        if self.tokens and tokens:
+            delay = max(delay, self.tokens.reserve(tokens))
+        with self._lock:
+            self.granted += 1
+            if delay > 0:
+                self.throttled += 1
+                self.waited_s += delay
+        return delay
+
+    def acquire(self, tokens=0):
+        """Block until a request of `tokens` (estimated) tokens may start."""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, tokens=0):
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def settle(self, estimated, actual):
+        """Charge the difference when a response reports more tokens than were reserved."""
+        if self.tokens and actual and actual > estimated:
+            self.tokens.debit(actual - estimated)
+
+
+class CircuitBreaker:
+    """Opens after `failures` consecutive failures; lets one probe through every reset_timeout seconds."""
+
+    def __init__(self, failures=GEMINI_BREAKER_FAILURES, reset_timeout=GEMINI_BREAKER_RESET):
+        self.failures = failures
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self.consecutive_failures = 0
+        self.successes = 0
+        self.failed = 0
+        self.short_circuited = 0
+        self.trips = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and time.monotonic() >= self._opened_at + self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def retry_in(self):
+        """Seconds until the next probe is allowed (0 unless open)."""
+        with self._lock:
+            if self._state != OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self):
+        """CLOSED for a normal call, HALF_OPEN for the probe (release() it if it ends without an outcome), or None."""
+        with self._lock:
+            if self._state == OPEN and time.monotonic() >= self._opened_at + self.reset_timeout:
+                self._state = HALF_OPEN
+            if self._state == CLOSED:
+                return CLOSED
+            if self._state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return HALF_OPEN
+            self.short_circuited += 1
+            return None
+
+    def release(self):
+        """Free the probe slot without recording an outcome (the probe was cancelled)."""
+        with self._lock:
+            self._probing = False
+
+    def success(self):
+        with self._lock:
+            self.successes += 1
+            self.consecutive_failures = 0
+            self._probing = False
+            if self._state != CLOSED:
+                log.info("Gemini circuit closed")
+            self._state = CLOSED
+
+    def failure(self):
+        with self._lock:
+            self.failed += 1
+            self.consecutive_failures += 1
+            probe_failed = self._state == HALF_OPEN
+            self._probing = False
+            if probe_failed or (self._state == CLOSED and self.consecutive_failures >= self.failures):
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self.trips += 1
+                log.warning("Gemini circuit open after %d consecutive failure(s); next try in %.0fs",
+                            self.consecutive_failures, self.reset_timeout)
+
+
+class Guard:
+    """A RateLimiter and CircuitBreaker applied together around each call."""
+
+    def __init__(self, limiter=None, breaker=None):
+        self.limiter = limiter or RateLimiter()
+        self.breaker = breaker or CircuitBreaker()
+
+    def _check(self):
+        admitted = self.breaker.allow()
+        if admitted is None:
+            raise CircuitOpenError(f"Gemini circuit open, retrying in {self.breaker.retry_in():.0f}s")
+        return admitted
+
+    @contextmanager
+    def call(self, tokens=0):
+        """Wrap one request: raises CircuitOpenError when open, waits for quota, records the outcome."""
+        admitted = self._check()
+        try:
+            self.limiter.acquire(tokens)
+            yield
+        except Exception:
+            self.breaker.failure()
+            raise
+        except BaseException:
+            # Cancelled or interrupted (e.g. a Streamlit rerun): no outcome, but let the next probe through
+            if admitted == HALF_OPEN:
+                self.breaker.release()
+            raise
+        self.breaker.success()
+
+    @asynccontextmanager
+    async def call_async(self, tokens=0):
+        admitted = self._check()
+        try:
+            await self.limiter.acquire_async(tokens)
+            yield
+        except Exception:
+            self.breaker.failure()
+            raise
+        except BaseException:
+            if admitted == HALF_OPEN:
+                self.breaker.release()
+            raise
+        self.breaker.success()
+
+    def settle(self, estimated, actual):
+        self.limiter.settle(estimated, actual)
+
+    def stats(self):
+        """State and counters, e.g. for the wizard sidebar or the bench."""
+        b, l = self.breaker, self.limiter
+        return {
+            "state": b.state,
+            "retry_in_s": round(b.retry_in(), 1),
+            "consecutive_failures": b.consecutive_failures,
+            "successes": b.successes,
+            "failures": b.failed,
+            "short_circuited": b.short_circuited,
+            "trips": b.trips,
+            "granted": l.granted,
+            "throttled": l.throttled,
+            "waited_s": round(l.waited_s, 2),
+        }
+
+
+# Shared by every session in the process: the Gemini quota is per API key.
+gemini = Guard()
+
+
+# --- Fake Gemini for local testing ---
+
+FAKE_RESULT = {
+    "summary": "Damp staining and a hairline crack noted.", "defects": ["damp", "crack"],
+    "ai_summary": "Fake Gemini summary.", "ai_suggestions": "Fake Gemini suggestions.",
+    "defect_type": "moisture", "val_defect_name": "damp", "severity": "medium", "confidence": 0.8,
+    "description": "Fake Gemini result.", "action": "Inspect further.",
+    "similarity_score": 50, "matches": [], "discrepancies": [],
+}
+
+
+class FakeGemini(ThreadingHTTPServer):
+    """
+    Answers generateContent on the REST API (POST /v1beta/models/<model>:generateContent).
+    Returns 503 inside the outage window (seconds since start) or with probability
+    fail_rate, and 429 above rpm requests in the last minute.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, fail_rate=0.0, outage=None, rpm=0):
+        super().__init__(("127.0.0.1", port), _FakeGeminiHandler)
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.outage = outage
+        self.rpm = rpm
+        self.started = time.monotonic()
+        self.recent = []
+        self.counts = {"ok": 0, "unavailable": 0, "rate_limited": 0}
+        self.lock = threading.Lock()
+
+    @property
+    def endpoint(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def respond(self):
+        now = time.monotonic()
+        with self.lock:
+            self.recent = [t for t in self.recent if t > now - 60] + [now]
+            if self.rpm and len(self.recent) > self.rpm:
+                self.counts["rate_limited"] += 1
+                return 429, "RESOURCE_EXHAUSTED"
+            elapsed = now - self.started
+            if (self.outage and self.outage[0] <= elapsed < self.outage[1]) or random.random() < self.fail_rate:
+                self.counts["unavailable"] += 1
+                return 503, "UNAVAILABLE"
+            self.counts["ok"] += 1
+            return 200, None
+
+
+class _FakeGeminiHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        request = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8", "replace")
+        time.sleep(self.server.latency)
+        code, status = self.server.respond()
+        if status:
+            body = {"error": {"code": code, "message": f"fake {status.lower()}", "status": status}}
+        else:
+            # BATCH_IMAGE_PROMPT asks for one result per image
+            batch = re.search(r"You are given (\d+) images", request)
+            text = json.dumps([dict(FAKE_RESULT, index=i) for i in range(int(batch.group(1)))] if batch else FAKE_RESULT)
+            body = {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP"}],
+                    "usageMetadata": {"promptTokenCount": 100, "candidatesTokenCount": 50, "totalTokenCount": 150}}
+        out = json.dumps(body).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def log_message(self, *args):
+        pass
+
+
+def _outage(spec):
+    start, end = spec.split(":")
+    return float(start), float(end)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fake Gemini server and rate limiter / circuit breaker bench.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("serve", "bench"):
+        p = sub.add_parser(name)
+        p.add_argument("--latency", type=float, default=0.05, help="seconds per fake response")
+        p.add_argument("--fail-rate", type=float, default=0.0)
+        p.add_argument("--outage", type=_outage, help="START:END seconds after start returning 503")
+        p.add_argument("--rpm", type=int, default=0, help="fake server's own limit (429 above it)")
+    sub.choices["serve"].add_argument("--port", type=int, default=8765)
+    bench = sub.choices["bench"]
+    bench.add_argument("--calls", type=int, default=60)
+    bench.add_argument("--interval", type=float, default=0.1, help="seconds between calls")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        server = FakeGemini(args.port, args.latency, args.fail_rate, args.outage, args.rpm)
+        print(f"Fake Gemini on {server.endpoint} (Ctrl-C to stop)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        print(server.counts)
+        return 0
+
+    # Bench: text calls through utils.ai against an in-process fake with an outage
+    duration = args.calls * (args.interval + (60 / GEMINI_RPM if GEMINI_RPM > 0 else 0))
+    outage = args.outage or (duration * 0.25, duration * 0.6)
+    server = FakeGemini(0, args.latency, args.fail_rate, outage, args.rpm)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["GEMINI_API_KEY"] = "fake"
+    os.environ["GEMINI_API_ENDPOINT"] = server.endpoint
+    # The guard ai.py uses (under -m this file also runs as __main__, with its own copy)
+    from utils import ai, mock_backend, ratelimit
+    guard = ratelimit.gemini
+    # Instant mock answers, so the timings show Gemini round trips only
+    mock_backend.set_backend(mock_backend.MockBackend(mock_backend.ZeroLatency()))
+    print(f"Fake Gemini on {server.endpoint}, outage {outage[0]:.1f}s-{outage[1]:.1f}s; "
+          f"breaker opens after {guard.breaker.failures} failures, probes every {guard.breaker.reset_timeout:.1f}s")
+    started = time.monotonic()
+    served = {}
+    for i in range(args.calls):
+        call_started = time.perf_counter()
+        _, usage = ai.summarize_chunk(f"Bench chunk {i}: damp patch under the window.")
+        ms = (time.perf_counter() - call_started) * 1000
+        served[usage["model"]] = served.get(usage["model"], 0) + 1
+        print(f"{time.monotonic() - started:6.2f}s  call {i + 1:>3}  {usage['model']:<11}{ms:8.1f} ms  "
+              f"breaker {guard.breaker.state}")
+        time.sleep(args.interval)
+    server.shutdown()
+    print(f"served by: {served}; fake server: {server.counts}")
+    print(json.dumps(guard.stats()))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,133 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+import pandas as pd
+from utils import db
+from utils.queries import get_query
+from utils.grouping import grouped_records
+
+# Report assembly for the Analysis Results page.
+#
+# load_report() reads everything the page shows for one property - header
+# and scores, rooms, findings, inspector, documents - in a single read
+# transaction (one consistent snapshot, one pooled connection) and returns a
+# PropertyReport. Reports are cached per (property, REPORT_VERSIONS.version);
+# triggers bump the version whenever any of the underlying rows change
+# (migrations 0008 and 0012, the latter for the inspector's name), so a
+# widget-triggered rerun costs one primary-key lookup.
+
+REPORT_CACHE_SIZE = 64
+
+
+@dataclass(frozen=True)
+class InspectorInfo:
+    report_id: str
+    inspector_id: str
+    inspector_name: str
+    inspector_user_id: str
+
+
+@dataclass(frozen=True)
+class PropertyReport:
+    property_id: str
+    property_name: str
+    address: str
+    version: int
+    property_risk_score: float
+    risk_rating: str
+    recommendation: str
+    total_findings: int
+    critical_findings: int
+    high_findings: int
+    executive_summary: str
+    recommended_actions: str
+    rooms: pd.DataFrame
+    findings: pd.DataFrame
+    documents: pd.DataFrame
+    inspector: Optional[InspectorInfo] = None
+    # room_id -> [finding row dict], built once per cached report
+    findings_by_room: dict = field(default_factory=dict)
+
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def _version(conn, property_id):
+    row = conn.execute(get_query("report_version"), (property_id,)).fetchone()
+    return row[0] if row else 0
+
+
+def _read(conn, name, property_id):
+    return pd.read_sql_query(get_query(name), conn, params=(property_id,))
+
+
+def _assemble(conn, property_id):
+    # BEGIN pins one snapshot for every read below (WAL readers don't block writers)
+    conn.execute("BEGIN")
+    try:
+        version = _version(conn, property_id)
+        cursor = conn.execute(get_query("report_header"), (property_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return version, None
+        header = dict(zip([d[0] for d in cursor.description], row))
+
+        inspector = _read(conn, "results_inspector", property_id)
+        findings = _read(conn, "results_findings", property_id)
+        report = PropertyReport(
+            property_id=header["property_id"],
+            property_name=header["property_name"],
+            address=header["address"],
+            version=version,
+            property_risk_score=header["property_risk_score"],
+            risk_rating=header["risk_rating"],
+            recommendation=header["recommendation"],
+            total_findings=header["total_findings"],
+            critical_findings=header["critical_findings"],
+            high_findings=header["high_findings"],
+            executive_summary=header["executive_summary"],
+            recommended_actions=header["recommended_actions"],
+            rooms=_read(conn, "results_room_scores", property_id),
+            findings=findings,
+            documents=_read(conn, "results_documents", property_id),
+            inspector=InspectorInfo(**inspector.iloc[0].to_dict()) if not inspector.empty else None,
+            findings_by_room=grouped_records(findings, "room_id"),
+        )
+        return version, report
+    finally:
+        conn.rollback()
+
+
+def load_report(property_id):
+    """
+    The PropertyReport for property_id, or None if the property has no
+    inspection data. Cached until any of its rows change.
+    """
+    try:
+        with db.get_db_connection() as conn:
+            key = (db.DB_FILE, property_id, _version(conn, property_id))
+            with _lock:
+                if key in _cache:
+                    _cache.move_to_end(key)
+                    _stats["hits"] += 1
+                    return _cache[key]
+                _stats["misses"] += 1
+
+            version, report = _assemble(conn, property_id)
+    except Exception as e:
+        print(f"Report load failed for {property_id}: {e}")
+        return None
+
+    with _lock:
+        _cache[(db.DB_FILE, property_id, version)] = report
+        while len(_cache) > REPORT_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return report
+
+
+def report_cache_stats():
+    with _lock:
+        return dict(_stats, entries=len(_cache))
@@ -0,0 +1,126 @@
+import sqlite3
+import argparse
+import os
+
+# Materialized risk scores for the local SQLite build.
+#
+# ROOM_RISK_SCORES and PROPERTY_RISK_SCORES used to be GROUP BY views that
+# re-aggregated every finding on each page read. They are now tables holding
+# per-severity counters that triggers keep in step with ROOMS, PROPERTIES and
+# INSPECTION_FINDINGS (see migration 0003); scores and ratings are generated
+# columns over those counters. The original view definitions are kept as
+# ROOM_RISK_SCORES_LIVE / PROPERTY_RISK_SCORES_LIVE so check_risk_scores()
+# can verify the tables against them.
+#
+#     python -m utils.risk_scores check     # compare tables with the live views
+#     python -m utils.risk_scores rebuild   # recompute both tables from scratch
+
+ROOM_COLUMNS = [
+    "room_id", "property_id", "room_name", "room_type",
+    "critical_count", "high_count", "medium_count", "low_count",
+    "risk_score", "risk_category",
+]
+
+PROPERTY_COLUMNS = [
+    "property_id", "property_name", "address",
+    "total_findings", "critical_findings", "high_findings",
+    "property_risk_score", "risk_rating", "recommendation",
+]
+
+REBUILD_ROOM_SCORES = """
+    INSERT INTO ROOM_RISK_SCORES (
+        room_id, property_id, room_name, room_type,
+        critical_count, high_count, medium_count, low_count, finding_count
+    )
+    SELECT
+        r.room_id, r.property_id, r.room_name, r.room_type,
+        SUM(f.severity IS 'critical'),
+        SUM(f.severity IS 'high'),
+        SUM(f.severity IS 'medium'),
+        SUM(f.severity IS 'low'),
+        COUNT(f.finding_id)
+    FROM ROOMS r
+    LEFT JOIN INSPECTION_FINDINGS f ON r.room_id = f.room_id
+    GROUP BY r.room_id
+"""
+
+REBUILD_PROPERTY_SCORES = """
+    INSERT INTO PROPERTY_RISK_SCORES (
+        property_id, property_name, address,
+        total_findings, critical_findings, high_findings, medium_findings, low_findings
+    )
+    SELECT
+        p.property_id, p.property_name, p.address,
+        COALESCE(SUM(rr.finding_count), 0),
+        COALESCE(SUM(rr.critical_count), 0),
+        COALESCE(SUM(rr.high_count), 0),
+        COALESCE(SUM(rr.medium_count), 0),
+        COALESCE(SUM(rr.low_count), 0)
+    FROM PROPERTIES p
+    LEFT JOIN ROOM_RISK_SCORES rr ON p.property_id = rr.property_id
+    GROUP BY p.property_id
+"""
+
+
+def rebuild_risk_scores(c):
+    """Recompute both score tables from ROOMS / INSPECTION_FINDINGS."""
+    c.execute("DELETE FROM PROPERTY_RISK_SCORES")
+    c.execute("DELETE FROM ROOM_RISK_SCORES")
+    c.execute(REBUILD_ROOM_SCORES)
+    c.execute(REBUILD_PROPERTY_SCORES)
+
+
+def _diff(conn, table, view, columns, key):
+    cols = ", ".join(columns)
+    missing = conn.execute(
+        f"SELECT {key} FROM (SELECT {cols} FROM {view} EXCEPT SELECT {cols} FROM {table})"
+    ).fetchall()
+    extra = conn.execute(
+        f"SELECT {key} FROM (SELECT {cols} FROM {table} EXCEPT SELECT {cols} FROM {view})"
+    ).fetchall()
+    return sorted({row[0] for row in missing + extra})
+
+
+def check_risk_scores(conn):
+    """
+    Compare the materialized tables with the live view definitions.
+    Returns {"rooms": [room_id, ...], "properties": [property_id, ...]} of
+    rows that differ; both lists are empty when the tables are consistent.
+    """
+    return {
+        "rooms": _diff(conn, "ROOM_RISK_SCORES", "ROOM_RISK_SCORES_LIVE", ROOM_COLUMNS, "room_id"),
+        "properties": _diff(conn, "PROPERTY_RISK_SCORES", "PROPERTY_RISK_SCORES_LIVE", PROPERTY_COLUMNS, "property_id"),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain materialized risk score tables.")
+    parser.add_argument("command", choices=["check", "rebuild"])
+    parser.add_argument("--db", default=os.getenv("INSPECTION_DB_FILE", "local_db.sqlite"))
+    args = parser.parse_args(argv)
+
+    from utils.migrations import run_migrations
+
+    conn = sqlite3.connect(args.db)
+    try:
+        run_migrations(conn)
+        if args.command == "rebuild":
+            c = conn.cursor()
+            c.execute("BEGIN IMMEDIATE")
+            rebuild_risk_scores(c)
+            conn.commit()
+            print("Risk score tables rebuilt.")
+
+        diff = check_risk_scores(conn)
+        if diff["rooms"] or diff["properties"]:
+            print(f"Inconsistent rooms: {diff['rooms']}")
+            print(f"Inconsistent properties: {diff['properties']}")
+            return 1
+        print("Risk score tables match the live views.")
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
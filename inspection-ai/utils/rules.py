@@ -0,0 +1,196 @@
+import os
+import re
+import time
+import random
+import string
+import argparse
+import tempfile
+from functools import lru_cache
+from typing import NamedTuple
+from utils.db import run_named_query
+
+# Deterministic defect classification from DEFECT_CLASSIFICATION_RULES.
+#
+# All rule keywords are compiled into one regular expression, factored as a
+# trie (damp|dust -> d(?:amp|ust)). A scan therefore tries one path per text
+# position, however many rules there are. A single-word keyword matches
+# anywhere, as the mock's substring check always did: "crack" matches
+# "cracks" and "Wallcrack.jpeg". An underscore in a multi-word keyword
+# matches a run of one or more separators, so "exposed_wiring" matches
+# "exposed wiring" but not "exposedwiring". When several rules match, the
+# highest risk_weight wins.
+#
+# The mock backend classifies file names with it, so offline results are
+# repeatable. SUMMARY_PREFILTER=rules (utils/summarize.py) uses it to skip
+# Gemini for chunks that mention no defect. Rules are loaded once per process.
+#
+#     python -m utils.rules "Exposed wiring behind the cooker"
+#     python -m utils.rules bench --texts 200000   # classifications per second
+#     python -m utils.rules bench --extra-rules 500   # the substring loop slows with every rule; the engine doesn't
+
+# Confidence reported for a rule match
+RULE_CONFIDENCE = 0.95
+
+ACTIONS = {
+    "structural": "Engineer check.",
+    "electrical": "Isolate circuit and call electrician.",
+    "moisture": "Find the water source and treat damp.",
+    "plumbing": "Repair the leak.",
+    "finishing": "Make good finishes.",
+}
+
+
+class Rule(NamedTuple):
+    rule_id: int
+    keyword: str
+    category: str
+    severity: str
+    risk_weight: float
+    description: str
+
+
+def _normalize(keyword):
+    """Lowercase with every run of separators as one underscore: the lookup key for a match."""
+    return re.sub(r"[\W_]+", "_", keyword.lower()).strip("_")
+
+
+def _trie_pattern(keywords):
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for ch in keyword:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def emit(node):
+        # At least one separator, so a match normalizes back to its keyword
+        branches = [(r"[\W_]+" if ch == "_" else re.escape(ch)) + emit(child)
+                    for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        if "" in node:
+            # A keyword ends here; the longer ones are tried first (greedy)
+            return "(?:" + "|".join(branches) + ")?"
+        return branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+
+    return emit(trie)
+
+
+class RuleEngine:
+    """Classifies text with a list of Rules compiled into one pattern."""
+
+    def __init__(self, rules):
+        self.rules = {}
+        for rule in sorted(rules, key=lambda r: r.rule_id):
+            self.rules.setdefault(_normalize(rule.keyword), rule)
+        self.pattern = re.compile(_trie_pattern(self.rules)) if self.rules else None
+
+    def matches(self, text):
+        """Rules matched in text, in order of appearance (repeats included)."""
+        if self.pattern is None or not text:
+            return []
+        return [self.rules[_normalize(m.group())] for m in self.pattern.finditer(text.lower())]
+
+    def classify(self, text):
+        """The matching Rule with the highest risk_weight (lowest rule_id on ties), or None."""
+        return max(self.matches(text), key=lambda r: (r.risk_weight, -r.rule_id), default=None)
+
+    def categories(self, text):
+        return {rule.category for rule in self.matches(text)}
+
+
+def load_rules():
+    df = run_named_query("defect_rules")
+    return [Rule(int(r.rule_id), r.defect_keyword, r.defect_category, r.severity_level,
+                 float(r.risk_weight or 0), r.description or "")
+            for r in df.itertuples(index=False)]
+
+
+@lru_cache(maxsize=1)
+def get_engine():
+    """The process-wide engine, built from the rules table on first use."""
+    return RuleEngine(load_rules())
+
+
+def image_result(rule):
+    """An image analysis result (the shape utils/ai.py returns) for a matched rule."""
+    return {
+        "defect_type": rule.category,
+        "val_defect_name": rule.keyword.replace("_", " "),
+        "severity": rule.severity,
+        "confidence": RULE_CONFIDENCE,
+        "description": f"{rule.description}.",
+        "action": ACTIONS.get(rule.category, "Inspect further."),
+    }
+
+
+def _naive_classify(rules, text):
+    """The per-keyword substring loop the engine replaces (bench baseline)."""
+    text = text.lower()
+    hits = [r for r in rules if r.keyword.replace("_", " ") in text or r.keyword in text]
+    return max(hits, key=lambda r: (r.risk_weight, -r.rule_id), default=None)
+
+
+def _sample_texts(count, seed=0):
+    rng = random.Random(seed)
+    words = ["wall", "ceiling", "kitchen", "bathroom", "loft", "near", "the", "window", "behind", "socket",
+             "radiator", "floor", "stair", "IMG", "photo", "corner", "paint", "tile", "door", "frame"]
+    defects = ["damp", "crack", "exposed wiring", "leak", "mould", "water stain", "cable", "split", "wet"]
+    texts = []
+    for i in range(count):
+        picked = rng.sample(words, rng.randint(3, 12))
+        if rng.random() < 0.6:
+            picked.insert(rng.randrange(len(picked) + 1), rng.choice(defects))
+        if i % 3 == 0:
+            texts.append("_".join(picked) + f"_{i}.jpg")
+        else:
+            texts.append(" ".join(picked).capitalize() + ".")
+    return texts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Classify text with DEFECT_CLASSIFICATION_RULES.")
+    parser.add_argument("text", nargs="+", help="text to classify, or 'bench'")
+    parser.add_argument("--texts", type=int, default=200_000, help="bench: number of generated texts")
+    parser.add_argument("--extra-rules", type=int, default=0, help="bench: add random keywords to show scaling")
+    args = parser.parse_args(argv)
+
+    if args.text != ["bench"]:
+        text = " ".join(args.text)
+        engine = get_engine()
+        for rule in engine.matches(text):
+            print(f"match  {rule.keyword:<16}{rule.category:<12}{rule.severity:<10}{rule.risk_weight:.2f}")
+        rule = engine.classify(text)
+        print(image_result(rule) if rule else "no rule matches")
+        return 0
+
+    # Scratch database, seeded by the migrations
+    from utils import db
+    db.DB_FILE = os.path.join(tempfile.mkdtemp(), "rules_bench.sqlite")
+    rules = load_rules()
+    rng = random.Random(1)
+    rules += [Rule(1000 + i, "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 10))),
+                   "finishing", "low", 0.3, "Synthetic bench rule") for i in range(args.extra_rules)]
+    started = time.perf_counter()
+    engine = RuleEngine(rules)
+    compile_ms = (time.perf_counter() - started) * 1000
+    texts = _sample_texts(args.texts)
+    chars = sum(len(t) for t in texts)
+    print(f"{len(rules)} rules compiled in {compile_ms:.2f} ms; {len(texts):,} texts, {chars / len(texts):.0f} chars avg")
+    results = {}
+    for label, classify in (("engine", engine.classify), ("substring loop", lambda t: _naive_classify(rules, t))):
+        started = time.perf_counter()
+        results[label] = [classify(t) for t in texts]
+        seconds = time.perf_counter() - started
+        hits = sum(r is not None for r in results[label])
+        print(f"{label:<16}{len(texts) / seconds:>12,.0f} texts/s{hits:>10,} matched")
+    # The loop only knows "_" and " " as separators; the engine also takes "exposed-wiring"
+    differ = sum(a != b for a, b in zip(*results.values()))
+    print(f"{differ:,} texts classified differently")
+    # Deterministic: the same text always gets the same rule
+    assert all(engine.classify(t) == r for t, r in zip(texts[:1000], results["engine"]))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
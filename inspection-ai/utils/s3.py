@@ -1,25 +1,20 @@
-import os
 import streamlit as st
+from utils.blobstore import get_store
 
-def upload_to_s3(file_obj):
+def store_file(file_obj):
     """
-    Saves uploaded file to local 'uploads' directory.
-    Replaces S3 functionality for local-only operation.
+    Stores an uploaded file in the content-addressed blob store
+    (utils/blobstore.py) and returns its URL - a local path unless
+    BLOB_BACKEND=s3. Identical uploads share one stored blob.
+    Raises on failure; safe to call from worker threads.
     """
-    upload_dir = "uploads"
-    if not os.path.exists(upload_dir):
-        os.makedirs(upload_dir)
-    
-    file_path = os.path.join(upload_dir, file_obj.name)
-    
+    _, url, _ = get_store().put(file_obj)
+    return url
+
+def upload_to_s3(file_obj):
+    """store_file() for the Streamlit script thread: shows the error and returns None on failure."""
     try:
-        with open(file_path, "wb") as f:
-            f.write(file_obj.getbuffer())
-        
-        # Return local path (or relative path for access)
-        # In a real deployed web app, this would need to be served via static file server.
-        # For Streamlit local run, we can reference it directly or via Image.open
-        return os.path.abspath(file_path).replace("\\", "/")
+        return store_file(file_obj)
     except Exception as e:
         st.error(f"Local save failed: {e}")
         return None
@@ -0,0 +1,172 @@
+import os
+import re
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+import pandas as pd
+from utils.db import run_named_query
+from utils.migrations import run_migrations
+from utils.queries import get_query
+
+# Property search backed by the PROPERTY_SEARCH FTS5 index (migration 0007).
+#
+# Every word the user types is matched as a prefix against the property
+# name, address and house number ("30 main" finds "301 Main St"); results
+# are ranked by bm25 with house-number hits weighted double, and returned a
+# page at a time. Prefixes don't match inside a word, so queries of up to
+# SEARCH_SUBSTRING_MAX characters ("01" for "301") keep the old substring
+# match on house number and address, with a LIKE scan of PROPERTIES.
+#
+#     python -m utils.search rebuild                    # re-index (e.g. after VACUUM)
+#     python -m utils.search check                      # FTS5 integrity check against PROPERTIES
+#     python -m utils.search bench --properties 1000000 # LIKE vs FTS5 latency on a scratch DB
+
+SEARCH_PAGE_SIZE = 20
+SEARCH_SUBSTRING_MAX = int(os.getenv("SEARCH_SUBSTRING_MAX", "2"))
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def match_expression(text):
+    """FTS5 MATCH expression for user input: every word as a quoted prefix, or None."""
+    words = _WORD_RE.findall(text or "")
+    if not words:
+        return None
+    return " ".join(f'"{w}"*' for w in words)
+
+
+def like_pattern(text):
+    """LIKE pattern for a substring search of text, or None if text is longer than SEARCH_SUBSTRING_MAX."""
+    text = (text or "").strip()
+    if not text or len(text) > SEARCH_SUBSTRING_MAX:
+        return None
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def search_properties(text, page=1, page_size=SEARCH_PAGE_SIZE):
+    """
+    One page of properties matching text, best match first.
+    Returns (DataFrame, total_matches).
+    """
+    offset = (max(page, 1) - 1) * page_size
+    pattern = like_pattern(text)
+    if pattern is not None:
+        query, params = "search_properties_like", (pattern,)
+    else:
+        expr = match_expression(text)
+        if expr is None:
+            return pd.DataFrame(), 0
+        query, params = "search_properties", (expr,)
+    total = run_named_query(f"{query}_count", params)
+    total = int(total.iloc[0]["total"]) if not total.empty else 0
+    return run_named_query(query, params + (page_size, offset)), total
+
+
+def rebuild_index(conn):
+    conn.execute("INSERT INTO PROPERTY_SEARCH(PROPERTY_SEARCH) VALUES ('rebuild')")
+    conn.commit()
+
+
+def check_index(conn):
+    """Raises sqlite3.DatabaseError if the index disagrees with PROPERTIES."""
+    conn.execute("INSERT INTO PROPERTY_SEARCH(PROPERTY_SEARCH, rank) VALUES ('integrity-check', 1)")
+
+
+STREETS = ["Main", "Oak", "Maple", "Cedar", "Park", "Lake", "Hill", "Church", "Station", "Market",
+           "Gandhi", "Nehru", "MG", "Ring", "Temple", "Garden", "River", "Palm", "College", "Mill"]
+SUFFIXES = ["St", "Rd", "Ave", "Lane", "Nagar", "Colony", "Marg", "Layout"]
+NAMES = ["Residency", "Heights", "Villa", "Apartments", "Towers", "Enclave", "House", "Gardens", "Court"]
+
+
+def seed_properties(conn, n, seed=11):
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(n):
+        street = f"{rnd.choice(STREETS)} {rnd.choice(SUFFIXES)}"
+        rows.append((f"PROP{i:07d}", f"{rnd.randint(1, 999)}{rnd.choice(['', '', 'A', 'B'])}",
+                     f"{rnd.choice(STREETS)} {rnd.choice(NAMES)}", f"{rnd.randint(1, 400)} {street}",
+                     f"USER{rnd.randrange(max(1, n // 50)):06d}"))
+    conn.execute("BEGIN")
+    conn.executemany(
+        "INSERT INTO PROPERTIES (property_id, house_number, property_name, address, owner_user_id) VALUES (?, ?, ?, ?, ?)",
+        rows,
+    )
+    conn.commit()
+
+
+def _time_ms(fn, repeat):
+    """(p50, p95) wall time of fn() in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2], samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+
+def bench(n, terms, repeat=20, db_file=None):
+    path = db_file or os.path.join(tempfile.mkdtemp(), "search_bench.sqlite")
+    conn = sqlite3.connect(path)
+    try:
+        run_migrations(conn)
+        start = time.perf_counter()
+        seed_properties(conn, n)
+        print(f"Seeded {n:,} properties (indexed by triggers) in {time.perf_counter() - start:.1f}s")
+        conn.execute("ANALYZE")
+
+        like = """
+            SELECT property_id, property_name, address, house_number, report_visibility, owner_user_id
+            FROM PROPERTIES WHERE house_number LIKE ? OR address LIKE ?
+        """
+        print(f"{'query':<16}{'matches':>9}{'LIKE p50':>11}{'p95':>9}{'FTS p50':>11}{'p95':>9}")
+        for term in terms:
+            expr = match_expression(term)
+            matches = conn.execute(get_query("search_properties_count"), (expr,)).fetchone()[0]
+            like_p50, like_p95 = _time_ms(
+                lambda: conn.execute(like, (f"%{term}%", f"%{term}%")).fetchall(), max(1, repeat // 4))
+            # What a search page does: count plus the first page
+            fts_p50, fts_p95 = _time_ms(lambda: (
+                conn.execute(get_query("search_properties_count"), (expr,)).fetchone(),
+                conn.execute(get_query("search_properties"), (expr, SEARCH_PAGE_SIZE, 0)).fetchall(),
+            ), repeat)
+            print(f"{term:<16}{matches:>9,}{like_p50:>9.1f}ms{like_p95:>7.1f}ms{fts_p50:>9.1f}ms{fts_p95:>7.1f}ms")
+    finally:
+        conn.close()
+        if not db_file:
+            os.remove(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain or benchmark the property search index.")
+    parser.add_argument("command", choices=["rebuild", "check", "bench"])
+    parser.add_argument("--db", default=os.getenv("INSPECTION_DB_FILE", "local_db.sqlite"))
+    parser.add_argument("--properties", type=int, default=1_000_000, help="bench: properties to seed")
+    parser.add_argument("--terms", nargs="+", default=["301", "main", "oak resid", "gandhi nagar", "12b", "zzz"])
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        bench(args.properties, args.terms)
+        return 0
+
+    conn = sqlite3.connect(args.db)
+    try:
+        run_migrations(conn)
+        if args.command == "rebuild":
+            rebuild_index(conn)
+            print("Property search index rebuilt.")
+        check_index(conn)
+        print("Property search index matches PROPERTIES.")
+        return 0
+    except sqlite3.DatabaseError as e:
+        print(f"Property search index is inconsistent: {e}")
+        return 1
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,298 @@
+import os
+import time
+import asyncio
+import zlib
+import hashlib
+import argparse
+import tempfile
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from utils import ai
+from utils import analysis_cache
+from utils import rules
+
+# Map-reduce summarization of inspector reports.
+#
+# A document is split into chunks of at most SUMMARY_CHUNK_TOKENS, each
+# chunk is summarized concurrently (map), and the part summaries are reduced
+# to the final ai_summary / ai_suggestions. When the part summaries are still
+# too long for one reduce call they are chunked and summarized again.
+#
+# Chunk boundaries are content-defined: a chunk ends after a blank line or a
+# line whose hash hits BOUNDARY_MODULUS. An edit only moves the boundaries
+# around it, and every call is cached by the sha256 of its input in
+# AI_ANALYSIS_CACHE, so a re-upload only pays for the chunks that changed.
+# With SUMMARY_PREFILTER=rules, chunks that match no defect rule
+# (utils/rules.py) are summarized locally instead. summarize_document_async
+# runs the same steps as coroutines (Gemini's native async calls), with at
+# most SUMMARY_WORKERS map calls in flight.
+#
+#     python -m utils.summarize report.txt        # summary plus token/latency report
+#     python -m utils.summarize bench --pages 200 # first run, re-run, one edited page
+
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "1500"))
+SUMMARY_REDUCE_TOKENS = int(os.getenv("SUMMARY_REDUCE_TOKENS", "3000"))
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", "4"))
+BOUNDARY_MODULUS = 16
+SUMMARY_PREFILTER = os.getenv("SUMMARY_PREFILTER", "off").lower()
+NO_DEFECTS = {"summary": "No defects mentioned in this part.", "defects": []}
+
+
+@dataclass
+class SummaryStats:
+    document_tokens: int = 0
+    chunks: int = 0
+    levels: int = 0
+    calls: int = 0
+    cached_calls: int = 0
+    prefiltered: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    map_seconds: float = 0.0
+    reduce_seconds: float = 0.0
+    seconds: float = 0.0
+
+    def add(self, usage):
+        if usage is None:
+            self.cached_calls += 1
+            return
+        self.calls += 1
+        self.input_tokens += usage["input_tokens"]
+        self.output_tokens += usage["output_tokens"]
+
+    def describe(self):
+        return (f"{self.document_tokens:,} tokens in {self.chunks} chunk(s), {self.levels} map level(s); "
+                f"{self.calls} call(s) + {self.cached_calls} cached + {self.prefiltered} prefiltered; "
+                f"{self.input_tokens:,} in / {self.output_tokens:,} out tokens; "
+                f"map {self.map_seconds:.2f}s, reduce {self.reduce_seconds:.2f}s, total {self.seconds:.2f}s")
+
+
+@dataclass
+class DocumentSummary:
+    result: dict
+    stats: SummaryStats = field(default_factory=SummaryStats)
+
+
+def split_chunks(text, max_tokens=SUMMARY_CHUNK_TOKENS):
+    """Split text into chunks of at most max_tokens, cutting at content-defined line boundaries."""
+    min_tokens = max_tokens // 4
+    max_chars = max_tokens * 4
+    chunks, lines, tokens = [], [], 0
+
+    def emit():
+        chunk = "".join(lines)
+        if chunk.strip():
+            chunks.append(chunk)
+
+    for line in text.splitlines(keepends=True):
+        # A line longer than a whole chunk (extracts without line breaks) is cut into pieces
+        for piece in (line[i:i + max_chars] for i in range(0, len(line), max_chars)):
+            size = ai.estimate_tokens(piece)
+            if lines and tokens + size > max_tokens:
+                emit()
+                lines, tokens = [], 0
+            lines.append(piece)
+            tokens += size
+            if tokens >= min_tokens and (not piece.strip() or zlib.crc32(piece.encode("utf-8")) % BOUNDARY_MODULUS == 0):
+                emit()
+                lines, tokens = [], 0
+    emit()
+    return chunks
+
+
+def _cache_key(fn, text):
+    # The async calls share the cache entries of their sync counterparts
+    version = f"{fn.__name__.removesuffix('_async')}-{ai.SUMMARY_PROMPT_VERSION}"
+    return hashlib.sha256(text.encode("utf-8")).hexdigest(), version
+
+
+def _get_cached(digest, version):
+    return analysis_cache.get_cached(digest, ai.TEXT_MODEL if ai.GEMINI_API_KEY else ai.MOCK_MODEL, version)
+
+
+def _cached_call(fn, text):
+    """(result, usage) for fn(text); usage is None when the result came from the cache."""
+    digest, version = _cache_key(fn, text)
+    cached = _get_cached(digest, version)
+    if cached is not None:
+        return cached, None
+    result, usage = fn(text)
+    # Keyed by the model that actually answered, so a mock fallback is not served as a Gemini result
+    analysis_cache.put_cached(digest, usage["model"], version, result)
+    return result, usage
+
+
+async def _cached_call_async(fn, text):
+    """Async counterpart of _cached_call, for a coroutine function fn."""
+    digest, version = _cache_key(fn, text)
+    cached = _get_cached(digest, version)
+    if cached is not None:
+        return cached, None
+    result, usage = await fn(text)
+    analysis_cache.put_cached(digest, usage["model"], version, result)
+    return result, usage
+
+
+def _note(index, result):
+    defects = ", ".join(result.get("defects") or [])
+    return f"Part {index + 1}: {result.get('summary', '')}" + (f" (defects: {defects})" if defects else "")
+
+
+def _prefiltered(chunk):
+    """True when SUMMARY_PREFILTER=rules and no defect rule matches the chunk."""
+    return SUMMARY_PREFILTER == "rules" and not rules.get_engine().matches(chunk)
+
+
+def _map(chunks, stats):
+    send = [not _prefiltered(chunk) for chunk in chunks]
+    pending = [chunk for chunk, s in zip(chunks, send) if s]
+    workers = max(1, min(SUMMARY_WORKERS, len(pending)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="summarize") as pool:
+        outputs = list(pool.map(lambda chunk: _cached_call(ai.summarize_chunk, chunk), pending))
+    return _merge(send, outputs, stats)
+
+
+async def _map_async(chunks, stats):
+    send = [not _prefiltered(chunk) for chunk in chunks]
+    limit = asyncio.Semaphore(max(1, SUMMARY_WORKERS))
+
+    async def call(chunk):
+        async with limit:
+            return await _cached_call_async(ai.summarize_chunk_async, chunk)
+
+    outputs = await asyncio.gather(*(call(chunk) for chunk, s in zip(chunks, send) if s))
+    return _merge(send, outputs, stats)
+
+
+def _merge(send, outputs, stats):
+    """Map results in chunk order: the (result, usage) outputs for sent chunks, NO_DEFECTS for the others."""
+    outputs = iter(outputs)
+    results = []
+    for s in send:
+        if not s:
+            stats.prefiltered += 1
+            results.append(dict(NO_DEFECTS))
+            continue
+        result, usage = next(outputs)
+        stats.add(usage)
+        results.append(result)
+    return results
+
+
+def _condense(text, budget, stats):
+    level = 0
+    while ai.estimate_tokens(text) > budget:
+        chunks = split_chunks(text)
+        if level == 0:
+            stats.chunks = len(chunks)
+        notes = [_note(i, r) for i, r in enumerate(_map(chunks, stats))]
+        text = "\n".join(notes)
+        level += 1
+        if len(chunks) == 1:
+            break
+    stats.levels = level
+    return text
+
+
+async def _condense_async(text, budget, stats):
+    level = 0
+    while ai.estimate_tokens(text) > budget:
+        chunks = split_chunks(text)
+        if level == 0:
+            stats.chunks = len(chunks)
+        notes = [_note(i, r) for i, r in enumerate(await _map_async(chunks, stats))]
+        text = "\n".join(notes)
+        level += 1
+        if len(chunks) == 1:
+            break
+    stats.levels = level
+    return text
+
+
+def summarize_document(text):
+    """
+    Summary and suggestions for a whole document. Short documents go
+    straight to the reduce call. Returns a DocumentSummary (result + stats).
+    """
+    stats = SummaryStats(document_tokens=ai.estimate_tokens(text), chunks=1)
+    started = time.perf_counter()
+    notes = _condense(text, SUMMARY_REDUCE_TOKENS, stats)
+    stats.map_seconds = time.perf_counter() - started
+
+    reduce_started = time.perf_counter()
+    result, usage = _cached_call(ai.reduce_summaries, notes)
+    stats.add(usage)
+    stats.reduce_seconds = time.perf_counter() - reduce_started
+    stats.seconds = time.perf_counter() - started
+    return DocumentSummary(result, stats)
+
+
+async def summarize_document_async(text):
+    """Async counterpart of summarize_document."""
+    stats = SummaryStats(document_tokens=ai.estimate_tokens(text), chunks=1)
+    started = time.perf_counter()
+    notes = await _condense_async(text, SUMMARY_REDUCE_TOKENS, stats)
+    stats.map_seconds = time.perf_counter() - started
+
+    reduce_started = time.perf_counter()
+    result, usage = await _cached_call_async(ai.reduce_summaries_async, notes)
+    stats.add(usage)
+    stats.reduce_seconds = time.perf_counter() - reduce_started
+    stats.seconds = time.perf_counter() - started
+    return DocumentSummary(result, stats)
+
+
+def _sample_report(pages, seed=0):
+    rooms = ["kitchen", "bathroom", "master bedroom", "living room", "loft", "garage", "utility room"]
+    findings = [
+        "Moisture staining below the window sill; readings of 28% on the meter.",
+        "Hairline crack above the door head, likely shrinkage; monitor for movement.",
+        "Exposed wiring behind the consumer unit cover; isolate and make safe.",
+        "Loose floor tiles near the shower tray; re-bed and re-grout.",
+        "No visible defects; finishes in fair condition.",
+    ]
+    lines = []
+    for page in range(pages):
+        room = rooms[(page + seed) % len(rooms)]
+        lines.append(f"Section {page + 1}: {room.title()}\n")
+        for i in range(12):
+            lines.append(f"{room.title()} item {i + 1}. {findings[(page * 7 + i + seed) % len(findings)]}\n")
+        lines.append("\n")
+    return "".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Map-reduce document summaries with a token/latency report.")
+    parser.add_argument("path", help="a .txt or .pdf file, or 'bench'")
+    parser.add_argument("--pages", type=int, default=200, help="bench: pages in the generated report")
+    args = parser.parse_args(argv)
+
+    if args.path != "bench":
+        if args.path.lower().endswith(".pdf"):
+            from utils.documents import iter_pdf_pages
+            text = "".join(page_text + "\n" for _, page_text, _ in iter_pdf_pages(args.path))
+        else:
+            with open(args.path, encoding="utf-8") as f:
+                text = f.read()
+        summary = summarize_document(text)
+        print(f"Document summary: {summary.stats.describe()}")
+        print(summary.result.get("ai_summary", ""))
+        print(summary.result.get("ai_suggestions", ""))
+        return 0
+
+    # Scratch database for the chunk cache
+    from utils import db
+    db.DB_FILE = os.path.join(tempfile.mkdtemp(), "summarize_bench.sqlite")
+    text = _sample_report(args.pages)
+    lines = text.splitlines(keepends=True)
+    middle = len(lines) // 2
+    edited = "".join(lines[:middle] + ["Additional note: damp patch found behind the radiator.\n"] + lines[middle:])
+    for label, body in (("first upload", text), ("same document", text), ("one line added", edited)):
+        stats = summarize_document(body).stats
+        print(f"{label:<16}{stats.chunks:>5} chunks{stats.calls:>5} calls{stats.cached_calls:>5} cached"
+              f"{stats.input_tokens:>9,} tokens in{stats.seconds:>8.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())